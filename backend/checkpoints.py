@@ -0,0 +1,154 @@
+"""
+Crash-safe training checkpoints
+
+- find_resumable_checkpoint() finds an interrupted run's latest checkpoint
+  (last.pt, or the newest readable epochN.pt if last.pt is missing or
+  damaged) that still holds optimizer state, so training can continue with
+  resume=True. A run whose last.pt was stripped has finished: its older
+  epochN.pt files are never resumed
+- changed_train_args() lists the arguments that differ from the ones a
+  checkpoint was trained with (resuming would silently use the old ones)
+- crash_safe_trainer() wraps a trainer class so every checkpoint is written
+  to a staging directory first and then renamed into place: a crash
+  mid-write can no longer leave a truncated last.pt or best.pt
+- Periodic epochN.pt checkpoints are pruned to the newest `keep`
+"""
+
+import os
+import re
+import shutil
+from pathlib import Path
+
+STAGING_DIR = '.staging'
+EPOCH_CHECKPOINT = re.compile(r'^epoch(\d+)\.pt$')
+
+
+def _epoch_checkpoints(weights_dir):
+    """epochN.pt files in a weights directory, oldest first"""
+    found = []
+    for path in Path(weights_dir).glob('epoch*.pt'):
+        match = EPOCH_CHECKPOINT.match(path.name)
+        if match:
+            found.append((int(match.group(1)), path))
+    return [path for _, path in sorted(found)]
+
+
+def _load_checkpoint(path):
+    """Checkpoint dict, or None when the file can't be read"""
+    import torch
+
+    try:
+        return torch.load(path, map_location='cpu', weights_only=False)
+    except Exception:
+        return None
+
+
+def _is_resumable(ckpt):
+    """True when a checkpoint still carries optimizer state"""
+    # Finished runs are stripped: optimizer removed and epoch set to -1
+    return ckpt.get('optimizer') is not None and ckpt.get('epoch', -1) >= 0
+
+
+def find_resumable_checkpoint(run_dir):
+    """
+    Latest checkpoint of an interrupted run, or None
+
+    Args:
+        run_dir: Training run directory (<project>/<name>)
+
+    Returns:
+        Path to last.pt or the newest intact epochN.pt
+    """
+    weights_dir = Path(run_dir) / 'weights'
+    if not weights_dir.is_dir():
+        return None
+
+    last = weights_dir / 'last.pt'
+    ckpt = _load_checkpoint(last) if last.exists() else None
+    if ckpt is not None:
+        # A readable last.pt is the newest state: stripped means the run
+        # finished, and the epochN.pt files still holding optimizer state
+        # are older snapshots of that finished run
+        return last if _is_resumable(ckpt) else None
+
+    for path in reversed(_epoch_checkpoints(weights_dir)):
+        ckpt = _load_checkpoint(path)
+        if ckpt is not None and _is_resumable(ckpt):
+            return path
+    return None
+
+
+def changed_train_args(path, requested, ignore=('trainer', 'device')):
+    """
+    Arguments that differ from the ones a checkpoint was trained with
+
+    Args:
+        path: Checkpoint file
+        requested: model.train() arguments of the new run
+        ignore: Argument names not compared
+
+    Returns:
+        {name: (checkpoint value, requested value)}
+    """
+    saved = (_load_checkpoint(path) or {}).get('train_args') or {}
+    changed = {}
+    for name, value in requested.items():
+        if name in ignore or name not in saved:
+            continue
+        old = saved[name]
+        if name == 'data':
+            # ultralytics stores the resolved dataset YAML path
+            same = Path(str(old)).resolve() == Path(str(value)).resolve()
+        else:
+            same = old == value or str(old) == str(value)
+        if not same:
+            changed[name] = (old, value)
+    return changed
+
+
+def prune_checkpoints(weights_dir, keep=3):
+    """Delete all but the newest `keep` epochN.pt files; returns the deleted paths"""
+    stale = _epoch_checkpoints(weights_dir)
+    stale = stale[:-keep] if keep > 0 else stale
+    for path in stale:
+        path.unlink(missing_ok=True)
+    return stale
+
+
+def crash_safe_trainer(base=None, keep=3):
+    """
+    Subclass a trainer so checkpoints are written atomically and pruned
+
+    Args:
+        base: Trainer class to extend (default: ultralytics DetectionTrainer)
+        keep: epochN.pt checkpoints to retain (0 keeps none)
+
+    Returns:
+        Trainer class for model.train(trainer=...)
+    """
+    if base is None:
+        from ultralytics.models.yolo.detect import DetectionTrainer
+        base = DetectionTrainer
+
+    class CrashSafeTrainer(base):
+        def save_model(self):
+            weights_dir = Path(self.wdir)
+            staging = weights_dir / STAGING_DIR
+            shutil.rmtree(staging, ignore_errors=True)
+            staging.mkdir(parents=True)
+
+            # Let the base trainer write into the staging directory, then
+            # rename each file into place (atomic on the same filesystem)
+            last, best = self.last, self.best
+            self.wdir, self.last, self.best = staging, staging / last.name, staging / best.name
+            try:
+                super().save_model()
+            finally:
+                self.wdir, self.last, self.best = weights_dir, last, best
+
+            for path in staging.iterdir():
+                os.replace(path, weights_dir / path.name)
+            staging.rmdir()
+            prune_checkpoints(weights_dir, keep)
+
+    return CrashSafeTrainer
@@ -0,0 +1,358 @@
+"""
+Compare candidate models on accuracy, CPU latency and memory
+
+Takes several model artifacts (yolov8n/s/m.pt, best.pt from training runs,
+exported ONNX/OpenVINO/TorchScript models) and one evaluation dataset. For
+each model it measures:
+- CPU latency at several batch sizes (same method as the other tools)
+- peak memory while serving and evaluating
+- mAP50 / mAP50-95 and per-class recall on the dataset's waste classes
+
+Every model is measured in its own fresh process, so peak memory belongs
+to that model alone. Models whose class list differs from the dataset
+(e.g. COCO yolov8n.pt) are scored through the waste category mapping: a
+dataset class is matched to the model class that resolves to the same
+WASTE_CATEGORIES key (or has the same name), and the val split is scored
+on the matched classes only. Such scores cover fewer classes, so they are
+flagged in the report and kept out of the Pareto front unless every class
+matched. Models with no matching class get latency and memory only.
+
+The Pareto front is the set of models that no other model beats on both
+mAP50-95 and latency. Only those are worth choosing from. The report is
+written to:
+
+    waste_detection/comparison/comparison.json
+    waste_detection/comparison/comparison.md
+
+Usage:
+    python compare_models.py yolov8n.pt yolov8s.pt waste_detection/waste_yolov8/weights/best.pt
+    python compare_models.py best.pt exports/onnx-640.onnx --batch-sizes 1 4 8 --data waste_data.yaml
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import yaml
+
+from dataset_utils import iter_images, label_path_for, load_dataset_config
+from waste_categories import build_class_table
+
+
+def _label(model_path):
+    """Short display name: run name for training weights, file name otherwise"""
+    path = Path(model_path)
+    if path.parent.name == 'weights':
+        return f'{path.parent.parent.name}/{path.name}'
+    return path.name
+
+
+def class_mapping(model_names, dataset_names):
+    """
+    Match dataset classes to the classes of a model trained on other data
+
+    A dataset class matches the model class with the same name
+    (case-insensitive), else the one resolving to the same WASTE_CATEGORIES
+    key. Each model class is used once, so per-class recall stays per class.
+
+    Args:
+        model_names: Model class names indexed by class ID
+        dataset_names: Dataset class names indexed by class ID
+
+    Returns:
+        {dataset class ID: model class ID} for the matched classes
+    """
+    model_table = build_class_table(dict(enumerate(model_names)))
+    by_name, by_key = {}, {}
+    for model_id, entry in enumerate(model_table):
+        by_name.setdefault(entry['name'].strip().lower(), model_id)
+        if entry['matched'] is not None:
+            by_key.setdefault(entry['matched'], model_id)
+
+    mapping = {}
+    for dataset_id, entry in enumerate(build_class_table(dict(enumerate(dataset_names)))):
+        model_id = by_name.get(entry['name'].strip().lower())
+        if model_id is None:
+            model_id = by_key.get(entry['matched'])
+        if model_id is not None and model_id not in mapping.values():
+            mapping[dataset_id] = model_id
+    return mapping
+
+
+def _remapped_val_data(data_yaml, model_names, mapping, work_dir):
+    """
+    Copy of the val split labelled with the model's class IDs
+
+    Images are symlinked (copied where that fails); boxes of unmatched
+    classes are dropped.
+
+    Returns:
+        Path of the dataset YAML to validate against
+    """
+    splits, _ = load_dataset_config(data_yaml)
+    images_dir = Path(work_dir) / 'val' / 'images'
+    labels_dir = images_dir.parent / 'labels'
+    images_dir.mkdir(parents=True)
+    labels_dir.mkdir()
+
+    for image in iter_images(splits['val']):
+        target = images_dir / image.name
+        try:
+            os.symlink(image.resolve(), target)
+        except OSError:
+            shutil.copy2(image, target)
+        lines = []
+        label_path = label_path_for(image)
+        if label_path.exists():
+            for line in label_path.read_text().splitlines():
+                parts = line.split()
+                if parts and int(parts[0]) in mapping:
+                    lines.append(' '.join([str(mapping[int(parts[0])]), *parts[1:]]))
+        (labels_dir / label_path.name).write_text('\n'.join(lines) + ('\n' if lines else ''))
+
+    remapped_yaml = Path(work_dir) / 'data.yaml'
+    with open(remapped_yaml, 'w') as f:
+        yaml.safe_dump({'path': str(work_dir), 'val': 'val/images',
+                        'names': dict(enumerate(model_names))}, f)
+    return remapped_yaml
+
+
+def measure_model(args):
+    """
+    Latency, memory and accuracy of one model (runs in a fresh process)
+
+    Args:
+        args: (model path, data_yaml, img_size, batch sizes)
+
+    Returns:
+        Result row dict
+    """
+    model_path, data_yaml, img_size, batch_sizes = args
+    # Imported here: the parent process never loads torch
+    from ultralytics import YOLO
+
+    from model_benchmark import measure_latency
+    from training_profiler import peak_rss_mb
+
+    row = {'model': str(model_path), 'label': _label(model_path), 'latency': {}}
+    try:
+        model = YOLO(str(model_path), task='detect')
+    except Exception as e:
+        row['error'] = f'load: {e}'
+        return row
+
+    for batch_size in batch_sizes:
+        try:
+            row['latency'][str(batch_size)] = measure_latency(model, img_size, batch_size)
+        except Exception as e:
+            # e.g. an export with a fixed batch size
+            row['latency'][str(batch_size)] = {'error': str(e)}
+    row['serving_peak_rss_mb'] = peak_rss_mb()[0]
+
+    _, dataset_names = load_dataset_config(data_yaml)
+    model_names = [model.names[i] for i in sorted(model.names)]
+    # model class ID -> dataset class name for the classes that are scored
+    scored = dict(enumerate(dataset_names))
+    with tempfile.TemporaryDirectory(prefix='compare-') as work_dir:
+        val_data = data_yaml
+        if model_names != dataset_names:
+            row['class_mismatch'] = True
+            mapping = class_mapping(model_names, dataset_names)
+            row['class_mapping'] = {dataset_names[d]: model_names[m] for d, m in mapping.items()}
+            scored = {m: dataset_names[d] for d, m in mapping.items()}
+            if scored:
+                val_data = _remapped_val_data(data_yaml, model_names, mapping, work_dir)
+
+        if scored:
+            try:
+                # workers=0: keep the dataloader in this process so its memory is counted
+                metrics = model.val(data=str(val_data), imgsz=img_size, batch=1, device='cpu',
+                                    workers=0, plots=False, verbose=False)
+                row['map50'] = round(float(metrics.box.map50), 4)
+                row['map50_95'] = round(float(metrics.box.map), 4)
+                recall = {name: None for name in dataset_names}
+                for i, class_id in enumerate(metrics.box.ap_class_index):
+                    if int(class_id) in scored:
+                        recall[scored[int(class_id)]] = round(float(metrics.box.r[i]), 4)
+                row['recall'] = recall
+            except Exception as e:
+                row['error'] = f'validation: {e}'
+    row['peak_rss_mb'] = peak_rss_mb()[0]
+    return row
+
+
+def _partial_score(row, num_classes):
+    """True when a mismatched model was scored on only some dataset classes"""
+    return row.get('class_mismatch') and len(row.get('class_mapping', {})) < num_classes
+
+
+def pareto_front(rows, batch_size, num_classes):
+    """
+    Model paths of the rows not beaten on both mAP50-95 and p50 latency
+
+    Rows scored on only some of the num_classes dataset classes are left
+    out: their mAP is not comparable.
+    """
+    key = str(batch_size)
+    scored = [r for r in rows if 'map50_95' in r and 'p50_ms' in r['latency'].get(key, {})
+              and not _partial_score(r, num_classes)]
+    front = []
+    for r in scored:
+        acc, lat = r['map50_95'], r['latency'][key]['p50_ms']
+        dominated = any(
+            o is not r and o['map50_95'] >= acc and o['latency'][key]['p50_ms'] <= lat
+            and (o['map50_95'] > acc or o['latency'][key]['p50_ms'] < lat)
+            for o in scored
+        )
+        if not dominated:
+            front.append(r['model'])
+    return front
+
+
+def _write_markdown(report, path):
+    batch_sizes = report['batch_sizes']
+    names = report['classes']
+    header = ['', 'Model', 'mAP50', 'mAP50-95'] + [f'p50 b{b} (ms)' for b in batch_sizes] + \
+        ['Peak RSS (MB)'] + [f'Recall {n}' for n in names]
+    lines = [
+        f"# Model comparison ({report['data']}, img_size {report['img_size']})",
+        '',
+        f"★ Pareto front on mAP50-95 vs. p50 latency at batch {batch_sizes[0]}",
+        '',
+        '| ' + ' | '.join(header) + ' |',
+        '|' + '|'.join('---' for _ in header) + '|',
+    ]
+    for r in report['models']:
+        latency = [str(r['latency'].get(str(b), {}).get('p50_ms', '-')) for b in batch_sizes]
+        recall = r.get('recall', {})
+        cells = [
+            '★' if r['model'] in report['pareto_front'] else '',
+            r['label'],
+            str(r.get('map50', '-')),
+            str(r.get('map50_95', '-')),
+            *latency,
+            str(r.get('peak_rss_mb', '-')),
+            *('-' if recall.get(n) is None else str(recall[n]) for n in names),
+        ]
+        lines.append('| ' + ' | '.join(cells) + ' |')
+
+    notes = []
+    for r in report['models']:
+        if not r.get('class_mismatch'):
+            continue
+        mapped = r.get('class_mapping', {})
+        if not mapped:
+            notes.append(f"- ⚠️ {r['label']}: no class matches the dataset, accuracy not measured")
+        elif _partial_score(r, len(names)):
+            pairs = ', '.join(f'{d} ← {m}' for d, m in mapped.items())
+            notes.append(f"- ⚠️ {r['label']}: other classes than the dataset; scored on "
+                         f"{len(mapped)}/{len(names)} matched classes only ({pairs}). "
+                         f"Not comparable to fully scored models, left out of the Pareto front")
+        else:
+            notes.append(f"- {r['label']}: classes renamed through the waste categories "
+                         f"({', '.join(f'{d} ← {m}' for d, m in mapped.items())})")
+    notes += [f"- {r['label']}: {r['error']}" for r in report['models'] if 'error' in r]
+    if notes:
+        lines += ['', *notes]
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def compare_models(models, data_yaml='waste_data.yaml', img_size=640, batch_sizes=(1, 8),
+                   output_dir='waste_detection/comparison'):
+    """
+    Measure every model and write the comparison report
+
+    Args:
+        models: Model artifact paths (any format ultralytics can load)
+        data_yaml: Evaluation dataset (its val split is used)
+        img_size: Inference image size
+        batch_sizes: Batch sizes to time; the first one is used for the Pareto front
+        output_dir: Report directory
+
+    Returns:
+        Report dict
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    _, names = load_dataset_config(data_yaml)
+    start = time.perf_counter()
+
+    rows = []
+    # spawn: a fresh interpreter per model, so peak RSS is not inherited
+    context = multiprocessing.get_context('spawn')
+    for model_path in models:
+        print(f"\n📏 Measuring {model_path}...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                row = pool.submit(measure_model, (model_path, data_yaml, img_size, list(batch_sizes))).result()
+            except Exception as e:
+                row = {'model': str(model_path), 'label': _label(model_path), 'latency': {},
+                       'error': f'crashed: {e}'}
+        rows.append(row)
+
+    report = {
+        'data': str(data_yaml),
+        'img_size': img_size,
+        'batch_sizes': list(batch_sizes),
+        'classes': names,
+        'pareto_front': pareto_front(rows, batch_sizes[0], len(names)),
+        'elapsed_seconds': round(time.perf_counter() - start, 1),
+        'models': rows,
+    }
+    with open(output_dir / 'comparison.json', 'w') as f:
+        json.dump(report, f, indent=2)
+    _write_markdown(report, output_dir / 'comparison.md')
+    print_comparison_summary(report, output_dir)
+    return report
+
+
+def print_comparison_summary(report, output_dir):
+    """Print one line per model, Pareto-front models marked"""
+    primary = str(report['batch_sizes'][0])
+    print("\n" + "="*60)
+    print("⚖️  Model Comparison")
+    print("="*60)
+    num_classes = len(report['classes'])
+    for r in report['models']:
+        mark = '★' if r['model'] in report['pareto_front'] else ' '
+        latency = r['latency'].get(primary, {}).get('p50_ms', '-')
+        accuracy = r.get('map50_95', 'n/a (other classes)' if r.get('class_mismatch') else '-')
+        if 'map50_95' in r and _partial_score(r, num_classes):
+            accuracy = f"{accuracy} (⚠️ {len(r['class_mapping'])}/{num_classes} classes only)"
+        print(f"{mark} {r['label']}: mAP50-95 {accuracy}  p50 b{primary} {latency} ms  "
+              f"peak {r.get('peak_rss_mb', '-')} MB")
+        if 'error' in r:
+            print(f"   ❌ {r['error']}")
+
+    front = [r for r in report['models'] if r['model'] in report['pareto_front']]
+    if front:
+        print("\n🏆 Pareto front (fastest first):")
+        for r in sorted(front, key=lambda r: r['latency'][primary]['p50_ms']):
+            print(f"   YOLO_MODEL={r['model']}")
+    print(f"\nReport: {Path(output_dir) / 'comparison.md'}")
+    print("="*60)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compare models on accuracy, latency and memory')
+    parser.add_argument('models', type=str, nargs='+', help='Model artifacts to compare')
+    parser.add_argument('--data', type=str, default='waste_data.yaml',
+                        help='Path to dataset YAML file')
+    parser.add_argument('--img-size', type=int, default=640,
+                        help='Inference image size')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8],
+                        help='Batch sizes to time (the first one is used for the Pareto front)')
+    parser.add_argument('--output', type=str, default='waste_detection/comparison',
+                        help='Report directory')
+
+    args = parser.parse_args()
+
+    compare_models(args.models, args.data, args.img_size, args.batch_sizes, args.output)
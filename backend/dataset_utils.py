@@ -0,0 +1,64 @@
+"""
+Helpers for YOLO-format datasets shared by the training and dataset tools
+
+Kept free of torch/ultralytics imports so dataset tools (and their worker
+processes) start quickly.
+"""
+
+import os
+import yaml
+from pathlib import Path
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+
+def load_dataset_config(data_yaml):
+    """
+    Read a YOLO dataset YAML and resolve its split directories
+
+    Returns:
+        (splits, names) where splits maps 'train'/'val'/'test' to the images
+        directory of that split (only splits present in the YAML) and names
+        is the class name list indexed by class ID
+    """
+    yaml_path = Path(data_yaml)
+    with open(yaml_path) as f:
+        config = yaml.safe_load(f)
+
+    root = Path(config.get('path') or yaml_path.parent)
+    if not root.is_absolute() and not root.exists():
+        root = yaml_path.parent / root
+
+    splits = {}
+    for split in ('train', 'val', 'test'):
+        if config.get(split):
+            splits[split] = root / config[split]
+
+    names = config['names']
+    if isinstance(names, dict):
+        names = [names[i] for i in sorted(names)]
+
+    return splits, names
+
+
+def file_stamp(path):
+    """(mtime_ns, size) of a file, or None when it does not exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def label_path_for(image_path):
+    """Map dataset/<split>/images/x.jpg to dataset/<split>/labels/x.txt"""
+    image_path = Path(image_path)
+    return image_path.parent.parent / 'labels' / (image_path.stem + '.txt')
+
+
+def iter_images(images_dir):
+    """Sorted image files directly inside images_dir (empty if it does not exist)"""
+    images_dir = Path(images_dir)
+    if not images_dir.is_dir():
+        return []
+    return sorted(p for p in images_dir.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
@@ -0,0 +1,339 @@
+"""
+Find near-duplicate images in a YOLO dataset
+
+Merged datasets (Roboflow exports, TACO, user uploads) contain many
+near-identical images. They slow down every epoch, and copies that sit in
+both train and val/test leak evaluation images into training.
+
+Every image gets a 64-bit perceptual hash (DCT of a 32x32 grayscale
+thumbnail), computed in a process pool and cached in <data>.phash.json so
+re-runs only hash new or changed files. Near-duplicates (Hamming distance
+<= threshold) are found with a multi-index lookup: the hash is split into
+threshold+1 chunks, and two hashes within the threshold must match exactly
+on at least one chunk. Only images sharing a chunk are compared.
+
+Each cluster keeps one image: the copy in val, then test, then train (so
+evaluation sets stay intact), preferring the largest resolution. Clusters
+are chains of near-duplicate pairs, so a member can be linked to the kept
+image only through others and differ from it by more than the threshold.
+Only members within the threshold of the kept image count as duplicates;
+the others are reported as related and never moved. With --remove, the
+duplicates and their labels are moved to <dataset>/duplicates/<split>/. If
+the kept image had no label and a removed copy did, that label is moved
+over to the kept image.
+
+Usage:
+    python dedup_dataset.py                      # report only
+    python dedup_dataset.py --threshold 4 --remove
+"""
+
+import json
+import os
+import shutil
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from dataset_utils import file_stamp, iter_images, label_path_for, load_dataset_config
+
+CACHE_VERSION = 1
+HASH_SIZE = 8
+THUMB_SIZE = 32
+# Kept copy: earlier splits win (evaluation sets stay intact)
+KEEP_PRIORITY = ('val', 'test', 'train')
+
+_DCT = np.cos(np.pi / (2 * THUMB_SIZE) * np.outer(np.arange(THUMB_SIZE), 2 * np.arange(THUMB_SIZE) + 1))
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def perceptual_hash(image_path):
+    """
+    64-bit DCT hash of an image (runs in a worker process)
+
+    Returns:
+        (hash as 16-char hex, width, height), or (None, None, None) when the
+        image cannot be read
+    """
+    try:
+        with Image.open(image_path) as image:
+            width, height = image.size
+            # JPEG: decode at reduced scale, the thumbnail is tiny anyway
+            image.draft('L', (THUMB_SIZE * 2, THUMB_SIZE * 2))
+            thumb = image.convert('L').resize((THUMB_SIZE, THUMB_SIZE), Image.BILINEAR)
+    except Exception:
+        return None, None, None
+
+    pixels = np.asarray(thumb, dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE].flatten()
+    # The DC term only carries overall brightness
+    bits = low > np.median(low[1:])
+    value = int(''.join('1' if b else '0' for b in bits), 2)
+    return f'{value:016x}', width, height
+
+
+def _popcount(values):
+    """Set bits per element of a uint64 array"""
+    if hasattr(np, 'bitwise_count'):  # numpy >= 2.0
+        return np.bitwise_count(values)
+    return _POPCOUNT[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1)
+
+
+def _load_cache(cache_path):
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+        if cache.get('version') == CACHE_VERSION:
+            return cache
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return {'version': CACHE_VERSION, 'images': {}}
+
+
+def _write_cache(cache, cache_path):
+    tmp_path = Path(f'{cache_path}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, separators=(',', ':'))
+    os.replace(tmp_path, cache_path)
+
+
+def hash_dataset(data_yaml, cache_path=None, workers=None):
+    """
+    Perceptual hashes of every image in the dataset's splits
+
+    Returns:
+        List of dicts with path, split, hash, width, height (unreadable
+        images are skipped)
+    """
+    splits, _ = load_dataset_config(data_yaml)
+    cache_path = Path(cache_path or Path(data_yaml).with_suffix('.phash.json'))
+    cache = _load_cache(cache_path)
+
+    entries = {}
+    todo = []
+    for split, images_dir in splits.items():
+        for image_path in iter_images(images_dir):
+            key = str(image_path)
+            stamp = file_stamp(image_path)
+            cached = cache['images'].get(key)
+            if cached and cached['stamp'] == stamp:
+                entries[key] = dict(cached, split=split)
+            else:
+                todo.append((split, key, stamp))
+
+    if todo:
+        print(f"🔢 Hashing {len(todo)} image(s) ({len(entries)} cached)...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            paths = [key for _, key, _ in todo]
+            for (split, key, stamp), (value, width, height) in zip(
+                    todo, pool.map(perceptual_hash, paths, chunksize=64)):
+                entries[key] = {'stamp': stamp, 'hash': value, 'width': width,
+                                'height': height, 'split': split}
+
+    cache['images'] = {k: {f: v for f, v in e.items() if f != 'split'} for k, e in entries.items()}
+    _write_cache(cache, cache_path)
+
+    return [dict(e, path=k) for k, e in sorted(entries.items()) if e['hash']]
+
+
+def find_near_duplicates(hashes, threshold):
+    """
+    Pairs of hashes within a Hamming distance, without comparing all pairs
+
+    Args:
+        hashes: uint64 array
+        threshold: Maximum Hamming distance
+
+    Returns:
+        List of (i, j, distance) with i < j
+    """
+    chunks = threshold + 1
+    bounds = np.linspace(0, 64, chunks + 1).astype(int)
+    pairs = {}
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        keys = (hashes >> np.uint64(lo)) & np.uint64((1 << (hi - lo)) - 1)
+        order = np.argsort(keys, kind='stable')
+        _, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+        for start, count in zip(starts[counts > 1], counts[counts > 1]):
+            members = np.sort(order[start:start + count])
+            group = hashes[members]
+            # Row blocks keep the distance matrix small for big buckets
+            for row in range(0, count, 1024):
+                block = _popcount(group[row:row + 1024, None] ^ group[None, :])
+                for a, b in zip(*np.nonzero(block <= threshold)):
+                    i, j = members[row + a], members[b]
+                    if i < j:
+                        pairs[(int(i), int(j))] = int(block[a, b])
+    return [(i, j, d) for (i, j), d in sorted(pairs.items())]
+
+
+def _clusters(count, pairs):
+    """Connected components (size > 1) of the duplicate pairs"""
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j, _ in pairs:
+        parent[find(i)] = find(j)
+
+    groups = defaultdict(list)
+    for i in range(count):
+        groups[find(i)].append(i)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def _keep_key(entry):
+    split_rank = KEEP_PRIORITY.index(entry['split']) if entry['split'] in KEEP_PRIORITY else len(KEEP_PRIORITY)
+    has_label = label_path_for(entry['path']).exists()
+    return (split_rank, -(entry['width'] * entry['height']), not has_label, entry['path'])
+
+
+def _quarantine(path, dataset_root, split, kind):
+    dest_dir = dataset_root / 'duplicates' / split / kind
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    shutil.move(str(path), dest_dir / Path(path).name)
+
+
+def dedup_dataset(data_yaml='waste_data.yaml', threshold=6, remove=False, workers=None, report_path=None):
+    """
+    Report (and optionally remove) near-duplicate images within and across splits
+
+    Args:
+        data_yaml: Dataset configuration file
+        threshold: Maximum Hamming distance between 64-bit hashes (0: exact)
+        remove: Move duplicates and their labels to <dataset>/duplicates/
+        workers: Hashing processes (default: CPU count)
+        report_path: JSON report (default: <data_yaml>.duplicates.json)
+
+    Returns:
+        Report dict
+    """
+    if not 0 <= threshold < 32:
+        raise ValueError('threshold must be between 0 and 31')
+    start = time.perf_counter()
+    entries = hash_dataset(data_yaml, workers=workers)
+    hashes = np.array([int(e['hash'], 16) for e in entries], dtype=np.uint64)
+    pairs = find_near_duplicates(hashes, threshold)
+
+    clusters = []
+    within = Counter()
+    leaks = Counter()
+    touched_splits = set()
+    for members in _clusters(len(entries), pairs):
+        members.sort(key=lambda i: _keep_key(entries[i]))
+        keep = entries[members[0]]
+        distances = _popcount(hashes[members[1:]] ^ hashes[members[0]])
+        duplicates, related = [], []
+        for i, distance in zip(members[1:], distances.tolist()):
+            entry = entries[i]
+            item = {'path': entry['path'], 'split': entry['split'], 'distance': distance}
+            if distance > threshold:
+                # Linked to the kept image only through other members
+                related.append(item)
+                continue
+            if entry['split'] == keep['split']:
+                within[entry['split']] += 1
+            else:
+                leaks[f"{entry['split']}->{keep['split']}"] += 1
+            duplicates.append(item)
+        clusters.append({'keep': keep['path'], 'split': keep['split'],
+                         'duplicates': duplicates, 'related': related})
+
+        if remove:
+            keep_label = label_path_for(keep['path'])
+            for duplicate in duplicates:
+                image_path = Path(duplicate['path'])
+                label_path = label_path_for(image_path)
+                dataset_root = image_path.parent.parent.parent
+                if label_path.exists() and not keep_label.exists():
+                    # Normalized boxes carry over to a resized copy
+                    keep_label.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.move(str(label_path), keep_label)
+                    touched_splits.add(keep_label.parent)
+                elif label_path.exists():
+                    _quarantine(label_path, dataset_root, duplicate['split'], 'labels')
+                _quarantine(image_path, dataset_root, duplicate['split'], 'images')
+                touched_splits.add(label_path.parent)
+
+    # Ultralytics caches parsed labels per split; they are stale now
+    for labels_dir in touched_splits:
+        labels_dir.with_suffix('.cache').unlink(missing_ok=True)
+
+    report = {
+        'threshold': threshold,
+        'images': len(entries),
+        'duplicates': sum(len(c['duplicates']) for c in clusters),
+        'related': sum(len(c['related']) for c in clusters),
+        'within_split': dict(within),
+        'cross_split': dict(leaks),
+        'removed': remove,
+        'elapsed_seconds': round(time.perf_counter() - start, 2),
+        'clusters': clusters,
+    }
+    report_path = Path(report_path or Path(data_yaml).with_suffix('.duplicates.json'))
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    report['report'] = str(report_path)
+    return report
+
+
+def print_dedup_summary(report, max_clusters=10):
+    """Print duplicate counts and the largest clusters"""
+    print("\n" + "="*60)
+    print("🧬 Near-Duplicate Images")
+    print("="*60)
+    print(f"Images hashed: {report['images']} (threshold {report['threshold']} bits, "
+          f"{report['elapsed_seconds']}s)")
+    print(f"Duplicates: {report['duplicates']} in {len(report['clusters'])} cluster(s)")
+    if report['related']:
+        print(f"  related (kept, beyond the threshold of the kept image): {report['related']}")
+    for split, count in report['within_split'].items():
+        print(f"  within {split}: {count}")
+    for direction, count in report['cross_split'].items():
+        print(f"  ⚠️  leaked {direction}: {count}")
+
+    largest = sorted(report['clusters'], key=lambda c: -len(c['duplicates']))[:max_clusters]
+    if largest:
+        print("\nLargest clusters:")
+        for cluster in largest:
+            print(f"  {cluster['keep']} (+{len(cluster['duplicates'])})")
+
+    if report['removed']:
+        print("\n✅ Duplicates moved to duplicates/ next to the splits")
+    elif report['duplicates']:
+        print("\nRe-run with --remove to move them out of the dataset")
+    print(f"Report: {report['report']}")
+    print("="*60)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Find near-duplicate images in a YOLO dataset')
+    parser.add_argument('--data', type=str, default='waste_data.yaml',
+                        help='Path to dataset YAML file')
+    parser.add_argument('--threshold', type=int, default=6,
+                        help='Maximum Hamming distance of 64-bit hashes (0: exact duplicates)')
+    parser.add_argument('--remove', action='store_true',
+                        help='Move duplicates and their labels to <dataset>/duplicates/')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes (default: CPU count)')
+    parser.add_argument('--report', type=str, default=None,
+                        help='Report file (default: <data>.duplicates.json)')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        print(f"❌ Dataset configuration file not found: {args.data}")
+        sys.exit(1)
+
+    report = dedup_dataset(args.data, args.threshold, args.remove, args.workers, args.report)
+    print_dedup_summary(report)
@@ -0,0 +1,197 @@
+"""
+Asynchronous columnar log of detection results
+
+The request path only hands a record to a bounded in-memory queue; a
+background thread batches records into Parquet files. If the disk falls
+behind and the queue fills up, new records are dropped and counted rather
+than blocking inference.
+
+Files are named detections-<UTC timestamp>.parquet and rotate when they
+exceed a size or an age limit. Read them back with e.g.:
+    pandas.read_parquet('detection_logs/')
+
+Requirements:
+- pip install pyarrow
+"""
+
+import atexit
+import hashlib
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+def hash_image(image_bytes):
+    """Short content hash used to find repeated uploads"""
+    return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+
+
+def _schema():
+    return pa.schema([
+        ('timestamp', pa.timestamp('ms', tz='UTC')),
+        ('endpoint', pa.string()),
+        ('model_version', pa.string()),
+        ('class_name', pa.string()),
+        ('confidence', pa.float32()),
+        ('boxes', pa.list_(pa.list_(pa.float32(), 4))),
+        ('box_classes', pa.list_(pa.string())),
+        ('latency_ms', pa.float32()),
+        ('image_hash', pa.string()),
+    ])
+
+
+class DetectionLogger:
+    """
+    Background Parquet writer for detection records
+
+    Args:
+        log_dir: Directory receiving the Parquet files
+        queue_size: Maximum records waiting to be written before dropping
+        batch_size: Records per row group
+        flush_seconds: Write a partial batch after this long
+        max_file_bytes: Rotate to a new file above this size
+        max_file_seconds: Rotate to a new file after this long
+    """
+
+    def __init__(
+        self,
+        log_dir,
+        queue_size=10000,
+        batch_size=512,
+        flush_seconds=5.0,
+        max_file_bytes=64 * 1024 * 1024,
+        max_file_seconds=3600
+    ):
+        if pa is None:
+            raise ImportError('pyarrow is required for detection logging (pip install pyarrow)')
+
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_file_bytes = max_file_bytes
+        self.max_file_seconds = max_file_seconds
+        self.schema = _schema()
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._counter_lock = threading.Lock()
+        self.dropped = 0
+        self.written = 0
+        self.files = 0
+        self.errors = 0
+
+        self._writer = None
+        self._writer_path = None
+        self._writer_opened = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='detection-log', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, endpoint, model_version, class_name, confidence, boxes, box_classes,
+            latency_ms, image_hash):
+        """Queue one record without blocking; counts a drop if the queue is full"""
+        record = {
+            'timestamp': datetime.now(timezone.utc),
+            'endpoint': endpoint,
+            'model_version': model_version,
+            'class_name': class_name,
+            'confidence': confidence,
+            'boxes': boxes,
+            'box_classes': box_classes,
+            'latency_ms': latency_ms,
+            'image_hash': image_hash,
+        }
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._counter_lock:
+                self.dropped += 1
+
+    def stats(self):
+        return {
+            'enabled': True,
+            'directory': str(self.log_dir),
+            'queued': self.queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'files': self.files,
+            'errors': self.errors,
+        }
+
+    def close(self):
+        """Flush queued records and close the current file"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(timeout=self.flush_seconds + 5)
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_seconds
+
+        while not (self._stop.is_set() and self.queue.empty()):
+            try:
+                batch.append(self.queue.get(timeout=max(0.05, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline or self._stop.is_set():
+                if batch:
+                    self._write(batch)
+                    batch = []
+                elif self._writer is not None and self._file_expired():
+                    # Close idle files on time so their footer is readable
+                    self._close_writer()
+                deadline = time.monotonic() + self.flush_seconds
+
+        if batch:
+            self._write(batch)
+        self._close_writer()
+
+    def _write(self, batch):
+        try:
+            self._rotate_if_needed()
+            columns = {name: [record[name] for record in batch] for name in self.schema.names}
+            self._writer.write_table(pa.table(columns, schema=self.schema))
+            self.written += len(batch)
+        except Exception as e:
+            self.errors += 1
+            with self._counter_lock:
+                self.dropped += len(batch)
+            print(f"⚠️  Detection log write failed: {e}")
+            self._close_writer()
+
+    def _file_expired(self):
+        too_big = self._writer_path.stat().st_size >= self.max_file_bytes
+        too_old = time.monotonic() - self._writer_opened >= self.max_file_seconds
+        return too_big or too_old
+
+    def _rotate_if_needed(self):
+        if self._writer is not None:
+            if not self._file_expired():
+                return
+            self._close_writer()
+
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+        self._writer_path = self.log_dir / f'detections-{stamp}.parquet'
+        self._writer = pq.ParquetWriter(str(self._writer_path), self.schema, compression='zstd')
+        self._writer_opened = time.monotonic()
+        self.files += 1
+
+    def _close_writer(self):
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except Exception as e:
+                print(f"⚠️  Closing detection log failed: {e}")
+            self._writer = None
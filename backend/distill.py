@@ -0,0 +1,430 @@
+"""
+Knowledge distillation from a large teacher into the nano serving model
+
+The teacher (a trained YOLOv8m/l) is run once over the training images.
+For every ground-truth box, the class scores of the teacher's most
+confident prediction overlapping that box are stored as its soft target:
+
+    distill_cache/<teacher>-<hash>-<img_size>.json
+
+The cache is next to the dataset YAML, and only images whose image or
+label file changed are re-run.
+
+During student training the soft targets travel with the labels through
+the augmentation pipeline as extra `cls` columns. The detection loss then
+blends them into the classification targets of the anchors assigned to
+each box: (1 - alpha) * one-hot + alpha * teacher distribution. Box
+regression still uses only the ground truth. The teacher is never run
+during training.
+
+Usage:
+    python train_waste_model.py --model n --teacher waste_detection/waste_yolov8m/weights/best.pt
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torchvision.ops import box_iou
+from ultralytics import YOLO
+from ultralytics.utils.loss import v8DetectionLoss
+from ultralytics.utils.torch_utils import de_parallel
+
+from dataset_utils import file_stamp, iter_images, label_path_for, load_dataset_config
+from model_benchmark import measure_latency
+
+CACHE_VERSION = 1
+
+# A teacher prediction must overlap a ground-truth box this much to count
+MATCH_IOU = 0.5
+
+
+def _teacher_id(weights):
+    digest = hashlib.sha256()
+    with open(weights, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return f'{Path(weights).stem}-{digest.hexdigest()[:8]}'
+
+
+def _label_boxes(label_path):
+    """Class IDs and normalized xywh boxes of a label file (polygons become their bounding box)"""
+    classes, boxes = [], []
+    if label_path.exists():
+        with open(label_path) as f:
+            for line in f:
+                values = line.split()
+                if len(values) < 5:
+                    continue
+                coords = [float(v) for v in values[1:]]
+                if len(coords) > 4:
+                    xs, ys = coords[0::2], coords[1::2]
+                    coords = [(min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2,
+                              max(xs) - min(xs), max(ys) - min(ys)]
+                classes.append(int(values[0]))
+                boxes.append(coords)
+    return classes, np.array(boxes, dtype=np.float32).reshape(-1, 4)
+
+
+def _letterbox(image, size):
+    """Resize the long side to size and pad to a square; returns (image, (new_w, new_h, left, top))"""
+    h, w = image.shape[:2]
+    r = size / max(h, w)
+    new_w, new_h = round(w * r), round(h * r)
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    left, top = (size - new_w) // 2, (size - new_h) // 2
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    canvas[top:top + new_h, left:left + new_w] = resized
+    return canvas, (new_w, new_h, left, top)
+
+
+def _soft_targets(pred, classes, boxes, geometry, nc, temperature):
+    """
+    Teacher class distribution for each ground-truth box of one image
+
+    Args:
+        pred: Raw teacher output for the image, (anchors, 4 + nc) with
+            xywh pixel boxes and per-class sigmoid scores
+        classes, boxes: Ground truth (normalized xywh)
+        geometry: Letterbox (new_w, new_h, left, top)
+    """
+    hard = np.eye(nc, dtype=np.float32)[classes]
+    if not len(classes):
+        return hard
+
+    new_w, new_h, left, top = geometry
+    gt = torch.from_numpy(boxes).clone()
+    gt[:, [0, 2]] *= new_w
+    gt[:, [1, 3]] *= new_h
+    gt[:, 0] += left
+    gt[:, 1] += top
+    gt_xyxy = torch.cat([gt[:, :2] - gt[:, 2:] / 2, gt[:, :2] + gt[:, 2:] / 2], 1)
+
+    xywh, scores = pred[:, :4], pred[:, 4:]
+    pred_xyxy = torch.cat([xywh[:, :2] - xywh[:, 2:] / 2, xywh[:, :2] + xywh[:, 2:] / 2], 1)
+
+    # Most confident teacher prediction overlapping each box (what NMS would keep)
+    overlap = box_iou(gt_xyxy, pred_xyxy) >= MATCH_IOU
+    confidence = overlap * scores.max(1).values
+    best_conf, best = confidence.max(1)
+
+    soft = scores[best].clamp_min(1e-6) ** (1 / temperature)
+    soft = (soft / soft.sum(1, keepdim=True)).numpy()
+    # Boxes the teacher missed keep their hard target
+    missed = (best_conf <= 0).numpy()
+    soft[missed] = hard[missed]
+    return soft
+
+
+def build_teacher_cache(teacher, data_yaml='waste_data.yaml', img_size=640,
+                        cache_dir=None, batch_size=16, temperature=1.0):
+    """
+    Run the teacher over the training split once and cache its soft targets
+
+    Args:
+        teacher: Trained teacher weights (same class list as the dataset)
+        data_yaml: Dataset configuration file
+        img_size: Inference size for the teacher
+        cache_dir: Cache directory (default: distill_cache/ next to data_yaml)
+        batch_size: Images per teacher forward pass
+        temperature: >1 flattens the teacher distribution, <1 sharpens it
+
+    Returns:
+        Path of the cache file
+    """
+    splits, names = load_dataset_config(data_yaml)
+    cache_dir = Path(cache_dir or Path(data_yaml).parent / 'distill_cache')
+    cache_path = cache_dir / f'{_teacher_id(teacher)}-{img_size}.json'
+
+    cache = {'version': CACHE_VERSION, 'images': {}}
+    try:
+        with open(cache_path) as f:
+            loaded = json.load(f)
+        if (loaded.get('version') == CACHE_VERSION and loaded.get('names') == names
+                and loaded.get('temperature') == temperature):
+            cache = loaded
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    entries = {}
+    todo = []
+    for image_path in iter_images(splits['train']):
+        key = os.path.realpath(image_path)
+        label_path = label_path_for(image_path)
+        stamp = [file_stamp(image_path), file_stamp(label_path)]
+        cached = cache['images'].get(key)
+        if cached and cached['stamp'] == stamp:
+            entries[key] = cached
+        else:
+            todo.append((key, label_path, stamp))
+
+    if todo:
+        print(f"\n🧑‍🏫 Computing teacher soft targets for {len(todo)} image(s) "
+              f"({len(entries)} cached)...")
+        start = time.perf_counter()
+        model = YOLO(teacher)
+        teacher_names = [model.names[i] for i in sorted(model.names)]
+        if teacher_names != names:
+            raise ValueError(f'Teacher classes {teacher_names} do not match the dataset classes {names}')
+        net = model.model.float().eval()
+        if hasattr(net, 'fuse'):
+            net = net.fuse(verbose=False)
+
+        for i in range(0, len(todo), batch_size):
+            chunk = []
+            for key, label_path, stamp in todo[i:i + batch_size]:
+                image = cv2.imread(key)
+                if image is not None:
+                    chunk.append((key, label_path, stamp) + _letterbox(image, img_size))
+            if not chunk:
+                continue
+
+            batch = np.stack([c[3] for c in chunk])[..., ::-1].transpose(0, 3, 1, 2)
+            x = torch.from_numpy(np.ascontiguousarray(batch)).float() / 255
+            with torch.no_grad():
+                pred = net(x)
+            pred = (pred[0] if isinstance(pred, (list, tuple)) else pred).transpose(1, 2)
+
+            for (key, label_path, stamp, _, geometry), image_pred in zip(chunk, pred):
+                classes, boxes = _label_boxes(label_path)
+                soft = _soft_targets(image_pred, classes, boxes, geometry, len(names), temperature)
+                entries[key] = {
+                    'stamp': stamp,
+                    'boxes': boxes.round(6).tolist(),
+                    'soft': soft.round(4).tolist(),
+                }
+            print(f"\r  {min(i + batch_size, len(todo))}/{len(todo)} images", end='')
+        print(f"\n✅ Teacher pass done in {time.perf_counter() - start:.1f}s")
+    else:
+        print(f"✅ Teacher soft targets are current: {cache_path}")
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(f'{cache_path.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'version': CACHE_VERSION,
+            'teacher': str(teacher),
+            'names': names,
+            'temperature': temperature,
+            'images': entries,
+        }, f, separators=(',', ':'))
+    os.replace(tmp_path, cache_path)
+    return str(cache_path)
+
+
+def attach_soft_targets(dataset, entries, nc):
+    """
+    Append teacher soft targets to each label's `cls` as extra columns
+
+    cls becomes (n, 1 + nc): the hard class ID followed by the teacher
+    distribution. Rows are matched to the cache by box coordinates, so
+    labels the dataset de-duplicated or reordered still line up; unmatched
+    rows get a one-hot target.
+
+    Returns:
+        Number of boxes that received a teacher target
+    """
+    matched = 0
+    for label in dataset.labels:
+        cls = label['cls'].reshape(-1, 1).astype(np.float32)
+        soft = np.eye(nc, dtype=np.float32)[cls[:, 0].astype(int)]
+        entry = entries.get(os.path.realpath(label['im_file']))
+        if entry and len(cls) and entry['boxes']:
+            boxes = np.array(entry['boxes'], dtype=np.float32)
+            targets = np.array(entry['soft'], dtype=np.float32)
+            distance = np.abs(label['bboxes'][:, None, :] - boxes[None]).sum(-1)
+            nearest = distance.argmin(1)
+            ok = distance[np.arange(len(cls)), nearest] < 1e-3
+            soft[ok] = targets[nearest[ok]]
+            matched += int(ok.sum())
+        label['cls'] = np.concatenate([cls, soft], 1)
+    return matched
+
+
+def pad_empty_soft_targets(label, nc):
+    """
+    Give a label without boxes a (0, 1 + nc) cls so batches concatenate
+
+    ultralytics' Format step replaces an empty cls with a fresh (0, 1) tensor
+    (1-D in some releases), dropping the soft target columns, and collate's
+    torch.cat then fails on the mixed widths.
+    """
+    cls = label['cls']
+    if not len(cls):
+        label['cls'] = cls.reshape(0, 1 + nc)
+    return label
+
+
+class _SoftTargetAssigner:
+    """Wraps the task-aligned assigner and mixes teacher targets into its scores"""
+
+    def __init__(self, assigner, loss):
+        self.assigner = assigner
+        self.loss = loss
+
+    def __call__(self, *args, **kwargs):
+        labels, bboxes, scores, fg_mask, gt_idx = self.assigner(*args, **kwargs)
+        soft = self.loss.soft
+        if soft is None or not soft.shape[1]:
+            return labels, bboxes, scores, fg_mask, gt_idx
+
+        nc = scores.shape[-1]
+        assigned = soft.gather(1, gt_idx.long().unsqueeze(-1).expand(-1, -1, nc))
+        hard = F.one_hot(labels.long(), nc).to(scores.dtype)
+        # Keep the assigner's per-anchor alignment strength, change only the class mix
+        strength = scores.amax(-1, keepdim=True)
+        mixed = strength * ((1 - self.loss.alpha) * hard + self.loss.alpha * assigned.to(scores.dtype))
+        scores = torch.where(fg_mask.bool().unsqueeze(-1), mixed, scores)
+        return labels, bboxes, scores, fg_mask, gt_idx
+
+
+class DistillationLoss(v8DetectionLoss):
+    """YOLOv8 detection loss with teacher soft targets for classification"""
+
+    def __init__(self, model, alpha=0.5):
+        super().__init__(model)
+        self.alpha = alpha
+        self.soft = None
+        self.assigner = _SoftTargetAssigner(self.assigner, self)
+
+    def __call__(self, preds, batch):
+        cls = batch['cls']
+        self.soft = None
+        if cls.ndim == 2 and cls.shape[1] > 1:
+            # Pad per image in the same order the base loss pads its targets
+            batch_idx = batch['batch_idx'].view(-1).long()
+            batch_size = batch['img'].shape[0]
+            counts = batch_idx.bincount(minlength=batch_size)
+            soft = cls.new_zeros(batch_size, int(counts.max()) if len(batch_idx) else 0, cls.shape[1] - 1)
+            for i in range(batch_size):
+                rows = cls[batch_idx == i, 1:]
+                soft[i, :len(rows)] = rows
+            self.soft = soft.to(self.device)
+            batch = dict(batch, cls=cls[:, :1])
+        return super().__call__(preds, batch)
+
+
+def distillation_trainer(soft_targets, alpha=0.5, base=None):
+    """
+    A trainer that trains against cached teacher soft targets
+
+    Args:
+        soft_targets: Cache file from build_teacher_cache()
+        alpha: Weight of the teacher distribution in the class targets
+        base: Trainer class to extend (default: DetectionTrainer)
+
+    Returns:
+        Trainer class for model.train(trainer=...)
+    """
+    if base is None:
+        from ultralytics.models.yolo.detect import DetectionTrainer
+        base = DetectionTrainer
+
+    with open(soft_targets) as f:
+        cache = json.load(f)
+    entries, nc = cache['images'], len(cache['names'])
+
+    class DistillationTrainer(base):
+        def build_dataset(self, img_path, mode='train', batch=None):
+            dataset = super().build_dataset(img_path, mode, batch)
+            if mode == 'train':
+                matched = attach_soft_targets(dataset, entries, nc)
+                print(f"🧑‍🏫 Teacher targets attached to {matched} training boxes")
+
+                class SoftTargetDataset(type(dataset)):
+                    def __getitem__(self, index):
+                        return pad_empty_soft_targets(super().__getitem__(index), nc)
+
+                dataset.__class__ = SoftTargetDataset
+            return dataset
+
+        def _setup_train(self, *args, **kwargs):
+            super()._setup_train(*args, **kwargs)
+            # Set after the EMA copy is made: validation keeps the plain loss
+            net = de_parallel(self.model)
+            net.criterion = DistillationLoss(net, alpha)
+
+        def save_model(self):
+            # Keep checkpoints loadable without this module
+            net = de_parallel(self.model)
+            criterion = net.__dict__.pop('criterion', None)
+            try:
+                super().save_model()
+            finally:
+                if criterion is not None:
+                    net.criterion = criterion
+
+        def plot_training_labels(self):
+            dataset = self.train_loader.dataset
+            labels = dataset.labels
+            dataset.labels = [dict(label, cls=label['cls'][:, :1]) for label in labels]
+            try:
+                super().plot_training_labels()
+            finally:
+                dataset.labels = labels
+
+        def plot_training_samples(self, batch, ni):
+            super().plot_training_samples(dict(batch, cls=batch['cls'][:, :1]), ni)
+
+    return DistillationTrainer
+
+
+def distillation_report(student, baseline, data_yaml, img_size=640, teacher=None, output_dir=None):
+    """
+    Compare the distilled student with a plain-trained model of the same size
+
+    Evaluates mAP on the dataset's val split and CPU latency for each model
+    and writes distillation_report.json/.md (default: the student's run
+    directory).
+
+    Returns:
+        List of result rows (teacher, baseline, student)
+    """
+    rows = []
+    for role, weights in (('teacher', teacher), ('baseline', baseline), ('student', student)):
+        if not weights:
+            continue
+        model = YOLO(weights)
+        metrics = model.val(data=data_yaml, imgsz=img_size, plots=False, verbose=False)
+        latency = measure_latency(model, img_size=img_size)
+        rows.append({
+            'role': role,
+            'weights': str(weights),
+            'map50': round(float(metrics.box.map50), 4),
+            'map50_95': round(float(metrics.box.map), 4),
+            'latency_p50_ms': latency['p50_ms'],
+            'images_per_second': latency['images_per_second'],
+        })
+
+    output_dir = Path(output_dir or Path(student).parent.parent)
+    with open(output_dir / 'distillation_report.json', 'w') as f:
+        json.dump(rows, f, indent=2)
+    lines = [
+        '| Model | Weights | mAP50 | mAP50-95 | Latency p50 (ms) | Images/s |',
+        '|-------|---------|-------|----------|------------------|----------|',
+    ]
+    for r in rows:
+        lines.append(f"| {r['role']} | {r['weights']} | {r['map50']} | {r['map50_95']} | "
+                     f"{r['latency_p50_ms']} | {r['images_per_second']} |")
+    with open(output_dir / 'distillation_report.md', 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+    print("\n" + "="*60)
+    print("🧑‍🏫 Distillation Report")
+    print("="*60)
+    for r in rows:
+        print(f"{r['role']:>8}: mAP50 {r['map50']:.4f}  mAP50-95 {r['map50_95']:.4f}  "
+              f"p50 {r['latency_p50_ms']} ms")
+    by_role = {r['role']: r for r in rows}
+    if 'baseline' in by_role and 'student' in by_role:
+        gain = by_role['student']['map50_95'] - by_role['baseline']['map50_95']
+        print(f"\nStudent vs. plain nano: {gain:+.4f} mAP50-95")
+    print(f"Report: {output_dir / 'distillation_report.md'}")
+    print("="*60)
+    return rows
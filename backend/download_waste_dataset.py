@@ -3,29 +3,47 @@ Download and prepare waste detection datasets
 
 This script helps you download pre-existing waste detection datasets
 from various sources including Roboflow and other public repositories.
+
+TACO and TrashNet can be converted straight into the YOLO dataset layout.
+A mapping file assigns source categories to the classes in waste_data.yaml:
+    python download_waste_dataset.py taco --annotations TACO/data/annotations.json --images TACO/data
+    python download_waste_dataset.py trashnet --images dataset-resized
 """
 
+import hashlib
+import json
 import os
+import shutil
 import sys
 import zipfile
-import requests
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
-def download_file(url, destination):
-    """Download file with progress bar"""
-    response = requests.get(url, stream=True)
-    total_size = int(response.headers.get('content-length', 0))
-    
-    with open(destination, 'wb') as file:
-        downloaded = 0
-        for chunk in response.iter_content(chunk_size=8192):
-            if chunk:
-                file.write(chunk)
-                downloaded += len(chunk)
-                if total_size > 0:
-                    progress = (downloaded / total_size) * 100
-                    print(f"\rDownloading: {progress:.1f}%", end='')
-    print()
+import yaml
+
+from dataset_utils import IMAGE_EXTENSIONS, load_dataset_config
+from downloader import download
+
+# Deterministic split fractions (train, valid, test)
+DEFAULT_SPLIT = (0.8, 0.1, 0.1)
+SPLITS = ('train', 'valid', 'test')
+
+def download_file(url, destination, sha256=None, segments=4, extract_to=None):
+    """
+    Download file with progress, resume and optional SHA-256 check
+
+    Args:
+        url: File URL
+        destination: Output path
+        sha256: Expected hex digest
+        segments: Parallel range requests when the server supports them
+        extract_to: Extract the zip into this directory while it downloads
+
+    Returns:
+        Path of the downloaded file
+    """
+    return download(url, destination, sha256=sha256, segments=segments, extract_to=extract_to)
 
 def download_roboflow_dataset(api_key, workspace, project, version=1):
     """
@@ -103,7 +121,9 @@ def setup_taco_dataset():
     print("2. Clone the repository:")
     print("   git clone https://github.com/pedropro/TACO.git")
     print("3. Follow their download instructions")
-    print("4. Convert annotations to YOLO format using their scripts")
+    print("4. Convert annotations to YOLO format:")
+    print("   python download_waste_dataset.py taco --annotations TACO/data/annotations.json \\")
+    print("       --images TACO/data --mapping taco_mapping.yaml")
     print("="*60 + "\n")
 
 def setup_trashnet_dataset():
@@ -118,9 +138,351 @@ def setup_trashnet_dataset():
     print("To download TrashNet:")
     print("1. Visit: https://github.com/garythung/trashnet")
     print("2. Download the dataset")
-    print("3. Convert to YOLO format (labels needed)")
+    print("3. Convert to YOLO format (one box per image, fitted to the object):")
+    print("   python download_waste_dataset.py trashnet --images dataset-resized \\")
+    print("       --mapping trashnet_mapping.yaml")
     print("="*60 + "\n")
 
+
+class _JsonStream:
+    """Incremental reader for one large JSON document"""
+
+    def __init__(self, f, chunk_size=1 << 20):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.f.read(self.chunk_size)
+        self.eof = not chunk
+        # Drop what was already consumed so memory stays at about one chunk
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return not self.eof
+
+    def peek(self):
+        """Next non-whitespace character (None at end of input)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return None
+
+    def take(self, expected):
+        if self.peek() != expected:
+            raise ValueError(f'Expected {expected!r} in JSON at offset {self.pos}')
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number or literal may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def iter_coco_sections(annotations_path):
+    """
+    Stream a COCO-style JSON file as (top-level key, value) pairs
+
+    Top-level arrays ('images', 'annotations', ...) are yielded one element
+    at a time, so the whole file is never held in memory.
+    """
+    with open(annotations_path, encoding='utf-8') as f:
+        stream = _JsonStream(f)
+        stream.take('{')
+        while stream.peek() not in ('}', None):
+            if stream.peek() == ',':
+                stream.take(',')
+                continue
+            key = stream.value()
+            stream.take(':')
+            if stream.peek() != '[':
+                yield key, stream.value()
+                continue
+            stream.take('[')
+            while stream.peek() != ']':
+                if stream.peek() == ',':
+                    stream.take(',')
+                    continue
+                yield key, stream.value()
+            stream.take(']')
+
+
+def load_category_mapping(mapping_path, class_names):
+    """
+    Read a source category -> target class mapping file (YAML or JSON)
+
+    Targets must be class names from the dataset YAML; null drops a category.
+
+    Returns:
+        {source name: target class ID or None}
+    """
+    with open(mapping_path) as f:
+        mapping = yaml.safe_load(f) or {}
+
+    unknown = sorted({t for t in mapping.values() if t is not None and t not in class_names})
+    if unknown:
+        raise ValueError(f"{mapping_path}: unknown target classes {unknown}; expected one of {class_names}")
+    return {source: (None if target is None else class_names.index(target))
+            for source, target in mapping.items()}
+
+
+def assign_split(key, split=DEFAULT_SPLIT):
+    """Deterministic train/valid/test assignment from a stable hash of key"""
+    fraction = int(hashlib.sha1(key.encode('utf-8')).hexdigest()[:8], 16) / 0xFFFFFFFF
+    if fraction < split[0]:
+        return 'train'
+    if fraction < split[0] + split[1]:
+        return 'valid'
+    return 'test'
+
+
+def _link_or_copy(src, dst):
+    if dst.exists():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _remove_sample(output_dir, name, splits=SPLITS):
+    """Delete an earlier conversion's image and label from these splits"""
+    for split in splits:
+        (Path(output_dir) / split / 'images' / name).unlink(missing_ok=True)
+        (Path(output_dir) / split / 'labels' / (Path(name).stem + '.txt')).unlink(missing_ok=True)
+
+
+def _write_sample(job):
+    """
+    Place one image and write its label file (runs in a worker)
+
+    A copy left in another split by a run with other split fractions is
+    removed, so an image never sits in both train and valid.
+    """
+    src, output_dir, split, name, lines = job
+    _remove_sample(output_dir, name, [s for s in SPLITS if s != split])
+    image_dst = Path(output_dir) / split / 'images' / name
+    _link_or_copy(src, image_dst)
+    label_dst = image_dst.parent.parent / 'labels' / (Path(name).stem + '.txt')
+    with open(label_dst, 'w') as f:
+        f.write(''.join(lines))
+    return split
+
+
+def _prepare_output(output_dir):
+    for split in SPLITS:
+        for kind in ('images', 'labels'):
+            (Path(output_dir) / split / kind).mkdir(parents=True, exist_ok=True)
+
+
+def convert_taco(annotations_path, images_dir, mapping_path='taco_mapping.yaml',
+                 data_yaml='waste_data.yaml', output_dir='dataset', split=DEFAULT_SPLIT, workers=8):
+    """
+    Convert TACO (COCO-style) annotations into the YOLO dataset layout
+
+    Annotations are streamed and kept only as compact per-image box tuples
+    (segmentation polygons are never stored). Category names, or failing
+    that supercategory names, are mapped through the mapping file.
+
+    Args:
+        annotations_path: TACO annotations.json
+        images_dir: Directory the annotation file_names are relative to
+        mapping_path: Source category -> waste_data.yaml class mapping
+        data_yaml: Dataset YAML providing the target class list
+        output_dir: Dataset root to write train/valid/test into
+        split: (train, valid, test) fractions
+        workers: Parallel image/label writers
+
+    Returns:
+        Summary dict
+    """
+    _, class_names = load_dataset_config(data_yaml)
+    mapping = load_category_mapping(mapping_path, class_names)
+
+    print(f"\n📖 Streaming {annotations_path}...")
+    images = {}
+    categories = {}
+    boxes = defaultdict(list)
+    for section, item in iter_coco_sections(annotations_path):
+        if section == 'images':
+            images[item['id']] = (item['file_name'], item['width'], item['height'])
+        elif section == 'categories':
+            categories[item['id']] = (item['name'], item.get('supercategory'))
+        elif section == 'annotations' and item.get('bbox'):
+            boxes[item['image_id']].append((item['category_id'], *item['bbox']))
+
+    # Category name first, then supercategory
+    category_class = {}
+    for cat_id, (name, supercategory) in categories.items():
+        category_class[cat_id] = mapping.get(name, mapping.get(supercategory))
+
+    unmapped = Counter()
+    instances = Counter()
+    jobs = []
+    _prepare_output(output_dir)
+    for image_id, (file_name, width, height) in images.items():
+        lines = []
+        for cat_id, x, y, w, h in boxes.get(image_id, ()):
+            class_id = category_class.get(cat_id)
+            if class_id is None:
+                unmapped[categories.get(cat_id, (str(cat_id),))[0]] += 1
+                continue
+            # COCO boxes are top-left pixel boxes; clip to the image
+            x1, y1 = max(0.0, x), max(0.0, y)
+            x2, y2 = min(float(width), x + w), min(float(height), y + h)
+            if x2 <= x1 or y2 <= y1:
+                continue
+            lines.append(f"{class_id} {(x1 + x2) / 2 / width:.6f} {(y1 + y2) / 2 / height:.6f} "
+                         f"{(x2 - x1) / width:.6f} {(y2 - y1) / height:.6f}\n")
+            instances[class_names[class_id]] += 1
+
+        src = Path(images_dir) / file_name
+        if not src.exists():
+            continue
+        name = file_name.replace('/', '_').replace('\\', '_')
+        jobs.append((src, output_dir, assign_split(file_name, split), name, lines))
+
+    print(f"📝 Writing {len(jobs)} images with {workers} workers...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        per_split = Counter(pool.map(_write_sample, jobs))
+
+    return {
+        'images': dict(per_split),
+        'instances': dict(instances),
+        'unmapped': dict(unmapped),
+        'missing_images': len(images) - len(jobs),
+    }
+
+
+def _object_box(image_path):
+    """
+    Normalized xywh box around the single object of a TrashNet photo
+
+    TrashNet objects are shot on a plain background: pixels that differ
+    clearly from the border colour are foreground. Falls back to the whole
+    image when nothing stands out.
+    """
+    import cv2
+    import numpy as np
+
+    image = cv2.imread(str(image_path))
+    if image is None:
+        return None
+    h, w = image.shape[:2]
+    small = cv2.resize(image, (160, round(160 * h / w))) if w > 160 else image
+    sh, sw = small.shape[:2]
+
+    border = np.concatenate([small[0], small[-1], small[:, 0], small[:, -1]]).astype(np.int16)
+    background = np.median(border, axis=0)
+    distance = np.abs(small.astype(np.int16) - background).sum(axis=2)
+    mask = cv2.morphologyEx((distance > 60).astype(np.uint8), cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+
+    ys, xs = np.nonzero(mask)
+    if len(xs) < 0.01 * sh * sw:
+        return 0.5, 0.5, 1.0, 1.0
+    # Percentiles ignore stray specks and shadows at the edges
+    x1, x2 = np.percentile(xs, [1, 99])
+    y1, y2 = np.percentile(ys, [1, 99])
+    return ((x1 + x2 + 1) / 2 / sw, (y1 + y2 + 1) / 2 / sh,
+            min(1.0, (x2 - x1 + 1) / sw), min(1.0, (y2 - y1 + 1) / sh))
+
+
+def _write_trashnet_sample(job):
+    src, output_dir, split, name, class_id, fit_box = job
+    box = _object_box(src) if fit_box else (0.5, 0.5, 1.0, 1.0)
+    if box is None:
+        _remove_sample(output_dir, name)
+        return None
+    line = f"{class_id} {box[0]:.6f} {box[1]:.6f} {box[2]:.6f} {box[3]:.6f}\n"
+    return _write_sample((src, output_dir, split, name, [line]))
+
+
+def convert_trashnet(images_dir, mapping_path='trashnet_mapping.yaml', data_yaml='waste_data.yaml',
+                     output_dir='dataset', split=DEFAULT_SPLIT, workers=None, fit_box=True):
+    """
+    Convert TrashNet's per-class image folders into the YOLO dataset layout
+
+    TrashNet has no boxes, so every image gets one box: fitted to the object
+    against the plain background (fit_box=True) or the whole image.
+
+    Args:
+        images_dir: TrashNet root with one folder per category
+        mapping_path: Folder name -> waste_data.yaml class mapping
+        data_yaml: Dataset YAML providing the target class list
+        output_dir: Dataset root to write train/valid/test into
+        split: (train, valid, test) fractions
+        workers: Worker processes (default: CPU count)
+        fit_box: Fit boxes to the object instead of using the full image
+
+    Returns:
+        Summary dict
+    """
+    _, class_names = load_dataset_config(data_yaml)
+    mapping = load_category_mapping(mapping_path, class_names)
+
+    jobs = []
+    unmapped = Counter()
+    instances = Counter()
+    _prepare_output(output_dir)
+    for category_dir in sorted(p for p in Path(images_dir).iterdir() if p.is_dir()):
+        class_id = mapping.get(category_dir.name)
+        images = sorted(p for p in category_dir.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        if class_id is None:
+            unmapped[category_dir.name] += len(images)
+            continue
+        for image_path in images:
+            key = f'{category_dir.name}/{image_path.name}'
+            jobs.append((image_path, output_dir, assign_split(key, split),
+                         f'trashnet_{category_dir.name}_{image_path.name}', class_id, fit_box))
+            instances[class_names[class_id]] += 1
+
+    print(f"📝 Writing {len(jobs)} images...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_write_trashnet_sample, jobs, chunksize=32))
+    per_split = Counter(r for r in results if r)
+
+    return {
+        'images': dict(per_split),
+        'instances': dict(instances),
+        'unmapped': dict(unmapped),
+        'unreadable_images': results.count(None),
+    }
+
+
+def print_conversion_summary(summary):
+    """Print a converter summary"""
+    print("\n" + "="*60)
+    print("✅ Conversion complete")
+    print("="*60)
+    for split, count in sorted(summary['images'].items()):
+        print(f"{split}: {count} images")
+    print("\nInstances per class:")
+    for name, count in sorted(summary['instances'].items()):
+        print(f"  {name}: {count}")
+    if summary['unmapped']:
+        print("\n⚠️  Skipped unmapped categories (add them to the mapping file to keep them):")
+        for name, count in sorted(summary['unmapped'].items(), key=lambda kv: -kv[1]):
+            print(f"  {name}: {count}")
+    for key in ('missing_images', 'unreadable_images'):
+        if summary.get(key):
+            print(f"⚠️  {key.replace('_', ' ').capitalize()}: {summary[key]}")
+    print("="*60)
+
 def create_dataset_structure():
     """Create standard YOLOv8 dataset structure"""
     
@@ -227,5 +589,44 @@ def main():
     print("2. Update waste_data.yaml with your classes")
     print("3. Run: python train_waste_model.py")
 
+def convert_cli():
+    """Non-interactive converters: python download_waste_dataset.py taco|trashnet ..."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert public waste datasets to YOLO format')
+    subparsers = parser.add_subparsers(dest='dataset', required=True)
+
+    taco = subparsers.add_parser('taco', help='Convert TACO (COCO-style annotations)')
+    taco.add_argument('--annotations', required=True, help='TACO annotations.json')
+    taco.add_argument('--images', required=True, help='Directory the annotation file names are relative to')
+    taco.add_argument('--mapping', default='taco_mapping.yaml', help='Category mapping file')
+    taco.add_argument('--workers', type=int, default=8, help='Parallel writers')
+
+    trashnet = subparsers.add_parser('trashnet', help='Convert TrashNet (folder per category)')
+    trashnet.add_argument('--images', required=True, help='TrashNet root folder')
+    trashnet.add_argument('--mapping', default='trashnet_mapping.yaml', help='Category mapping file')
+    trashnet.add_argument('--workers', type=int, default=None, help='Worker processes')
+    trashnet.add_argument('--full-image-boxes', action='store_true',
+                          help='Label the whole image instead of fitting a box to the object')
+
+    for sub in (taco, trashnet):
+        sub.add_argument('--data', default='waste_data.yaml', help='Dataset YAML with the target classes')
+        sub.add_argument('--output', default='dataset', help='Dataset root directory')
+        sub.add_argument('--split', type=float, nargs=3, default=list(DEFAULT_SPLIT),
+                         metavar=('TRAIN', 'VALID', 'TEST'), help='Split fractions')
+
+    args = parser.parse_args()
+    if args.dataset == 'taco':
+        summary = convert_taco(args.annotations, args.images, args.mapping, args.data,
+                               args.output, tuple(args.split), args.workers)
+    else:
+        summary = convert_trashnet(args.images, args.mapping, args.data, args.output,
+                                   tuple(args.split), args.workers, not args.full_image_boxes)
+    print_conversion_summary(summary)
+
+
 if __name__ == '__main__':
-    main()
+    if len(sys.argv) > 1:
+        convert_cli()
+    else:
+        main()
@@ -0,0 +1,440 @@
+"""
+Resumable, parallel, checksum-verified downloads
+
+- Servers that honour HTTP Range requests are downloaded in parallel
+  segments; other servers get a single plain stream
+- Progress is kept next to the download (<file>.part + <file>.part.json),
+  so a rerun after a dropped connection continues where it stopped, as
+  long as the server still reports the same size and ETag/Last-Modified
+- The finished file is checked against an expected SHA-256 before it is
+  renamed into place
+- Zip archives can be extracted while they are still downloading: entries
+  are unpacked from their local headers as soon as the contiguous start of
+  the file has arrived
+
+Usage:
+    python downloader.py https://example.com/taco.zip taco.zip --sha256 <hex> --extract TACO
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+
+import requests
+
+CHUNK_SIZE = 1024 * 1024
+# Progress is persisted after at most this many new bytes per segment
+STATE_INTERVAL = 8 * 1024 * 1024
+MIN_SEGMENT = 4 * 1024 * 1024
+RETRIES = 5
+
+
+class DownloadError(Exception):
+    """Raised when a download cannot be completed or verified"""
+
+
+class _Progress:
+    """Shared segment progress; wakes the extractor when data arrives"""
+
+    def __init__(self, size, validator, segments, state_path, ranges=True):
+        self.size = size
+        self.validator = validator
+        self.ranges = ranges  # False: the server only sends the whole file
+        self.segments = segments  # [[start, end (exclusive, or None), done]]
+        self.state_path = state_path
+        self.finished = False
+        self.failed = False
+        self.condition = threading.Condition()
+
+    def advance(self, index, nbytes):
+        with self.condition:
+            self.segments[index][2] += nbytes
+            self.condition.notify_all()
+
+    def contiguous(self):
+        """Bytes available from the start of the file without gaps"""
+        available = 0
+        for start, end, done in self.segments:
+            if start != available:
+                break
+            available = start + done
+            if end is None or available < end:
+                break
+        return available
+
+    def downloaded(self):
+        return sum(done for _, _, done in self.segments)
+
+    def finish(self, failed=False):
+        with self.condition:
+            self.finished = True
+            self.failed = failed
+            self.condition.notify_all()
+
+    def save(self):
+        with self.condition:
+            state = {'size': self.size, 'validator': self.validator, 'segments': self.segments}
+            tmp_path = self.state_path.with_name(self.state_path.name + '.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+
+
+def _probe(url, timeout):
+    """(size or None, supports ranges, validator) from a one-byte range request"""
+    with requests.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=timeout) as r:
+        r.raise_for_status()
+        validator = r.headers.get('ETag') or r.headers.get('Last-Modified')
+        if r.status_code == 206 and '/' in r.headers.get('Content-Range', ''):
+            total = r.headers['Content-Range'].rsplit('/', 1)[1]
+            if total.isdigit():
+                return int(total), True, validator
+        length = r.headers.get('Content-Length')
+        return (int(length) if length and length.isdigit() else None), False, validator
+
+
+def _plan_segments(size, ranges, segments):
+    if not ranges or size is None:
+        return [[0, size, 0]]
+    count = max(1, min(segments, size // MIN_SEGMENT))
+    step = -(-size // count)
+    return [[start, min(start + step, size), 0] for start in range(0, size, step)]
+
+
+def _load_state(state_path, size, validator):
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if state.get('size') != size or state.get('validator') != validator or size is None:
+        return None
+    return state['segments']
+
+
+def _fetch_segment(url, part_path, progress, index, timeout):
+    """Download one segment, retrying from its last byte on connection errors"""
+    for attempt in range(RETRIES):
+        start, end, done = progress.segments[index]
+        if end is not None and start + done >= end:
+            return
+        headers = {}
+        ranged = progress.ranges and end is not None and (start + done > 0 or end < progress.size)
+        if ranged:
+            headers['Range'] = f'bytes={start + done}-{end - 1}'
+            if progress.validator:
+                headers['If-Range'] = progress.validator
+        elif done:
+            # No ranges: a single stream can only start over
+            with progress.condition:
+                progress.segments[index][2] = 0
+            with open(part_path, 'r+b') as f:
+                f.truncate(0)
+
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=timeout) as r:
+                r.raise_for_status()
+                if ranged and r.status_code != 206:
+                    raise DownloadError('Server ignored the range request (file changed?)')
+                with open(part_path, 'r+b') as f:
+                    f.seek(start + progress.segments[index][2])
+                    since_save = 0
+                    for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                        if progress.finished:
+                            raise DownloadError('Download cancelled')
+                        f.write(chunk)
+                        f.flush()
+                        progress.advance(index, len(chunk))
+                        since_save += len(chunk)
+                        if since_save >= STATE_INTERVAL:
+                            progress.save()
+                            since_save = 0
+            progress.save()
+            if end is None or start + progress.segments[index][2] >= end:
+                return
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+            progress.save()
+            time.sleep(min(2 ** attempt, 30))
+    raise DownloadError(f'Segment {index} failed after {RETRIES} attempts')
+
+
+class _GrowingFile:
+    """Sequential reader over a file that is still being downloaded"""
+
+    def __init__(self, path, progress):
+        self.f = open(path, 'rb')
+        self.progress = progress
+        self.pos = 0
+
+    def _wait_for(self, end):
+        with self.progress.condition:
+            while self.progress.contiguous() < end:
+                if self.progress.finished:
+                    if self.progress.failed or self.progress.contiguous() < end:
+                        raise DownloadError('Archive ended early')
+                    break
+                self.progress.condition.wait(1.0)
+
+    def read(self, n):
+        self._wait_for(self.pos + n)
+        self.f.seek(self.pos)
+        data = self.f.read(n)
+        self.pos += len(data)
+        return data
+
+    def read_available(self, limit):
+        """Up to limit bytes, waiting only until at least one is available"""
+        self._wait_for(self.pos + 1)
+        available = min(limit, max(1, self.progress.contiguous() - self.pos))
+        return self.read(available)
+
+    def unread(self, n):
+        self.pos -= n
+
+    def close(self):
+        self.f.close()
+
+
+def _safe_member_path(root, name):
+    member = PurePosixPath(name.replace('\\', '/'))
+    if member.is_absolute() or '..' in member.parts:
+        raise DownloadError(f'Unsafe path in archive: {name}')
+    return Path(root, *member.parts)
+
+
+def _zip64_sizes(extra, csize, usize):
+    """Sizes from the zip64 extra field when the 32-bit fields overflowed"""
+    pos = 0
+    while pos + 4 <= len(extra):
+        tag, length = struct.unpack('<HH', extra[pos:pos + 4])
+        body = extra[pos + 4:pos + 4 + length]
+        if tag == 0x0001:
+            values = list(struct.unpack(f'<{len(body) // 8}Q', body[:len(body) // 8 * 8]))
+            if usize == 0xFFFFFFFF and values:
+                usize = values.pop(0)
+            if csize == 0xFFFFFFFF and values:
+                csize = values.pop(0)
+        pos += 4 + length
+    return csize, usize
+
+
+def extract_zip_stream(reader, output_dir):
+    """
+    Extract a zip archive from its local file headers, front to back
+
+    Works on a stream (no central directory needed). Supports stored and
+    deflated entries, data descriptors and zip64 sizes.
+
+    Returns:
+        Number of files extracted
+    """
+    output_dir = Path(output_dir)
+    count = 0
+    while True:
+        signature = reader.read(4)
+        if len(signature) < 4 or signature in (b'PK\x01\x02', b'PK\x05\x06', b'PK\x06\x06'):
+            return count  # central directory: all entries are done
+        if signature != b'PK\x03\x04':
+            raise DownloadError('Not a zip archive (or corrupt local header)')
+
+        (_, flags, method, _, _, crc, csize, usize,
+         name_len, extra_len) = struct.unpack('<HHHHHIIIHH', reader.read(26))
+        name = reader.read(name_len).decode('utf-8' if flags & 0x800 else 'cp437')
+        csize, usize = _zip64_sizes(reader.read(extra_len), csize, usize)
+        has_descriptor = bool(flags & 0x08)
+        target = _safe_member_path(output_dir, name)
+
+        if name.endswith('/'):
+            target.mkdir(parents=True, exist_ok=True)
+            continue
+        if method not in (0, 8):
+            raise DownloadError(f'Unsupported compression method {method} for {name}')
+        if method == 0 and has_descriptor and csize == 0:
+            raise DownloadError(f'Cannot stream stored entry without sizes: {name}')
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        actual_crc = 0
+        with open(target, 'wb') as out:
+            if method == 0:
+                remaining = csize
+                while remaining:
+                    data = reader.read(min(remaining, CHUNK_SIZE))
+                    out.write(data)
+                    actual_crc = zlib.crc32(data, actual_crc)
+                    remaining -= len(data)
+            else:
+                inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+                remaining = csize if not has_descriptor or csize else None
+                while not inflater.eof:
+                    limit = CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining)
+                    if limit == 0:
+                        raise DownloadError(f'Truncated entry: {name}')
+                    data = reader.read_available(limit)
+                    if remaining is not None:
+                        remaining -= len(data)
+                    output = inflater.decompress(data)
+                    out.write(output)
+                    actual_crc = zlib.crc32(output, actual_crc)
+                # Give back bytes that belong to the next header
+                reader.unread(len(inflater.unused_data))
+
+        if has_descriptor:
+            first = reader.read(4)
+            fields = reader.read(12) if first == b'PK\x07\x08' else first + reader.read(8)
+            crc = struct.unpack('<I', fields[:4])[0]
+            # zip64 descriptors carry 8-byte sizes: detect by what follows
+            peek = reader.read(4)
+            reader.unread(len(peek))
+            if peek[:2] != b'PK':
+                reader.read(8)
+        if actual_crc != crc:
+            raise DownloadError(f'CRC mismatch for {name}')
+        count += 1
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def download(url, destination, sha256=None, segments=4, extract_to=None, timeout=30):
+    """
+    Download url to destination, resuming and verifying
+
+    Args:
+        url: HTTP(S) URL
+        destination: Final file path
+        sha256: Expected hex digest (verified before the file is kept)
+        segments: Parallel range requests when the server supports them
+        extract_to: Also extract the (zip) download into this directory
+            while it is being written
+        timeout: Per-request connect/read timeout in seconds
+
+    Returns:
+        Path of the downloaded file
+    """
+    destination = Path(destination)
+    if destination.exists() and (sha256 is None or sha256_file(destination) == sha256.lower()):
+        print(f"✅ Already downloaded: {destination}")
+        if extract_to and not Path(extract_to).exists():
+            with open(destination, 'rb') as f:
+                extract_zip_stream(_FileReader(f), extract_to)
+        return destination
+
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    part_path = destination.with_name(destination.name + '.part')
+    state_path = destination.with_name(destination.name + '.part.json')
+
+    size, ranges, validator = _probe(url, timeout)
+    plan = _load_state(state_path, size, validator) if part_path.exists() and ranges else None
+    if plan:
+        print(f"♻️  Resuming {destination.name}: {sum(s[2] for s in plan) / 1024 ** 2:.1f} MB already on disk")
+    else:
+        plan = _plan_segments(size, ranges, segments)
+        with open(part_path, 'wb') as f:
+            if size:
+                f.truncate(size)
+
+    progress = _Progress(size, validator, plan, state_path, ranges)
+    progress.save()
+
+    extractor = None
+    staging = None
+    if extract_to:
+        staging = Path(f'{extract_to}.partial')
+        shutil.rmtree(staging, ignore_errors=True)
+        reader = _GrowingFile(part_path, progress)
+        extractor = ThreadPoolExecutor(max_workers=1)
+        extraction = extractor.submit(extract_zip_stream, reader, staging)
+
+    pool = ThreadPoolExecutor(max_workers=len(plan))
+    try:
+        futures = [pool.submit(_fetch_segment, url, part_path, progress, i, timeout)
+                   for i in range(len(plan))]
+        while not all(f.done() for f in futures):
+            time.sleep(0.5)
+            if size:
+                print(f"\rDownloading: {progress.downloaded() / size * 100:.1f}%", end='')
+        print()
+        for f in futures:
+            f.result()
+    except BaseException:
+        # Stops the other segments at their next chunk; progress stays on disk
+        progress.finish(failed=True)
+        pool.shutdown(wait=True)
+        progress.save()
+        if extractor:
+            extractor.shutdown(wait=True)
+            reader.close()
+        raise
+    pool.shutdown()
+    progress.finish()
+
+    if sha256:
+        actual = sha256_file(part_path)
+        if actual != sha256.lower():
+            part_path.unlink()
+            state_path.unlink(missing_ok=True)
+            if extractor:
+                extractor.shutdown(wait=True)
+                reader.close()
+                shutil.rmtree(staging, ignore_errors=True)
+            raise DownloadError(f'SHA-256 mismatch for {url}: expected {sha256}, got {actual}')
+
+    os.replace(part_path, destination)
+    state_path.unlink(missing_ok=True)
+
+    if extractor:
+        try:
+            files = extraction.result()
+        finally:
+            extractor.shutdown(wait=True)
+            reader.close()
+        if Path(extract_to).exists():
+            shutil.rmtree(extract_to)
+        os.replace(staging, extract_to)
+        print(f"📂 Extracted {files} files to {extract_to}")
+
+    print(f"✅ Downloaded: {destination}")
+    return destination
+
+
+class _FileReader:
+    """extract_zip_stream reader over an already complete file"""
+
+    def __init__(self, f):
+        self.f = f
+
+    def read(self, n):
+        return self.f.read(n)
+
+    def read_available(self, limit):
+        return self.f.read(limit)
+
+    def unread(self, n):
+        self.f.seek(-n, os.SEEK_CUR)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Resumable parallel download with SHA-256 check')
+    parser.add_argument('url', type=str, help='URL to download')
+    parser.add_argument('destination', type=str, help='Output file')
+    parser.add_argument('--sha256', type=str, default=None, help='Expected SHA-256 hex digest')
+    parser.add_argument('--segments', type=int, default=4, help='Parallel range requests')
+    parser.add_argument('--extract', type=str, default=None,
+                        help='Extract the zip into this directory while downloading')
+
+    args = parser.parse_args()
+    download(args.url, args.destination, args.sha256, args.segments, args.extract)
@@ -0,0 +1,229 @@
+"""
+Export matrix: CPU formats, latency benchmark and auto-selection
+
+Exports trained weights to several CPU-friendly formats:
+- TorchScript
+- ONNX (dynamic shapes)
+- OpenVINO FP32 and INT8 (INT8 is calibrated on the dataset)
+
+For every serving image size and batch size, each artifact is benchmarked
+on this machine and validated on the dataset's val split. Artifacts below
+the mAP threshold are rejected, and the fastest remaining one is written
+to a manifest:
+
+    <weights dir>/exports/manifest.json
+
+The service loads the selected artifact and its image size directly with
+YOLO_MODEL_MANIFEST=<manifest>.
+
+Usage:
+    python export_models.py waste_detection/waste_yolov8/weights/best.pt
+    python export_models.py best.pt --img-sizes 480 640 --batch-sizes 1 8 --max-drop 0.02
+"""
+
+import json
+import shutil
+import time
+from pathlib import Path
+
+from ultralytics import YOLO
+
+from model_benchmark import measure_latency
+
+# name -> model.export() options (None: the PyTorch weights themselves)
+FORMATS = {
+    'pytorch': None,
+    'torchscript': {'format': 'torchscript'},
+    'onnx': {'format': 'onnx', 'dynamic': True, 'simplify': True},
+    'openvino': {'format': 'openvino', 'dynamic': True},
+    'openvino-int8': {'format': 'openvino', 'dynamic': True, 'int8': True},
+}
+
+
+def read_export_manifest(manifest_path):
+    """
+    Selected artifact of an export manifest
+
+    Returns:
+        (artifact path, img_size)
+    """
+    manifest_path = Path(manifest_path)
+    with open(manifest_path) as f:
+        selected = json.load(f)['selected']
+    if not selected:
+        raise ValueError(f'No artifact in {manifest_path} met the mAP threshold')
+    return str(manifest_path.parent / selected['path']), selected['img_size']
+
+
+def export_artifact(weights, name, img_size, data_yaml, output_dir):
+    """Export one format at one image size into output_dir; returns its path"""
+    options = dict(FORMATS[name])
+    if options.get('int8'):
+        options['data'] = data_yaml
+    exported = Path(YOLO(weights).export(imgsz=img_size, device='cpu', **options))
+
+    # Keep the suffixes ultralytics uses to recognize each format when loading
+    suffix = '_openvino_model' if exported.is_dir() else exported.suffix
+    dest = Path(output_dir) / f'{name}-{img_size}{suffix}'
+    if dest.is_dir():
+        shutil.rmtree(dest)
+    elif dest.exists():
+        dest.unlink()
+    shutil.move(str(exported), dest)
+    return dest
+
+
+def export_matrix(weights, data_yaml='waste_data.yaml', formats=None, img_sizes=(640,),
+                  batch_sizes=(1, 8), min_map=None, max_drop=0.01, output_dir=None):
+    """
+    Export, benchmark, validate and select the fastest acceptable artifact
+
+    Args:
+        weights: Trained .pt weights (e.g. best.pt)
+        data_yaml: Dataset for validation and INT8 calibration
+        formats: Names from FORMATS (default: all)
+        img_sizes: Serving image sizes to export and measure
+        batch_sizes: Serving batch sizes to measure; the first one decides
+            the selection (single images on /detect)
+        min_map: Minimum mAP50-95 to accept an artifact (default: the
+            PyTorch model's mAP50-95 at the largest size minus max_drop)
+        max_drop: Allowed mAP50-95 drop when min_map is not given
+        output_dir: Where to put artifacts and the manifest
+            (default: exports/ next to the weights)
+
+    Returns:
+        The manifest dict
+    """
+    formats = formats or list(FORMATS)
+    output_dir = Path(output_dir or Path(weights).parent / 'exports')
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    candidates = []
+    for img_size in img_sizes:
+        for name in formats:
+            row = {'format': name, 'img_size': img_size, 'latency': {}}
+            candidates.append(row)
+            print(f"\n📦 {name} @ {img_size}...")
+            try:
+                start = time.perf_counter()
+                path = Path(weights) if FORMATS[name] is None else \
+                    export_artifact(weights, name, img_size, data_yaml, output_dir)
+                row['export_seconds'] = round(time.perf_counter() - start, 1)
+                row['path'] = str(path)
+            except Exception as e:
+                print(f"⚠️  Export failed: {e}")
+                row['error'] = f'export: {e}'
+                continue
+
+            try:
+                metrics = YOLO(str(path), task='detect').val(
+                    data=data_yaml, imgsz=img_size, batch=1, device='cpu', plots=False, verbose=False)
+                row['map50'] = round(float(metrics.box.map50), 4)
+                row['map50_95'] = round(float(metrics.box.map), 4)
+            except Exception as e:
+                print(f"⚠️  Validation failed: {e}")
+                row['error'] = f'validation: {e}'
+                continue
+
+            for batch_size in batch_sizes:
+                try:
+                    model = YOLO(str(path), task='detect')
+                    row['latency'][str(batch_size)] = measure_latency(model, img_size, batch_size)
+                except Exception as e:
+                    # e.g. a fixed-batch artifact at another batch size
+                    row['latency'][str(batch_size)] = {'error': str(e)}
+
+    if min_map is None:
+        reference = [r for r in candidates if r['format'] == 'pytorch' and 'map50_95' in r]
+        min_map = max(r['map50_95'] for r in reference) - max_drop if reference else 0.0
+
+    primary = str(batch_sizes[0])
+    for row in candidates:
+        row['passed'] = (
+            'error' not in row and row['map50_95'] >= min_map
+            and 'p50_ms' in row['latency'].get(primary, {})
+        )
+    passing = [r for r in candidates if r['passed']]
+    best = min(passing, key=lambda r: r['latency'][primary]['p50_ms']) if passing else None
+
+    manifest = {
+        'source': str(weights),
+        'data': str(data_yaml),
+        'min_map50_95': round(min_map, 4),
+        'selection_batch_size': batch_sizes[0],
+        'selected': None,
+        'candidates': candidates,
+    }
+    if best:
+        # Relative to the manifest so the exports directory can be moved as a whole
+        path = Path(best['path']).resolve()
+        try:
+            path = path.relative_to(output_dir.resolve())
+        except ValueError:
+            pass
+        manifest['selected'] = {
+            'format': best['format'],
+            'path': str(path),
+            'img_size': best['img_size'],
+            'map50_95': best['map50_95'],
+            'latency_p50_ms': best['latency'][primary]['p50_ms'],
+        }
+
+    with open(output_dir / 'manifest.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print_export_summary(manifest, output_dir / 'manifest.json')
+    return manifest
+
+
+def print_export_summary(manifest, manifest_path):
+    """Print the export matrix and the selected artifact"""
+    print("\n" + "="*60)
+    print("📦 Export Matrix")
+    print("="*60)
+    print(f"mAP50-95 threshold: {manifest['min_map50_95']}")
+    for row in manifest['candidates']:
+        label = f"{row['format']} @ {row['img_size']}"
+        if 'error' in row:
+            print(f"❌ {label}: {row['error']}")
+            continue
+        latency = ', '.join(
+            f"b{b}: {v['p50_ms']} ms" if 'p50_ms' in v else f"b{b}: failed"
+            for b, v in row['latency'].items()
+        )
+        mark = '✅' if row['passed'] else '⚠️ '
+        print(f"{mark} {label}: mAP50-95 {row['map50_95']}  ({latency})")
+
+    selected = manifest['selected']
+    if selected:
+        print(f"\n🏆 Selected: {selected['format']} @ {selected['img_size']} "
+              f"({selected['latency_p50_ms']} ms, mAP50-95 {selected['map50_95']})")
+        print(f"   Serve it with: YOLO_MODEL_MANIFEST={manifest_path} python yolov8_service.py")
+    else:
+        print("\n⚠️  No artifact met the mAP threshold")
+    print("="*60)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export, benchmark and select CPU model formats')
+    parser.add_argument('weights', type=str, help='Trained .pt weights')
+    parser.add_argument('--data', type=str, default='waste_data.yaml',
+                        help='Path to dataset YAML file')
+    parser.add_argument('--formats', type=str, nargs='+', default=list(FORMATS),
+                        choices=list(FORMATS), help='Formats to export')
+    parser.add_argument('--img-sizes', type=int, nargs='+', default=[640],
+                        help='Serving image sizes')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8],
+                        help='Serving batch sizes (the first one decides the selection)')
+    parser.add_argument('--min-map', type=float, default=None,
+                        help='Minimum mAP50-95 (default: PyTorch mAP50-95 minus --max-drop)')
+    parser.add_argument('--max-drop', type=float, default=0.01,
+                        help='Allowed mAP50-95 drop versus PyTorch')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Output directory (default: exports/ next to the weights)')
+
+    args = parser.parse_args()
+
+    export_matrix(args.weights, args.data, args.formats, args.img_sizes, args.batch_sizes,
+                  args.min_map, args.max_drop, args.output)
@@ -0,0 +1,250 @@
+"""
+Memory-mapped pre-resized image cache for CPU training
+
+JPEG decoding dominates dataloader time on CPU-only machines. This decodes
+every dataset image once, resizes it the way the training dataloader
+would (long side to img_size, aspect ratio kept; padding and augmentation
+still happen per batch, so normalized labels stay valid) and stores all
+images back to back in one uint8 file:
+
+    image_cache/images-<img_size>.bin    raw BGR pixels
+    image_cache/images-<img_size>.json   offset index + fingerprint
+
+Training maps the file read-only, so every dataloader worker shares the
+same page-cache pages instead of holding its own decoded copy. The cache is
+rebuilt when the set of images (paths, sizes, mtimes) or img_size changes.
+
+Usage:
+    python image_cache.py --data waste_data.yaml --img-size 640
+    python train_waste_model.py --image-cache
+"""
+
+import hashlib
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from dataset_utils import iter_images, load_dataset_config
+
+CACHE_VERSION = 1
+
+
+def cache_paths(data_yaml, img_size, cache_dir=None):
+    """(bin path, index path) for a dataset and image size"""
+    cache_dir = Path(cache_dir or Path(data_yaml).parent / 'image_cache')
+    return cache_dir / f'images-{img_size}.bin', cache_dir / f'images-{img_size}.json'
+
+
+def _dataset_images(data_yaml):
+    """Real paths of every image in every split, sorted and de-duplicated"""
+    splits, _ = load_dataset_config(data_yaml)
+    images = set()
+    for images_dir in splits.values():
+        images.update(os.path.realpath(p) for p in iter_images(images_dir))
+    return sorted(images)
+
+
+def _fingerprint(images, img_size):
+    digest = hashlib.sha256(f'{CACHE_VERSION}:{img_size}'.encode())
+    for path in images:
+        st = os.stat(path)
+        digest.update(f'{path}\0{st.st_size}\0{st.st_mtime_ns}\n'.encode())
+    return digest.hexdigest()
+
+
+def _decode_resized(args):
+    """Decode one image and resize its long side to img_size (worker process)"""
+    path, img_size = args
+    im = cv2.imread(path)
+    if im is None:
+        return path, None, None
+    h0, w0 = im.shape[:2]
+    # Same rounding as the ultralytics dataloader's load_image
+    r = img_size / max(h0, w0)
+    if r != 1:
+        w, h = min(math.ceil(w0 * r), img_size), min(math.ceil(h0 * r), img_size)
+        im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+    return path, (h0, w0), np.ascontiguousarray(im)
+
+
+def is_cache_current(data_yaml, img_size, cache_dir=None):
+    """True when the cache matches the current images and img_size"""
+    _, index_path = cache_paths(data_yaml, img_size, cache_dir)
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+    return index.get('fingerprint') == _fingerprint(_dataset_images(data_yaml), img_size)
+
+
+def build_image_cache(data_yaml='waste_data.yaml', img_size=640, cache_dir=None, workers=None):
+    """
+    Build (or reuse) the memory-mapped image cache for a dataset
+
+    Args:
+        data_yaml: Dataset configuration file
+        img_size: Training image size
+        cache_dir: Cache directory (default: image_cache/ next to data_yaml)
+        workers: Decoding processes (default: CPU count)
+
+    Returns:
+        Path of the cache index file
+    """
+    bin_path, index_path = cache_paths(data_yaml, img_size, cache_dir)
+    images = _dataset_images(data_yaml)
+    fingerprint = _fingerprint(images, img_size)
+
+    try:
+        with open(index_path) as f:
+            if json.load(f).get('fingerprint') == fingerprint:
+                print(f"✅ Image cache is current: {bin_path}")
+                return str(index_path)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    print(f"\n🗜️  Building image cache for {len(images)} images at img_size={img_size}...")
+    start = time.perf_counter()
+    bin_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_bin = bin_path.with_name(f'{bin_path.name}.{os.getpid()}.tmp')
+
+    entries = {}
+    offset = 0
+    skipped = 0
+    with open(tmp_bin, 'wb') as out, ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = ((path, img_size) for path in images)
+        for done, (path, hw0, im) in enumerate(pool.map(_decode_resized, jobs, chunksize=16), 1):
+            if im is None:
+                skipped += 1
+                continue
+            out.write(im.tobytes())
+            h, w = im.shape[:2]
+            entries[path] = [offset, h, w, hw0[0], hw0[1]]
+            offset += im.nbytes
+            if done % 500 == 0:
+                print(f"\r  {done}/{len(images)} images", end='')
+
+    os.replace(tmp_bin, bin_path)
+    # The index is written last: its fingerprint marks the cache as complete
+    tmp_index = index_path.with_name(f'{index_path.name}.{os.getpid()}.tmp')
+    with open(tmp_index, 'w') as f:
+        json.dump({
+            'version': CACHE_VERSION,
+            'img_size': img_size,
+            'fingerprint': fingerprint,
+            'bytes': offset,
+            'images': entries,
+        }, f)
+    os.replace(tmp_index, index_path)
+
+    print(f"\n✅ Cached {len(entries)} images ({offset / 1024 ** 2:.0f} MB) "
+          f"in {time.perf_counter() - start:.1f}s: {bin_path}")
+    if skipped:
+        print(f"⚠️  {skipped} unreadable image(s) left to the normal loader")
+    return str(index_path)
+
+
+class MmapImageCache:
+    """Read-only view of a built cache; opens the mapping lazily per process"""
+
+    def __init__(self, index_path):
+        self.index_path = Path(index_path)
+        with open(self.index_path) as f:
+            index = json.load(f)
+        self.entries = index['images']
+        self.bin_path = self.index_path.with_suffix('.bin')
+        self._array = None
+        self._pid = None
+
+    def get(self, image_path):
+        """
+        Cached image for a path, or None if it is not cached
+
+        Returns:
+            (BGR array, (h0, w0), (h, w)); the array is a private copy, since
+            training augmentations may modify images in place
+        """
+        entry = self.entries.get(os.path.realpath(image_path))
+        if entry is None:
+            return None
+
+        # Each dataloader worker maps the file itself after fork
+        if self._array is None or self._pid != os.getpid():
+            self._array = np.memmap(self.bin_path, dtype=np.uint8, mode='r')
+            self._pid = os.getpid()
+
+        offset, h, w, h0, w0 = entry
+        im = self._array[offset:offset + h * w * 3].reshape(h, w, 3).copy()
+        return im, (h0, w0), (h, w)
+
+
+def cached_detection_trainer(index_path):
+    """
+    A DetectionTrainer whose datasets read images from the cache
+
+    Pass the result to model.train(trainer=...).
+    """
+    from ultralytics.data.dataset import YOLODataset
+    from ultralytics.models.yolo.detect import DetectionTrainer
+    from ultralytics.utils.torch_utils import de_parallel
+
+    cache = MmapImageCache(index_path)
+
+    class CachedYOLODataset(YOLODataset):
+        def load_image(self, i, rect_mode=True):
+            cached = cache.get(self.im_files[i]) if rect_mode else None
+            if cached is None:
+                return super().load_image(i, rect_mode)
+
+            im, hw0, hw = cached
+            if self.augment:
+                # Keep the mosaic buffer of recently used indices working;
+                # images themselves are re-read from the shared mapping
+                self.buffer.append(i)
+                if len(self.buffer) >= self.max_buffer_length:
+                    self.buffer.pop(0)
+            return im, hw0, hw
+
+    class CachedDetectionTrainer(DetectionTrainer):
+        def build_dataset(self, img_path, mode='train', batch=None):
+            gs = max(int(de_parallel(self.model).stride.max() if self.model else 0), 32)
+            return CachedYOLODataset(
+                img_path=img_path,
+                imgsz=self.args.imgsz,
+                batch_size=batch,
+                augment=mode == 'train',
+                hyp=self.args,
+                rect=self.args.rect or mode == 'val',
+                cache=None,
+                single_cls=self.args.single_cls or False,
+                stride=gs,
+                pad=0.0 if mode == 'train' else 0.5,
+                prefix=f'{mode}: ',
+                task=self.args.task,
+                classes=self.args.classes,
+                data=self.data,
+                fraction=self.args.fraction if mode == 'train' else 1.0,
+            )
+
+    return CachedDetectionTrainer
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build the memory-mapped training image cache')
+    parser.add_argument('--data', type=str, default='waste_data.yaml',
+                        help='Path to dataset YAML file')
+    parser.add_argument('--img-size', type=int, default=640,
+                        help='Training image size')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Decoding processes (default: CPU count)')
+
+    args = parser.parse_args()
+    build_image_cache(args.data, args.img_size, workers=args.workers)
@@ -0,0 +1,127 @@
+"""
+Bounded-memory image ingest for the detection service
+
+Uploads are streamed into a size-capped, per-thread reusable buffer, the
+image header is checked against a pixel budget before anything is decoded,
+and the decoded image is resized into a per-thread preallocated array.
+Memory per worker therefore depends on the configured limits, not on what
+a client sends.
+
+The returned array is a view into the thread's buffer: it is only valid
+until the same thread ingests the next image.
+"""
+
+import io
+import threading
+
+import numpy as np
+from PIL import Image
+
+CHUNK_SIZE = 64 * 1024
+
+_local = threading.local()
+
+
+class IngestError(ValueError):
+    """Upload rejected before inference; `status` is the HTTP status to return"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def read_upload(stream, max_bytes):
+    """
+    Stream an upload into this thread's reusable buffer
+
+    Args:
+        stream: File-like object (e.g. a werkzeug FileStorage stream)
+        max_bytes: Reject uploads larger than this
+
+    Returns:
+        memoryview over the uploaded bytes (valid until the next call)
+    """
+    buffer = getattr(_local, 'upload', None)
+    if buffer is None:
+        buffer = _local.upload = bytearray(CHUNK_SIZE)
+
+    size = 0
+    while True:
+        if size == len(buffer):
+            if size >= max_bytes + 1:
+                raise IngestError(f'Image exceeds upload limit of {max_bytes} bytes', status=413)
+            # Grow geometrically, but never beyond one byte past the cap. A new
+            # bytearray is used because the previous memoryview may still be alive.
+            grown = bytearray(size + min(size, max_bytes + 1 - size))
+            grown[:size] = buffer[:size]
+            buffer = _local.upload = grown
+
+        read = stream.readinto(memoryview(buffer)[size:]) if hasattr(stream, 'readinto') else None
+        if read is None:
+            chunk = stream.read(min(CHUNK_SIZE, len(buffer) - size))
+            read = len(chunk)
+            buffer[size:size + read] = chunk
+        if not read:
+            break
+        size += read
+
+    if size > max_bytes:
+        raise IngestError(f'Image exceeds upload limit of {max_bytes} bytes', status=413)
+
+    return memoryview(buffer)[:size]
+
+
+def _frame_buffer(max_side):
+    """This thread's preallocated HxWx3 array for resized frames"""
+    frame = getattr(_local, 'frame', None)
+    if frame is None or frame.shape[0] != max_side:
+        frame = _local.frame = np.empty((max_side, max_side, 3), dtype=np.uint8)
+    return frame
+
+
+def prepare_image(data, max_pixels, max_side=640):
+    """
+    Validate, decode and downscale an image into this thread's frame buffer
+
+    The header alone is read first, so images declaring more than
+    max_pixels are rejected before any pixel data is decoded. JPEGs are
+    decoded directly at a reduced scale when possible.
+
+    Args:
+        data: Encoded image bytes (bytes or memoryview)
+        max_pixels: Maximum declared width * height
+        max_side: Longest side of the array handed to the model
+
+    Returns:
+        (BGR uint8 array view, scale back to original pixels, (width, height))
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+    except Exception as e:
+        raise IngestError(f'Unreadable image: {e}')
+
+    width, height = image.size
+    if width * height > max_pixels:
+        raise IngestError(
+            f'Image is {width}x{height}, over the {max_pixels} pixel limit', status=413
+        )
+
+    try:
+        image.draft('RGB', (max_side, max_side))
+        image = image.convert('RGB')
+        scale = max(width, height) / max_side
+        if scale > 1:
+            target = (max(1, round(width / scale)), max(1, round(height / scale)))
+            image = image.resize(target, Image.BILINEAR)
+        else:
+            scale = 1.0
+    except Image.DecompressionBombError as e:
+        raise IngestError(str(e), status=413)
+    except OSError as e:
+        raise IngestError(f'Corrupt image: {e}')
+
+    out_w, out_h = image.size
+    frame = _frame_buffer(max_side)[:out_h, :out_w]
+    # Ultralytics expects numpy input in BGR channel order
+    np.copyto(frame, np.asarray(image)[..., ::-1])
+    return frame, scale, (width, height)
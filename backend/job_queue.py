@@ -0,0 +1,400 @@
+"""
+Persistent queue for long-running detection jobs
+
+Large submissions (videos, image folders, batches of uploads) are queued
+instead of being processed while an HTTP connection waits. Clients submit
+a job, get its ID back at once, and poll for progress and the result (or
+receive it at a callback URL).
+
+Jobs live in a local SQLite database, so queued jobs survive a restart and
+several service processes on one host can share one queue. Each process
+claims jobs under a random owner token; PIDs are not used because a
+restarted container usually gets its predecessor's PID. A running job whose
+owner has not reported progress for stale_seconds is requeued (checked at
+startup and then once a minute), so a crashed process's jobs are picked up
+again while a live sibling process keeps its own. Worker threads
+take the highest-priority job first (oldest first within a priority).
+Before each unit of work a job waits for the InteractiveGate, so requests
+that a user is waiting on (/detect, /detect-multiple) are never stuck
+behind bulk work. Finished jobs are kept for result_ttl seconds.
+
+Job states: queued -> running -> done | failed | cancelled
+"""
+
+import atexit
+import json
+import shutil
+import sqlite3
+import threading
+import time
+import urllib.request
+import uuid
+from pathlib import Path
+
+STATUSES = ('queued', 'running', 'done', 'failed', 'cancelled')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    callback_url TEXT,
+    progress_done INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER,
+    result TEXT,
+    error TEXT,
+    owner TEXT,
+    heartbeat_at REAL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, priority DESC, created_at);
+CREATE INDEX IF NOT EXISTS jobs_expiry ON jobs (expires_at);
+"""
+
+
+class JobCancelled(Exception):
+    """Raised from a job's progress callback once the job has been cancelled"""
+
+
+class JobLost(JobCancelled):
+    """Raised from a job's progress callback once another process has taken the job over"""
+
+
+class InteractiveGate:
+    """
+    Lets background jobs step aside while interactive requests run
+
+    Interactive requests wrap their work in `with gate:`. Jobs call
+    wait_idle() between units of work and continue once no interactive
+    request is in flight, or after max_wait seconds so a steady stream of
+    requests can slow jobs down but not starve them.
+    """
+
+    def __init__(self, max_wait=5.0):
+        self.max_wait = max_wait
+        self._active = 0
+        self._idle = threading.Condition()
+
+    def __enter__(self):
+        with self._idle:
+            self._active += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._idle:
+            self._active -= 1
+            if self._active == 0:
+                self._idle.notify_all()
+
+    def wait_idle(self):
+        with self._idle:
+            self._idle.wait_for(lambda: self._active == 0, timeout=self.max_wait)
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue with a pool of worker threads
+
+    Args:
+        job_dir: Directory holding jobs.db and the uploaded inputs of each job
+        handlers: {kind: handler(params, input_dir, progress) -> result dict}.
+            Handlers call progress(done, total) between units of work; it
+            waits for the gate and raises JobCancelled when the job is cancelled.
+        workers: Worker threads
+        result_ttl: Seconds a finished job and its result are kept
+        gate: InteractiveGate that jobs yield to (optional)
+        poll_seconds: How often idle workers look for jobs submitted by
+            other processes
+        stale_seconds: Requeue a running job whose owner has not reported
+            progress for this long
+    """
+
+    def __init__(self, job_dir, handlers, workers=1, result_ttl=24 * 3600, gate=None,
+                 poll_seconds=1.0, stale_seconds=600):
+        self.job_dir = Path(job_dir)
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.job_dir / 'jobs.db'
+        self.handlers = handlers
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.gate = gate
+        self.poll_seconds = poll_seconds
+        self.stale_seconds = stale_seconds
+        # Identifies this process's claims; unique even when PIDs are reused
+        self.owner = uuid.uuid4().hex
+
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._next_sweep = 0.0
+
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(_SCHEMA)
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+        if 'heartbeat_at' not in columns:
+            conn.execute('ALTER TABLE jobs ADD COLUMN heartbeat_at REAL')
+        # Other tokens may belong to live sibling processes: only take back
+        # jobs whose owner has stopped reporting
+        self._requeue_orphans(stale_before=time.time() - self.stale_seconds)
+
+    def start(self):
+        """Start the worker threads"""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        atexit.register(self.close)
+
+    def close(self):
+        """Stop taking jobs; a running job is requeued if the process exits first"""
+        self._stop.set()
+        self._wake.set()
+
+    def new_job_id(self):
+        return uuid.uuid4().hex
+
+    def input_dir(self, job_id):
+        """Directory for a job's uploaded files (removed when the job finishes)"""
+        return self.job_dir / 'inputs' / job_id
+
+    def submit(self, kind, params, priority=0, callback_url=None, job_id=None):
+        """
+        Queue a job
+
+        Args:
+            kind: Handler name
+            params: JSON-serializable handler parameters
+            priority: Higher runs first
+            callback_url: http(s) URL that receives the finished job as JSON
+            job_id: ID from new_job_id(), when inputs were stored beforehand
+
+        Returns:
+            Job ID
+        """
+        if kind not in self.handlers:
+            raise ValueError(f'Unknown job type: {kind}')
+        if callback_url and not callback_url.startswith(('http://', 'https://')):
+            raise ValueError('callback_url must be an http(s) URL')
+        job_id = job_id or self.new_job_id()
+        self._conn().execute(
+            'INSERT INTO jobs (id, kind, priority, status, params, callback_url, created_at) '
+            "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+            (job_id, kind, int(priority), json.dumps(params), callback_url, time.time())
+        )
+        self._wake.set()
+        return job_id
+
+    def get(self, job_id, include_result=True):
+        """Job record as a dict, or None when unknown or expired"""
+        row = self._conn().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._describe(row, include_result) if row else None
+
+    def cancel(self, job_id):
+        """
+        Cancel a job: queued jobs stop at once, running ones at their next
+        progress report
+
+        Returns:
+            Job record after the request, or None when unknown
+        """
+        conn = self._conn()
+        conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ?, expires_at = ? "
+            "WHERE id = ? AND status = 'queued'",
+            (time.time(), time.time() + self.result_ttl, job_id)
+        )
+        conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id, include_result=False)
+
+    def stats(self):
+        counts = dict.fromkeys(STATUSES, 0)
+        for status, count in self._conn().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status'):
+            counts[status] = count
+        return {
+            'enabled': True,
+            'directory': str(self.job_dir),
+            'workers': len(self._threads),
+            'result_ttl': self.result_ttl,
+            **counts,
+        }
+
+    def _conn(self):
+        # One connection per thread, in autocommit mode
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _describe(self, row, include_result=True):
+        job = {
+            'job_id': row['id'],
+            'type': row['kind'],
+            'status': row['status'],
+            'priority': row['priority'],
+            'progress': {
+                'done': row['progress_done'],
+                'total': row['progress_total'],
+                'percent': round(row['progress_done'] / row['progress_total'] * 100, 1)
+                if row['progress_total'] else None,
+            },
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+            'expires_at': row['expires_at'],
+        }
+        if row['error']:
+            job['error'] = row['error']
+        if include_result and row['result'] is not None:
+            job['result'] = json.loads(row['result'])
+        return job
+
+    def _requeue_orphans(self, stale_before):
+        """
+        Put back running jobs of other owners that stopped reporting
+
+        Args:
+            stale_before: Only jobs whose last heartbeat is older than this timestamp
+        """
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT id, owner FROM jobs WHERE status = 'running' AND owner IS NOT ? "
+            "AND COALESCE(heartbeat_at, 0) < ?",
+            (self.owner, stale_before)
+        ).fetchall()
+        for row in rows:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, started_at = NULL, "
+                "heartbeat_at = NULL, progress_done = 0 WHERE id = ? AND status = 'running' AND owner IS ?",
+                (row['id'], row['owner'])
+            )
+            print(f"♻️  Requeued job {row['id']} (its worker is gone)")
+
+    def _sweep(self):
+        """Drop expired jobs and requeue orphans, at most once a minute"""
+        now = time.time()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + 60
+        conn = self._conn()
+        expired = [row['id'] for row in conn.execute(
+            'SELECT id FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?', (now,))]
+        for job_id in expired:
+            conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+            shutil.rmtree(self.input_dir(job_id), ignore_errors=True)
+        self._requeue_orphans(stale_before=now - self.stale_seconds)
+
+    def _claim(self):
+        """Mark the next queued job as running by this process; None when there is none"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created_at LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                now = time.time()
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', owner = ?, started_at = ?, heartbeat_at = ? "
+                    "WHERE id = ?",
+                    (self.owner, now, now, row['id'])
+                )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return row
+
+    def _progress_callback(self, job_id):
+        conn = self._conn()
+        last_write = 0.0
+
+        def progress(done, total=None):
+            nonlocal last_write
+            if self.gate is not None:
+                self.gate.wait_idle()
+            now = time.monotonic()
+            if now - last_write < 0.5 and done != total:
+                return
+            last_write = now
+            updated = conn.execute(
+                "UPDATE jobs SET progress_done = ?, progress_total = ?, heartbeat_at = ? "
+                "WHERE id = ? AND status = 'running' AND owner = ?",
+                (done, total, time.time(), job_id, self.owner)
+            ).rowcount
+            if not updated:
+                raise JobLost()
+            row = conn.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row['cancel_requested']:
+                raise JobCancelled()
+
+        return progress
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._sweep()
+                row = self._claim()
+            except sqlite3.Error as e:
+                print(f"⚠️  Job queue error: {e}")
+                row = None
+            if row is None:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+                continue
+            self._execute(row)
+
+    def _execute(self, row):
+        job_id = row['id']
+        result, error = None, None
+        start = time.perf_counter()
+        try:
+            result = self.handlers[row['kind']](
+                json.loads(row['params']), self.input_dir(job_id), self._progress_callback(job_id))
+            status = 'done'
+        except JobLost:
+            # Requeued (e.g. after a stall) or expired: the new owner reports it
+            print(f"⚠️  Job {job_id} was taken over by another worker, dropped here")
+            return
+        except JobCancelled:
+            status = 'cancelled'
+        except Exception as e:
+            status, error = 'failed', str(e)
+            print(f"❌ Job {job_id} ({row['kind']}) failed: {e}")
+
+        now = time.time()
+        updated = self._conn().execute(
+            'UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, expires_at = ?, '
+            'progress_done = CASE WHEN ? = \'done\' THEN COALESCE(progress_total, progress_done) '
+            "ELSE progress_done END WHERE id = ? AND status = 'running' AND owner = ?",
+            (status, json.dumps(result) if result is not None else None, error, now,
+             now + self.result_ttl, status, job_id, self.owner)
+        ).rowcount
+        if not updated:
+            print(f"⚠️  Job {job_id} was taken over by another worker, result dropped here")
+            return
+        shutil.rmtree(self.input_dir(job_id), ignore_errors=True)
+        print(f"📋 Job {job_id} ({row['kind']}) {status} in {time.perf_counter() - start:.1f}s")
+
+        if row['callback_url']:
+            self._send_callback(row['callback_url'], self.get(job_id))
+
+    def _send_callback(self, url, job):
+        request = urllib.request.Request(
+            url, data=json.dumps(job).encode(), headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10):
+                pass
+        except Exception as e:
+            print(f"⚠️  Callback for job {job['job_id']} to {url} failed: {e}")
@@ -0,0 +1,165 @@
+"""
+Lean-memory model loading for dense CPU deployments
+
+Loads YOLO weights in inference-only form so many service workers fit on
+one host:
+- Conv+BatchNorm layers are fused and autograd is switched off
+- Weights can be held in bf16/fp16 (inputs and outputs stay float32)
+- Fused weights are written once to <weights>.lean-<dtype>.pt and every
+  worker memory-maps that file read-only, so the weight pages live once in
+  the page cache and are shared by all workers (needs torch>=2.1)
+
+Usage:
+    YOLO_LEAN=1 YOLO_LEAN_DTYPE=bf16 python yolov8_service.py
+    python lean_model.py yolov8n.pt --dtype bf16    # prepare file and report memory
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+DTYPES = {
+    'fp32': torch.float32,
+    'bf16': torch.bfloat16,
+    'fp16': torch.float16,
+}
+
+
+def memory_report():
+    """
+    Resident, proportional and shared memory of this process, in MB
+
+    Uses /proc/self/smaps_rollup on Linux; elsewhere only peak RSS is known.
+    """
+    report = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+        shared = fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)
+        private = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+        report = {
+            'rss_mb': round(fields.get('Rss', 0) / 1024, 1),
+            'pss_mb': round(fields.get('Pss', 0) / 1024, 1),
+            'shared_mb': round(shared / 1024, 1),
+            'private_mb': round(private / 1024, 1),
+        }
+    except OSError:
+        if sys.platform == 'win32':
+            return report  # no resource module
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and kB elsewhere
+        report = {'peak_rss_mb': round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)}
+    return report
+
+
+def _cast_floats(value, dtype):
+    """Cast every floating tensor in a (nested) model output to dtype"""
+    if isinstance(value, torch.Tensor):
+        return value.to(dtype) if value.is_floating_point() else value
+    if isinstance(value, (list, tuple)):
+        return type(value)(_cast_floats(v, dtype) for v in value)
+    if isinstance(value, dict):
+        return {k: _cast_floats(v, dtype) for k, v in value.items()}
+    return value
+
+
+def _wrap_forward(net, dtype):
+    """Run net in dtype while callers keep sending and receiving float32"""
+    inner_forward = net.forward
+
+    def forward(x, *args, **kwargs):
+        return _cast_floats(inner_forward(x.to(dtype), *args, **kwargs), torch.float32)
+
+    net.forward = forward
+
+
+def _write_atomic(state_dict, path):
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    torch.save(state_dict, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_lean_model(weights, dtype='fp32', task=None):
+    """
+    Load a YOLO model for inference only, with shared memory-mapped weights
+
+    Args:
+        weights: Path to .pt weights
+        dtype: 'fp32', 'bf16' or 'fp16' for the stored weights
+        task: Optional ultralytics task (e.g. 'classify')
+
+    Returns:
+        A ready-to-call YOLO model
+    """
+    torch_dtype = DTYPES[dtype]
+    torch.set_grad_enabled(False)
+
+    model = YOLO(weights, task=task)
+    if hasattr(model.model, 'fuse'):
+        model.fuse()
+
+    # Build the predictor now: its setup casts the network to float32, which
+    # would undo a reduced-precision load done any earlier
+    model(np.zeros((64, 64, 3), dtype=np.uint8), verbose=False)
+    net = model.predictor.model.model
+    net.eval()
+    net.requires_grad_(False)
+
+    # Weights fetched by name (e.g. 'yolov8n.pt') may have been downloaded elsewhere
+    source = Path(getattr(model, 'ckpt_path', None) or weights)
+    lean_path = source.with_suffix(f'.lean-{dtype}.pt')
+    if not lean_path.exists() or lean_path.stat().st_mtime < source.stat().st_mtime:
+        state_dict = {
+            name: (t.to(torch_dtype) if t.is_floating_point() else t).contiguous()
+            for name, t in net.state_dict().items()
+        }
+        _write_atomic(state_dict, lean_path)
+
+    try:
+        state_dict = torch.load(lean_path, mmap=True, weights_only=True)
+        net.load_state_dict(state_dict, assign=True)
+        shared = True
+    except TypeError:
+        # torch<2.1 has neither mmap loading nor assign: keep private weights
+        net.to(torch_dtype)
+        shared = False
+
+    net.requires_grad_(False)
+    if torch_dtype != torch.float32:
+        _wrap_forward(net, torch_dtype)
+
+    model.lean_info = {
+        'dtype': dtype,
+        'fused': True,
+        'shared_weights': str(lean_path) if shared else None,
+    }
+    return model
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Prepare lean weights and report per-worker memory')
+    parser.add_argument('weights', type=str, help='Path to .pt weights')
+    parser.add_argument('--dtype', type=str, default='fp32', choices=list(DTYPES),
+                        help='Stored weight precision')
+
+    args = parser.parse_args()
+
+    before = memory_report()
+    model = load_lean_model(args.weights, args.dtype)
+    after = memory_report()
+
+    print(f"\n📦 Lean model: {args.weights} ({args.dtype})")
+    print(f"   Shared weights: {model.lean_info['shared_weights'] or 'not supported by this torch'}")
+    print(f"   Memory before load: {before}")
+    print(f"   Memory after load:  {after}")
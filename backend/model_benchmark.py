@@ -0,0 +1,61 @@
+"""
+CPU latency measurement for YOLO model artifacts
+
+Shared by the training, sweep and model-comparison tools so every report
+measures latency the same way: synthetic frames, warm-up runs first, then
+timed runs reported as percentiles.
+"""
+
+import time
+
+import numpy as np
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def measure_latency(model, img_size=640, batch_size=1, runs=20, warmup=3):
+    """
+    Time inference on synthetic frames
+
+    Args:
+        model: Loaded ultralytics YOLO model (any exported format)
+        img_size: Square input size
+        batch_size: Images per call
+        runs: Timed calls
+        warmup: Untimed calls first
+
+    Returns:
+        Dict with per-batch p50/p95/mean latency (ms) and images per second
+    """
+    rng = np.random.default_rng(0)
+    batch = [
+        rng.integers(0, 255, (img_size, img_size, 3), dtype=np.uint8)
+        for _ in range(batch_size)
+    ]
+    source = batch if batch_size > 1 else batch[0]
+
+    for _ in range(warmup):
+        model.predict(source, imgsz=img_size, verbose=False)
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model.predict(source, imgsz=img_size, verbose=False)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    mean_ms = sum(timings) / len(timings)
+    return {
+        'batch_size': batch_size,
+        'img_size': img_size,
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'mean_ms': round(mean_ms, 2),
+        'images_per_second': round(batch_size * 1000 / mean_ms, 2),
+    }
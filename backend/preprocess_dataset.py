@@ -0,0 +1,246 @@
+"""
+Downscale and re-encode a YOLO dataset for training
+
+Phone photos are often 4000 px wide while training runs at img_size=640, so
+every epoch decodes many times more pixels than the model sees. This writes
+a copy of the dataset where every image:
+- has its long side capped at img_size * max_side_factor (never upscaled)
+- has its EXIF orientation applied to the pixels (and the tag dropped)
+- is re-encoded as JPEG at a fixed quality
+
+YOLO labels are normalized to the image size, so they are copied unchanged.
+The copy gets its own data.yaml:
+
+    <dataset>_<max side>/data.yaml
+
+Work is spread over a process pool. A manifest (preprocess.json in the
+output) records each source file's size and mtime, so re-runs only process
+new or changed files and drop outputs whose source is gone.
+
+Usage:
+    python preprocess_dataset.py --data waste_data.yaml --img-size 640
+    python train_waste_model.py --data dataset_640/data.yaml
+"""
+
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import yaml
+from PIL import Image, ImageOps
+
+from dataset_utils import file_stamp, iter_images, label_path_for, load_dataset_config
+
+MANIFEST_VERSION = 1
+
+
+def resize_image(args):
+    """
+    Downscale, orient and re-encode one image (runs in a worker process)
+
+    Args:
+        args: (source path, output path, max side, JPEG quality)
+
+    Returns:
+        (original (w, h), new (w, h)), or (None, error message)
+    """
+    source, output, max_side, quality = args
+    try:
+        with Image.open(source) as image:
+            original = image.size
+            if image.getexif().get(0x0112) in (5, 6, 7, 8):  # rotated 90 degrees
+                original = original[::-1]
+            # JPEG: let the decoder skip pixels when the image is far larger than needed
+            image.draft('RGB', (max_side, max_side))
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            scale = max_side / max(image.size)
+            if scale < 1:
+                size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+                image = image.resize(size, Image.LANCZOS)
+
+            tmp_path = f'{output}.{os.getpid()}.tmp'
+            image.save(tmp_path, 'JPEG', quality=quality, optimize=True)
+            os.replace(tmp_path, output)
+            return original, image.size
+    except Exception as e:
+        return None, str(e)
+
+
+def _load_manifest(manifest_path):
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return {'version': MANIFEST_VERSION, 'images': {}}
+
+
+def _write_manifest(manifest, manifest_path):
+    tmp_path = Path(f'{manifest_path}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    os.replace(tmp_path, manifest_path)
+
+
+def _split_layout(data_yaml, output_dir):
+    """(split, source images dir, output images dir) for every split"""
+    splits, _ = load_dataset_config(data_yaml)
+    layout = []
+    for split, images_dir in splits.items():
+        images_dir = Path(images_dir)
+        # Keep the source's split/images layout so the YAML paths stay the same
+        relative = Path(images_dir.parent.name) / images_dir.name
+        layout.append((split, images_dir, Path(output_dir) / relative))
+    return layout
+
+
+def preprocess_dataset(data_yaml='waste_data.yaml', img_size=640, max_side_factor=1.0,
+                       quality=90, output_dir=None, workers=None):
+    """
+    Write a downscaled, re-encoded copy of a dataset
+
+    Args:
+        data_yaml: Dataset configuration file
+        img_size: Training image size
+        max_side_factor: Long side cap relative to img_size (1.0 keeps exactly
+            what the dataloader uses; more leaves room for a larger img_size)
+        quality: JPEG quality
+        output_dir: Output dataset root (default: <dataset root>_<max side>)
+        workers: Worker processes (default: CPU count)
+
+    Returns:
+        Path of the new dataset YAML
+    """
+    start = time.perf_counter()
+    max_side = round(img_size * max_side_factor)
+    with open(data_yaml) as f:
+        config = yaml.safe_load(f)
+    splits, _ = load_dataset_config(data_yaml)
+    source_root = Path(next(iter(splits.values()))).parent.parent
+    output_dir = Path(output_dir or f'{source_root}_{max_side}').resolve()
+    if output_dir == source_root.resolve():
+        raise ValueError('Output must be a new directory, not the source dataset')
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest_path = output_dir / 'preprocess.json'
+    manifest = _load_manifest(manifest_path)
+    settings = [max_side, quality]
+    old_images = manifest['images'] if manifest.get('settings') == settings else {}
+
+    new_images = {}
+    todo = []
+    labels = []
+    collisions = []
+    for split, images_dir, out_images in _split_layout(data_yaml, output_dir):
+        out_images.mkdir(parents=True, exist_ok=True)
+        label_path_for(out_images / 'x.jpg').parent.mkdir(parents=True, exist_ok=True)
+        seen = set()
+        for image_path in iter_images(images_dir):
+            output = out_images / f'{image_path.stem}.jpg'
+            if output in seen:
+                collisions.append(str(image_path))
+                continue
+            seen.add(output)
+            key = str(image_path)
+            stamp = file_stamp(image_path)
+            cached = old_images.get(key)
+            if cached and cached['stamp'] == stamp and output.exists():
+                new_images[key] = cached
+            else:
+                todo.append((key, str(output), stamp))
+            labels.append((label_path_for(image_path), label_path_for(output)))
+
+    # Labels are normalized: copy them as they are
+    for source, output in labels:
+        if source.exists():
+            if file_stamp(source) != file_stamp(output):
+                shutil.copy2(source, output)
+        elif output.exists():
+            output.unlink()
+
+    failed = []
+    if todo:
+        print(f"\n🖼️  Re-encoding {len(todo)} image(s) to max side {max_side} "
+              f"({len(new_images)} unchanged, skipped)...")
+        jobs = [(key, output, max_side, quality) for key, output, _ in todo]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for done, ((key, output, stamp), (original, result)) in enumerate(
+                    zip(todo, pool.map(resize_image, jobs, chunksize=8)), 1):
+                if original is None:
+                    failed.append(f'{key}: {result}')
+                else:
+                    new_images[key] = {'stamp': stamp, 'output': output,
+                                       'original': list(original), 'size': list(result)}
+                if done % 100 == 0 or done == len(todo):
+                    print(f"\r  {done}/{len(todo)} images ({done / len(todo) * 100:.0f}%)", end='')
+        print()
+
+    # Outputs whose source disappeared since the last run
+    current = {entry['output'] for entry in new_images.values()}
+    removed = 0
+    for key, entry in old_images.items():
+        if key not in new_images and entry['output'] not in current and os.path.exists(entry['output']):
+            os.remove(entry['output'])
+            label = label_path_for(entry['output'])
+            if label.exists():
+                label.unlink()
+            removed += 1
+
+    manifest.update(settings=settings, source=str(Path(data_yaml).resolve()), images=new_images)
+    _write_manifest(manifest, manifest_path)
+
+    # Same YAML, pointed at the copy (ultralytics label caches are per dataset root)
+    config['path'] = str(output_dir)
+    for split, images_dir, out_images in _split_layout(data_yaml, output_dir):
+        config[split] = str(out_images.relative_to(output_dir))
+    out_yaml = output_dir / 'data.yaml'
+    with open(out_yaml, 'w') as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+
+    pixels_before = sum(e['original'][0] * e['original'][1] for e in new_images.values())
+    pixels_after = sum(e['size'][0] * e['size'][1] for e in new_images.values())
+    print(f"✅ {len(new_images)} images in {time.perf_counter() - start:.1f}s "
+          f"({pixels_before / max(pixels_after, 1):.1f}x fewer pixels to decode): {out_yaml}")
+    if removed:
+        print(f"🗑️  Removed {removed} output(s) whose source is gone")
+    if collisions:
+        print(f"⚠️  {len(collisions)} image(s) skipped: same name as another image in their split")
+    if failed:
+        print(f"⚠️  {len(failed)} unreadable image(s) skipped:")
+        for message in failed[:10]:
+            print(f"  - {message}")
+    return str(out_yaml)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Downscale and re-encode a YOLO dataset')
+    parser.add_argument('--data', type=str, default='waste_data.yaml',
+                        help='Path to dataset YAML file')
+    parser.add_argument('--img-size', type=int, default=640,
+                        help='Training image size')
+    parser.add_argument('--max-side-factor', type=float, default=1.0,
+                        help='Long side cap relative to --img-size')
+    parser.add_argument('--quality', type=int, default=90,
+                        help='JPEG quality')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Output dataset root (default: <dataset root>_<max side>)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes (default: CPU count)')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        print(f"❌ Dataset configuration file not found: {args.data}")
+        sys.exit(1)
+
+    out_yaml = preprocess_dataset(args.data, args.img_size, args.max_side_factor,
+                                  args.quality, args.output, args.workers)
+    print(f"   Train on it with: python train_waste_model.py --data {out_yaml}")
@@ -0,0 +1,360 @@
+"""
+Offline video and image-sequence waste detection
+
+Processes a local video file or a directory of frames as a streaming
+generator pipeline:
+
+    decode -> sample (every Nth frame or on scene change) -> batch inference
+    -> IoU tracking -> per-object summary
+
+Only the current batch and the currently active tracks are held in memory,
+so hour-long inputs run in bounded memory. Each tracked object is counted
+once, however many sampled frames it appears in.
+
+Usage:
+    python process_video.py street.mp4
+    python process_video.py frames_dir/ --every 5 --batch 8 --objects objects.jsonl
+    python process_video.py street.mp4 --model waste_detection/waste_yolov8/weights/best.pt
+"""
+
+import json
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from waste_categories import get_waste_info
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+
+def iter_frames(source):
+    """
+    Decode frames one at a time from a video file or a frame directory
+
+    Yields:
+        (frame_index, timestamp_seconds or None, BGR frame)
+    """
+    source = Path(source)
+
+    if source.is_dir():
+        paths = sorted(p for p in source.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        for index, path in enumerate(paths):
+            frame = cv2.imread(str(path))
+            if frame is not None:
+                yield index, None, frame
+        return
+
+    capture = cv2.VideoCapture(str(source))
+    if not capture.isOpened():
+        raise ValueError(f'Cannot open video: {source}')
+
+    fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+    index = 0
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            yield index, (index / fps if fps else None), frame
+            index += 1
+    finally:
+        capture.release()
+
+
+def count_frames(source):
+    """Number of frames in a video file or frame directory (None if unknown)"""
+    source = Path(source)
+    if source.is_dir():
+        return sum(1 for p in source.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    capture = cv2.VideoCapture(str(source))
+    try:
+        count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    finally:
+        capture.release()
+    return count or None
+
+
+def sample_frames(frames, every_n=10, scene_threshold=0.25):
+    """
+    Keep every Nth frame, plus any frame that starts a new scene
+
+    Scene changes are detected by the mean absolute difference between
+    32x32 grayscale thumbnails of the frame and the last kept frame
+    (0-1 scale). Set scene_threshold to 0 to disable.
+    """
+    last_thumb = None
+    for index, timestamp, frame in frames:
+        thumb = None
+        keep = index % every_n == 0
+
+        if scene_threshold > 0:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            thumb = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+            if not keep and last_thumb is not None:
+                keep = np.mean(np.abs(thumb - last_thumb)) / 255.0 > scene_threshold
+
+        if keep:
+            last_thumb = thumb
+            yield index, timestamp, frame
+
+
+def batch_frames(frames, batch_size=8):
+    """Group sampled frames into lists of at most batch_size"""
+    batch = []
+    for item in frames:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def detect_batches(batches, model, conf=0.3):
+    """
+    Run batched inference on each group of frames
+
+    Yields:
+        (frame_index, timestamp, [(class_name, confidence, (x1, y1, x2, y2)), ...])
+    """
+    for batch in batches:
+        results = model([frame for _, _, frame in batch], conf=conf, verbose=False)
+        for (index, timestamp, _), result in zip(batch, results):
+            detections = []
+            if len(result.boxes) > 0:
+                confidences = result.boxes.conf.cpu().numpy()
+                classes = result.boxes.cls.cpu().numpy().astype(int)
+                coords = result.boxes.xyxy.cpu().numpy()
+                for confidence, class_id, box in zip(confidences, classes, coords):
+                    detections.append((result.names[class_id], float(confidence), tuple(box.tolist())))
+            yield index, timestamp, detections
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x1, y1, x2, y2) boxes"""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / (area_a + area_b - inter)
+
+
+def track_objects(frame_detections, iou_threshold=0.3, max_age=3):
+    """
+    Link detections across sampled frames into objects
+
+    A detection joins the best-overlapping active track of the same class;
+    otherwise it starts a new one. Tracks not matched for max_age sampled
+    frames are finished and yielded, so only live tracks stay in memory.
+
+    Yields:
+        Finished track dicts
+    """
+    active = []
+    next_id = 1
+
+    def finish(track):
+        track['max_confidence'] = round(track['max_confidence'], 4)
+        del track['box'], track['age']
+        return track
+
+    for index, timestamp, detections in frame_detections:
+        unmatched = list(range(len(active)))
+
+        for class_name, confidence, box in sorted(detections, key=lambda d: -d[1]):
+            best, best_iou = None, iou_threshold
+            for i in unmatched:
+                track = active[i]
+                if track['class'] != class_name:
+                    continue
+                iou = box_iou(track['box'], box)
+                if iou >= best_iou:
+                    best, best_iou = i, iou
+
+            if best is None:
+                active.append({
+                    'id': next_id,
+                    'class': class_name,
+                    'first_frame': index,
+                    'last_frame': index,
+                    'first_time': timestamp,
+                    'hits': 1,
+                    'max_confidence': confidence,
+                    'box': box,
+                    'age': 0,
+                })
+                next_id += 1
+            else:
+                unmatched.remove(best)
+                track = active[best]
+                track['box'] = box
+                track['last_frame'] = index
+                track['hits'] += 1
+                track['age'] = 0
+                track['max_confidence'] = max(track['max_confidence'], confidence)
+
+        survivors = []
+        for i, track in enumerate(active):
+            if i in unmatched:
+                track['age'] += 1
+                if track['age'] > max_age:
+                    yield finish(track)
+                    continue
+            survivors.append(track)
+        active = survivors
+
+    for track in active:
+        yield finish(track)
+
+
+def process_video(
+    source,
+    model,
+    every_n=10,
+    scene_threshold=0.25,
+    batch_size=8,
+    conf=0.3,
+    min_hits=1,
+    objects_out=None,
+    progress=None
+):
+    """
+    Count unique waste objects in a video file or frame directory
+
+    Args:
+        source: Video file or directory of frames
+        model: Loaded YOLO model
+        every_n: Sample every Nth frame
+        scene_threshold: Also sample on scene change (0 disables)
+        batch_size: Frames per inference batch
+        conf: Detection confidence threshold
+        min_hits: Ignore objects seen in fewer sampled frames than this
+        objects_out: Optional JSONL path receiving one line per counted object
+        progress: Optional callable(frames_decoded, total_frames) called
+            before each inference batch
+
+    Returns:
+        Summary dict with per-class and per-category object counts
+    """
+    # every_n=0 would divide by zero, batch_size<=0 never flush a batch
+    for name, value in (('every_n', every_n), ('batch_size', batch_size), ('min_hits', min_hits)):
+        if value < 1:
+            raise ValueError(f'{name} must be at least 1, got {value}')
+
+    stats = {'frames_decoded': 0, 'frames_sampled': 0}
+    start = time.perf_counter()
+
+    def counted(frames, key):
+        for item in frames:
+            stats[key] += 1
+            yield item
+
+    decoded = counted(iter_frames(source), 'frames_decoded')
+    sampled = counted(sample_frames(decoded, every_n, scene_threshold), 'frames_sampled')
+    batches = batch_frames(sampled, batch_size)
+    if progress is not None:
+        total = count_frames(source)
+
+        def reported(batches):
+            for batch in batches:
+                progress(stats['frames_decoded'], total)
+                yield batch
+
+        batches = reported(batches)
+    detections = detect_batches(batches, model, conf)
+    tracks = track_objects(detections)
+
+    by_class = {}
+    by_category = {}
+    objects_file = open(objects_out, 'w') if objects_out else None
+    try:
+        for track in tracks:
+            if track['hits'] < min_hits:
+                continue
+            category = get_waste_info(track['class'])['category']
+            track['category'] = category
+            by_class[track['class']] = by_class.get(track['class'], 0) + 1
+            by_category[category] = by_category.get(category, 0) + 1
+            if objects_file:
+                objects_file.write(json.dumps(track) + '\n')
+    finally:
+        if objects_file:
+            objects_file.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        'source': str(source),
+        'frames_decoded': stats['frames_decoded'],
+        'frames_sampled': stats['frames_sampled'],
+        'objects': sum(by_class.values()),
+        'by_class': dict(sorted(by_class.items(), key=lambda kv: -kv[1])),
+        'by_category': dict(sorted(by_category.items(), key=lambda kv: -kv[1])),
+        'elapsed_seconds': round(elapsed, 2),
+        'frames_per_second': round(stats['frames_decoded'] / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def main():
+    """Main function"""
+    import argparse
+    from ultralytics import YOLO
+
+    parser = argparse.ArgumentParser(description='Count waste objects in a video or frame directory')
+    parser.add_argument('source', type=str, help='Video file or directory of frames')
+    parser.add_argument('--model', type=str, default='yolov8n.pt',
+                        help='Path to model weights')
+    parser.add_argument('--every', type=int, default=10,
+                        help='Sample every Nth frame')
+    parser.add_argument('--scene-threshold', type=float, default=0.25,
+                        help='Also sample on scene change (0-1, 0 disables)')
+    parser.add_argument('--batch', type=int, default=8,
+                        help='Frames per inference batch')
+    parser.add_argument('--conf', type=float, default=0.3,
+                        help='Confidence threshold (0-1)')
+    parser.add_argument('--min-hits', type=int, default=1,
+                        help='Minimum sampled frames an object must appear in')
+    parser.add_argument('--objects', type=str, default=None,
+                        help='Write one JSON line per counted object to this file')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write the summary JSON to this file')
+
+    args = parser.parse_args()
+
+    print(f"\n📦 Loading model: {args.model}")
+    model = YOLO(args.model)
+
+    print(f"🎬 Processing: {args.source}")
+    summary = process_video(
+        args.source,
+        model,
+        every_n=args.every,
+        scene_threshold=args.scene_threshold,
+        batch_size=args.batch,
+        conf=args.conf,
+        min_hits=args.min_hits,
+        objects_out=args.objects
+    )
+
+    print("\n" + "="*60)
+    print("📊 Waste Summary:")
+    print("="*60)
+    print(f"Frames decoded: {summary['frames_decoded']}")
+    print(f"Frames sampled: {summary['frames_sampled']}")
+    print(f"Unique objects: {summary['objects']}")
+    for category, count in summary['by_category'].items():
+        print(f"  {category}: {count}")
+    print(f"Speed: {summary['frames_per_second']} frames/s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"\n💾 Summary saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+"""
+Structured channel pruning with fine-tuning for the waste detector
+
+Removes whole conv channels from trained weights, fine-tunes briefly on the
+same dataset and re-validates, for one or more target sparsity levels.
+
+Channels are pruned only where the producer and consumer convs sit inside
+one block, so no concat or residual connection has to be rewired:
+- the hidden channels of every C2f Bottleneck (cv1 -> cv2)
+- the intermediate channels of the Detect head's box and class branches
+
+Channel importance is the producer's BatchNorm |gamma|, scaled by the layer
+mean so layers are comparable, and ranked globally. Each layer keeps at
+least 8 channels, and kept counts are rounded to a multiple of 8 for CPU
+kernels. A removed channel's constant output (act(beta)) is folded into
+the consumer's bias / BN mean, so the pruned model starts close to the
+original.
+
+Results go to waste_detection/pruning/pruning_report.{json,md}: FLOPs,
+parameters, CPU latency and mAP per sparsity level.
+
+Usage:
+    python prune_model.py waste_detection/waste_yolov8/weights/best.pt
+    python prune_model.py best.pt --sparsity 0.3 0.5 --epochs 10 --latency-budget 40
+"""
+
+import json
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+from ultralytics import YOLO
+from ultralytics.nn.modules import Bottleneck, Conv, Detect
+
+from checkpoints import crash_safe_trainer
+from model_benchmark import measure_latency
+from train_waste_model import DEFAULT_HYPERPARAMS
+
+MIN_CHANNELS = 8
+CHANNEL_MULTIPLE = 8
+
+
+def count_params(net):
+    return sum(p.numel() for p in net.parameters())
+
+
+def count_gflops(net, img_size=640):
+    """Multiply-accumulate FLOPs (x2) of all conv/linear layers for one image"""
+    flops = [0]
+
+    def conv_hook(module, inputs, output):
+        kh, kw = module.kernel_size
+        flops[0] += 2 * output.numel() * (module.in_channels // module.groups) * kh * kw
+
+    def linear_hook(module, inputs, output):
+        flops[0] += 2 * output.numel() * module.in_features
+
+    hooks = []
+    for m in net.modules():
+        if isinstance(m, nn.Conv2d):
+            hooks.append(m.register_forward_hook(conv_hook))
+        elif isinstance(m, nn.Linear):
+            hooks.append(m.register_forward_hook(linear_hook))
+
+    param = next(net.parameters())
+    was_training = net.training
+    net.eval()
+    with torch.no_grad():
+        net(torch.zeros(1, 3, img_size, img_size, dtype=param.dtype, device=param.device))
+    net.train(was_training)
+    for h in hooks:
+        h.remove()
+    return round(flops[0] / 1e9, 2)
+
+
+def prunable_pairs(net):
+    """
+    (producer Conv, consumer conv) pairs whose shared channels can be removed
+
+    The producer is an ultralytics Conv (conv + BatchNorm + activation); the
+    consumer is a Conv or a plain nn.Conv2d that reads only its output.
+    """
+    pairs = []
+    for m in net.modules():
+        if isinstance(m, Bottleneck):
+            pairs.append((m.cv1, m.cv2))
+        elif isinstance(m, Detect):
+            for branch in list(m.cv2) + list(m.cv3):
+                layers = list(branch)
+                pairs.extend(zip(layers[:-1], layers[1:]))
+
+    def conv_of(module):
+        return module.conv if isinstance(module, Conv) else module
+
+    return [
+        (producer, consumer) for producer, consumer in pairs
+        if isinstance(producer, Conv) and isinstance(producer.bn, nn.BatchNorm2d)
+        and isinstance(conv_of(consumer), nn.Conv2d)
+        and producer.conv.groups == 1 and conv_of(consumer).groups == 1
+    ]
+
+
+def _keep_counts(pairs, sparsity):
+    """Channels to keep per pair for a global target sparsity"""
+    scores = []
+    for producer, _ in pairs:
+        gamma = producer.bn.weight.detach().abs()
+        scores.append(gamma / gamma.mean().clamp_min(1e-12))
+
+    all_scores = torch.cat(scores)
+    threshold = torch.quantile(all_scores.float(), sparsity) if sparsity > 0 else -1.0
+
+    counts = []
+    for s in scores:
+        total = len(s)
+        keep = int((s > threshold).sum())
+        keep = max(keep, min(MIN_CHANNELS, total))
+        keep = min(total, -(-keep // CHANNEL_MULTIPLE) * CHANNEL_MULTIPLE)
+        counts.append(keep)
+    return scores, counts
+
+
+@torch.no_grad()
+def _prune_pair(producer, consumer, keep):
+    """Remove all but `keep` (sorted channel indices) between producer and consumer"""
+    mask = torch.ones(producer.conv.out_channels, dtype=torch.bool)
+    mask[keep] = False
+    removed = mask.nonzero().flatten()
+    consumer_conv = consumer.conv if isinstance(consumer, Conv) else consumer
+
+    # Fold the (near-)constant output of removed channels into the consumer
+    if len(removed):
+        constant = producer.act(producer.bn.bias[removed])
+        shift = (consumer_conv.weight[:, removed].sum((2, 3)) * constant).sum(1)
+        if isinstance(consumer, Conv):
+            consumer.bn.running_mean -= shift
+        elif consumer_conv.bias is not None:
+            consumer_conv.bias += shift
+        else:
+            consumer_conv.bias = nn.Parameter(shift.clone())
+
+    conv, bn = producer.conv, producer.bn
+    conv.weight = nn.Parameter(conv.weight[keep].clone())
+    if conv.bias is not None:
+        conv.bias = nn.Parameter(conv.bias[keep].clone())
+    conv.out_channels = len(keep)
+    bn.weight = nn.Parameter(bn.weight[keep].clone())
+    bn.bias = nn.Parameter(bn.bias[keep].clone())
+    bn.running_mean = bn.running_mean[keep].clone()
+    bn.running_var = bn.running_var[keep].clone()
+    bn.num_features = len(keep)
+
+    consumer_conv.weight = nn.Parameter(consumer_conv.weight[:, keep].clone())
+    consumer_conv.in_channels = len(keep)
+
+
+def prune_channels(net, sparsity):
+    """
+    Prune a DetectionModel in place to a target sparsity
+
+    Args:
+        net: ultralytics DetectionModel (unfused, with BatchNorm)
+        sparsity: Fraction (0-1) of prunable channels to remove
+
+    Returns:
+        (removed channels, prunable channels)
+    """
+    pairs = prunable_pairs(net)
+    if not pairs:
+        return 0, 0
+    scores, counts = _keep_counts(pairs, sparsity)
+
+    removed = 0
+    for (producer, consumer), s, keep_count in zip(pairs, scores, counts):
+        keep = torch.argsort(s, descending=True)[:keep_count].sort().values
+        removed += len(s) - keep_count
+        if keep_count < len(s):
+            _prune_pair(producer, consumer, keep)
+    return removed, sum(len(s) for s in scores)
+
+
+def finetune(weights, net, data_yaml, run_name, epochs=10, img_size=640, batch_size=16,
+             project_name='waste_detection/pruning'):
+    """
+    Fine-tune a pruned network; returns the best weights path
+
+    The stock trainer rebuilds the model from its YAML, which would undo the
+    pruning, so the trainer is handed the pruned network directly.
+    """
+    from ultralytics.models.yolo.detect import DetectionTrainer
+
+    class PrunedModelTrainer(DetectionTrainer):
+        def get_model(self, cfg=None, weights=None, verbose=True):
+            for p in net.parameters():
+                p.requires_grad_(True)
+            return net
+
+    model = YOLO(weights)
+    train_args = dict(
+        trainer=crash_safe_trainer(PrunedModelTrainer),
+        data=data_yaml,
+        epochs=epochs,
+        imgsz=img_size,
+        batch=batch_size,
+        device='cuda' if torch.cuda.is_available() else 'cpu',
+        project=project_name,
+        name=run_name,
+        exist_ok=True,
+        plots=False,
+    )
+    train_args.update(DEFAULT_HYPERPARAMS)
+    # Recovering a pruned model needs a gentler schedule than training from scratch
+    train_args.update(lr0=DEFAULT_HYPERPARAMS['lr0'] / 10, warmup_epochs=0.0)
+    model.train(**train_args)
+    return str(Path(project_name) / run_name / 'weights' / 'best.pt')
+
+
+def evaluate(weights, data_yaml, img_size=640):
+    """mAP, size, FLOPs and CPU latency of a weights file"""
+    model = YOLO(weights)
+    metrics = model.val(data=data_yaml, imgsz=img_size, plots=False, verbose=False)
+    latency = measure_latency(model, img_size=img_size)
+    return {
+        'weights': str(weights),
+        'params_m': round(count_params(model.model) / 1e6, 3),
+        'gflops': count_gflops(model.model, img_size),
+        'latency_p50_ms': latency['p50_ms'],
+        'map50': round(float(metrics.box.map50), 4),
+        'map50_95': round(float(metrics.box.map), 4),
+    }
+
+
+def prune_sweep(weights, data_yaml='waste_data.yaml', sparsities=(0.2, 0.4, 0.6),
+                epochs=10, img_size=640, batch_size=16, output_dir='waste_detection/pruning'):
+    """
+    Prune, fine-tune and evaluate at each sparsity level
+
+    Args:
+        weights: Trained weights from train_waste_detection_model()
+        data_yaml: Dataset used for fine-tuning and validation
+        sparsities: Target fractions of prunable channels to remove
+        epochs: Fine-tuning epochs per level
+        img_size, batch_size: Fine-tuning settings
+        output_dir: Runs and report directory
+
+    Returns:
+        Report rows, the unpruned model first
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"\n✂️  Evaluating unpruned model: {weights}")
+    rows = [dict(evaluate(weights, data_yaml, img_size), sparsity=0.0, channels_removed=0)]
+
+    for sparsity in sparsities:
+        print(f"\n✂️  Pruning to {sparsity:.0%} channel sparsity...")
+        net = YOLO(weights).model.float()
+        removed, total = prune_channels(net, sparsity)
+        print(f"   Removed {removed}/{total} prunable channels "
+              f"({count_params(net) / 1e6:.2f}M params, {count_gflops(net, img_size)} GFLOPs)")
+
+        best = finetune(weights, net, data_yaml, f'sparsity_{int(sparsity * 100)}', epochs, img_size,
+                        batch_size, project_name=str(output_dir))
+        rows.append(dict(evaluate(best, data_yaml, img_size), sparsity=sparsity, channels_removed=removed))
+
+    with open(output_dir / 'pruning_report.json', 'w') as f:
+        json.dump(rows, f, indent=2)
+    lines = [
+        '| Sparsity | Channels removed | Params (M) | GFLOPs | Latency p50 (ms) | mAP50 | mAP50-95 | Weights |',
+        '|----------|------------------|------------|--------|------------------|-------|----------|---------|',
+    ]
+    for r in rows:
+        lines.append(f"| {r['sparsity']:.0%} | {r['channels_removed']} | {r['params_m']} | {r['gflops']} | "
+                     f"{r['latency_p50_ms']} | {r['map50']} | {r['map50_95']} | {r['weights']} |")
+    with open(output_dir / 'pruning_report.md', 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return rows
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Prune conv channels, fine-tune and compare')
+    parser.add_argument('weights', type=str, help='Trained .pt weights')
+    parser.add_argument('--data', type=str, default='waste_data.yaml',
+                        help='Path to dataset YAML file')
+    parser.add_argument('--sparsity', type=float, nargs='+', default=[0.2, 0.4, 0.6],
+                        help='Target fractions of prunable channels to remove')
+    parser.add_argument('--epochs', type=int, default=10,
+                        help='Fine-tuning epochs per sparsity level')
+    parser.add_argument('--img-size', type=int, default=640,
+                        help='Input image size')
+    parser.add_argument('--batch', type=int, default=16,
+                        help='Batch size')
+    parser.add_argument('--output', type=str, default='waste_detection/pruning',
+                        help='Output directory')
+    parser.add_argument('--latency-budget', type=float, default=None,
+                        help='Recommend the most accurate model under this p50 latency (ms)')
+
+    args = parser.parse_args()
+
+    rows = prune_sweep(args.weights, args.data, args.sparsity, args.epochs,
+                       args.img_size, args.batch, args.output)
+
+    print("\n" + "="*60)
+    print("✂️  Pruning Results")
+    print("="*60)
+    for r in rows:
+        print(f"{r['sparsity']:>4.0%}: {r['params_m']}M params  {r['gflops']} GFLOPs  "
+              f"p50 {r['latency_p50_ms']} ms  mAP50-95 {r['map50_95']}")
+    if args.latency_budget is not None:
+        fits = [r for r in rows if r['latency_p50_ms'] <= args.latency_budget]
+        if fits:
+            best = max(fits, key=lambda r: r['map50_95'])
+            print(f"\n🏆 Best within {args.latency_budget} ms: {best['weights']} "
+                  f"(mAP50-95 {best['map50_95']}, {best['latency_p50_ms']} ms)")
+        else:
+            print(f"\n⚠️  No model meets the {args.latency_budget} ms budget")
+    print(f"\nReport: {Path(args.output) / 'pruning_report.md'}")
+    print("="*60)
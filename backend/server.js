@@ -2212,6 +2212,13 @@ app.delete("/api/notifications/:notificationId", async (req, res) => {
 });
 
 // ─── WASTE DETECTION WITH YOLOV8 ─────────────────────────────────────────────
+// Co-located deployments can skip HTTP/multipart and talk to the Python
+// service over its Unix domain socket (see yolo-socket-client.js)
+const YoloSocketClient = require('./yolo-socket-client');
+const yoloSocket = process.env.YOLO_SERVICE_SOCKET
+  ? new YoloSocketClient(process.env.YOLO_SERVICE_SOCKET)
+  : null;
+
 const wasteUpload = multer({
   storage: multer.memoryStorage(),
   limits: { fileSize: 10 * 1024 * 1024 }, // 10MB limit
@@ -2234,19 +2241,24 @@ app.post("/api/detect-waste", authMiddleware, wasteUpload.single('image'), async
     const YOLO_SERVICE_URL = process.env.YOLO_SERVICE_URL || 'http://localhost:5001/detect';
     
     try {
-      const FormData = require('form-data');
-      const axios = require('axios');
-      
-      const formData = new FormData();
-      formData.append('image', req.file.buffer, {
-        filename: 'waste.jpg',
-        contentType: req.file.mimetype
-      });
+      let response;
+      if (yoloSocket) {
+        response = await yoloSocket.request('detect', req.file.buffer, 10000);
+      } else {
+        const FormData = require('form-data');
+        const axios = require('axios');
+        
+        const formData = new FormData();
+        formData.append('image', req.file.buffer, {
+          filename: 'waste.jpg',
+          contentType: req.file.mimetype
+        });
 
-      const response = await axios.post(YOLO_SERVICE_URL, formData, {
-        headers: formData.getHeaders(),
-        timeout: 10000 // 10 second timeout
-      });
+        response = await axios.post(YOLO_SERVICE_URL, formData, {
+          headers: formData.getHeaders(),
+          timeout: 10000 // 10 second timeout
+        });
+      }
 
       if (response.data.success) {
         return res.status(200).json({
@@ -2289,19 +2301,24 @@ app.post("/api/detect-waste-realtime", authMiddleware, wasteUpload.single('image
     const YOLO_SERVICE_URL = process.env.YOLO_SERVICE_URL || 'http://localhost:5001/detect-multiple';
     
     try {
-      const FormData = require('form-data');
-      const axios = require('axios');
-      
-      const formData = new FormData();
-      formData.append('image', req.file.buffer, {
-        filename: 'frame.jpg',
-        contentType: req.file.mimetype
-      });
+      let response;
+      if (yoloSocket) {
+        response = await yoloSocket.request('detect-multiple', req.file.buffer, 5000);
+      } else {
+        const FormData = require('form-data');
+        const axios = require('axios');
+        
+        const formData = new FormData();
+        formData.append('image', req.file.buffer, {
+          filename: 'frame.jpg',
+          contentType: req.file.mimetype
+        });
 
-      const response = await axios.post(YOLO_SERVICE_URL, formData, {
-        headers: formData.getHeaders(),
-        timeout: 5000 // 5 second timeout for real-time
-      });
+        response = await axios.post(YOLO_SERVICE_URL, formData, {
+          headers: formData.getHeaders(),
+          timeout: 5000 // 5 second timeout for real-time
+        });
+      }
 
       if (response.data.success) {
         return res.status(200).json({
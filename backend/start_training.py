@@ -2,8 +2,13 @@
 Interactive training setup for waste detection
 
 This script guides you through the training process step-by-step.
+Training runs in this process through training_pipeline.py.
+
+For CI, skip the prompts and run the pipeline directly:
+    python start_training.py --yes --data waste_data.yaml --model n --epochs 50
 """
 
+import importlib.util
 import os
 import sys
 from pathlib import Path
@@ -21,10 +26,10 @@ def check_requirements():
     
     missing = []
     for package, name in required.items():
-        try:
-            __import__(package)
+        # find_spec locates the package without importing it (torch takes seconds)
+        if importlib.util.find_spec(package) is not None:
             print(f"  ✅ {name}")
-        except ImportError:
+        else:
             print(f"  ❌ {name}")
             missing.append(package)
     
@@ -82,17 +87,20 @@ def setup_wizard():
         
         if choice == "1":
             print("\n📥 Running dataset downloader...")
-            os.system("python download_waste_dataset.py")
+            import download_waste_dataset
+            download_waste_dataset.main()
             
         elif choice == "2":
             print("\n📥 Setting up pre-trained model...")
-            os.system("python use_pretrained_model.py --quick")
+            from use_pretrained_model import quick_setup_coco
+            quick_setup_coco()
             print("\n✅ You can skip training and use the pre-trained model!")
             return
             
         elif choice == "3":
             print("\n📁 Creating dataset structure...")
-            os.system("python download_waste_dataset.py")
+            from download_waste_dataset import create_dataset_structure
+            create_dataset_structure()
             print("\n📝 Now add your images and labels to dataset/ folder")
             return
             
@@ -157,10 +165,14 @@ def setup_wizard():
         print("\n🚀 Starting training...")
         print("⏰ This will take a while. You can monitor progress in the terminal.\n")
         
-        cmd = f"python train_waste_model.py --data {data_yaml} --model {model} --epochs {epochs} --batch {batch}"
-        print(f"Running: {cmd}\n")
-        
-        os.system(cmd)
+        from training_pipeline import PipelineError, TrainingPipeline
+        pipeline = TrainingPipeline(data_yaml=data_yaml, model_size=model,
+                                    epochs=int(epochs), batch_size=int(batch))
+        try:
+            pipeline.run()
+        except PipelineError as e:
+            print(f"\n❌ Pipeline stopped: {e}")
+            return
         
         print("\n" + "="*60)
         print("✅ Training Complete!")
@@ -194,11 +206,13 @@ def main():
         
     elif choice == "2":
         print("\n📥 Setting up pre-trained model...")
-        os.system("python use_pretrained_model.py")
+        from use_pretrained_model import download_pretrained_waste_model
+        download_pretrained_waste_model()
         
     elif choice == "3":
         print("\n📥 Downloading dataset...")
-        os.system("python download_waste_dataset.py")
+        import download_waste_dataset
+        download_waste_dataset.main()
         
     elif choice == "4":
         check_requirements()
@@ -207,7 +221,29 @@ def main():
     else:
         print("\n❌ Invalid choice")
 
+def run_non_interactive():
+    """--yes: run the training pipeline with command-line settings, no prompts"""
+    from training_pipeline import PipelineError, build_parser, pipeline_from_args
+    
+    parser = build_parser()
+    parser.add_argument('--yes', action='store_true', help='Run without prompts (CI)')
+    args = parser.parse_args()
+    
+    if not check_requirements():
+        sys.exit(1)
+    if not os.path.exists(args.data):
+        print(f"❌ Dataset configuration file not found: {args.data}")
+        sys.exit(1)
+    try:
+        pipeline_from_args(args).run(args.stages)
+    except (PipelineError, ValueError) as e:
+        print(f"\n❌ Pipeline stopped: {e}")
+        sys.exit(1)
+
 if __name__ == '__main__':
+    if '--yes' in sys.argv:
+        run_non_interactive()
+        sys.exit(0)
     try:
         main()
     except KeyboardInterrupt:
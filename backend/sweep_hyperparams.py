@@ -0,0 +1,381 @@
+"""
+Parallel hyperparameter sweep for the waste detection model
+
+Samples configurations from a search space and trains them concurrently
+with train_waste_detection_model(), splitting CPU cores evenly between the
+trials that run at the same time. After every epoch each trial records its
+validation mAP50-95; a trial scoring below the median of the other trials
+at the same epoch is stopped early (median pruning).
+
+Results go to <sweep_dir>/leaderboard.json and leaderboard.md (accuracy and
+CPU inference latency). The winning configuration is saved as
+best_hyperparams.json and can be re-trained with:
+    python train_waste_model.py --hyp <sweep_dir>/best_hyperparams.json ...
+
+Usage:
+    python sweep_hyperparams.py --trials 12 --parallel 3 --epochs 30
+    python sweep_hyperparams.py --space my_space.yaml --trials 20
+"""
+
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from pathlib import Path
+
+import yaml
+
+# Search space format: name -> {type: uniform|loguniform|int|choice, ...}
+DEFAULT_SEARCH_SPACE = {
+    'lr0': {'type': 'loguniform', 'low': 1e-4, 'high': 1e-2},
+    'lrf': {'type': 'uniform', 'low': 0.01, 'high': 0.2},
+    'momentum': {'type': 'uniform', 'low': 0.85, 'high': 0.98},
+    'weight_decay': {'type': 'loguniform', 'low': 1e-5, 'high': 1e-3},
+    'hsv_s': {'type': 'uniform', 'low': 0.3, 'high': 0.9},
+    'hsv_v': {'type': 'uniform', 'low': 0.2, 'high': 0.6},
+    'degrees': {'type': 'uniform', 'low': 0.0, 'high': 15.0},
+    'scale': {'type': 'uniform', 'low': 0.3, 'high': 0.7},
+    'mosaic': {'type': 'choice', 'values': [0.5, 1.0]},
+    'mixup': {'type': 'choice', 'values': [0.0, 0.1]},
+}
+
+MAP_KEY = 'metrics/mAP50-95(B)'
+MAP50_KEY = 'metrics/mAP50(B)'
+
+
+def sample_config(space, rng):
+    """Draw one configuration from a search space"""
+    config = {}
+    for name, spec in space.items():
+        kind = spec['type']
+        if kind == 'uniform':
+            config[name] = round(rng.uniform(spec['low'], spec['high']), 6)
+        elif kind == 'loguniform':
+            config[name] = float(f"{math.exp(rng.uniform(math.log(spec['low']), math.log(spec['high']))):.3g}")
+        elif kind == 'int':
+            config[name] = rng.randint(spec['low'], spec['high'])
+        elif kind == 'choice':
+            config[name] = rng.choice(spec['values'])
+        else:
+            raise ValueError(f'Unknown search space type for {name}: {kind}')
+    return config
+
+
+def _read_progress(path):
+    progress = []
+    try:
+        with open(path) as f:
+            for line in f:
+                progress.append(json.loads(line))
+    except FileNotFoundError:
+        pass
+    return progress
+
+
+def _archived_progress(path):
+    return path.with_name('progress.prev.jsonl')
+
+
+def _archive_progress(sweep_dir):
+    """
+    Move every trial's progress.jsonl aside before a sweep starts
+
+    Queued trials would otherwise feed their previous run's epochs into the
+    pruning median until they start. should_prune only reads progress.jsonl.
+    """
+    for path in Path(sweep_dir).glob('*/progress.jsonl'):
+        os.replace(path, _archived_progress(path))
+
+
+def _start_progress(path, epoch):
+    """
+    Start this run's progress file for a trial
+
+    Keeps only the archived epochs before the first one this run reports,
+    so a resumed run keeps its history and a fresh run (epoch 1) starts
+    empty.
+    """
+    archived = _archived_progress(path)
+    source = archived if archived.exists() else path
+    kept = [p for p in _read_progress(source) if p['epoch'] < epoch]
+    tmp_path = path.with_name(f'{path.name}.tmp')
+    with open(tmp_path, 'w') as f:
+        f.writelines(json.dumps(p) + '\n' for p in kept)
+    os.replace(tmp_path, path)
+    archived.unlink(missing_ok=True)
+
+
+def should_prune(sweep_dir, trial_name, epoch, value, min_trials=2):
+    """
+    Median pruning: stop when below the median of other trials at this epoch
+
+    Other trials are compared on the best mAP they had reached by the same
+    epoch, so one noisy epoch does not decide.
+    """
+    others = []
+    for path in Path(sweep_dir).glob('*/progress.jsonl'):
+        if path.parent.name == trial_name:
+            continue
+        progress = _read_progress(path)
+        if not progress or progress[-1]['epoch'] < epoch:
+            continue
+        others.append(max(p['map50_95'] for p in progress if p['epoch'] <= epoch))
+
+    if len(others) < min_trials:
+        return False
+    others.sort()
+    mid = len(others) // 2
+    median = others[mid] if len(others) % 2 else (others[mid - 1] + others[mid]) / 2
+    return value < median
+
+
+def _init_worker(slots, cores_per_trial):
+    """Pin this worker process to its own slice of CPU cores"""
+    slot = slots.get()
+    cores = list(range(slot * cores_per_trial, (slot + 1) * cores_per_trial))
+    if hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, cores)
+        except OSError:
+            pass
+    # Must be set before torch is imported in this process
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(cores_per_trial)
+    os.environ['SWEEP_CORES_PER_TRIAL'] = str(cores_per_trial)
+
+
+def run_trial(trial):
+    """Train one configuration (runs in a worker process)"""
+    import torch
+    from ultralytics import YOLO
+
+    from model_benchmark import measure_latency
+    from train_waste_model import train_waste_detection_model
+
+    cores = int(os.environ.get('SWEEP_CORES_PER_TRIAL', '1'))
+    torch.set_num_threads(cores)
+
+    sweep_dir = Path(trial['sweep_dir'])
+    name = trial['name']
+    progress_path = sweep_dir / name / 'progress.jsonl'
+    progress_path.parent.mkdir(parents=True, exist_ok=True)
+    state = {'pruned_at': None, 'best_map': 0.0, 'best_map50': 0.0, 'epochs': 0}
+
+    def on_train_start(trainer):
+        # A rerun of the sweep reuses trial names: stale epochs must not feed the median
+        _start_progress(progress_path, trainer.start_epoch + 1)
+
+    def on_fit_epoch_end(trainer):
+        epoch = trainer.epoch + 1
+        map50_95 = float(trainer.metrics.get(MAP_KEY, 0.0))
+        map50 = float(trainer.metrics.get(MAP50_KEY, 0.0))
+        state['epochs'] = epoch
+        if map50_95 >= state['best_map']:
+            state['best_map'], state['best_map50'] = map50_95, map50
+
+        with open(progress_path, 'a') as f:
+            f.write(json.dumps({'epoch': epoch, 'map50_95': map50_95, 'map50': map50}) + '\n')
+
+        if epoch >= trial['prune_after'] and should_prune(sweep_dir, name, epoch, state['best_map']):
+            print(f"✂️  {name}: pruned at epoch {epoch} (mAP50-95 {state['best_map']:.4f})")
+            state['pruned_at'] = epoch
+            trainer.stop = True
+
+    start = time.perf_counter()
+    hyperparams = dict(trial['params'], workers=min(cores, 4))
+    best_path = train_waste_detection_model(
+        data_yaml=trial['data_yaml'],
+        model_size=trial['model_size'],
+        epochs=trial['epochs'],
+        img_size=trial['img_size'],
+        batch_size=trial['batch_size'],
+        project_name=str(sweep_dir),
+        run_name=name,
+        hyperparams=hyperparams,
+        callbacks={'on_train_start': on_train_start, 'on_fit_epoch_end': on_fit_epoch_end},
+        export_onnx=False
+    )
+
+    latency = measure_latency(YOLO(best_path), img_size=trial['img_size'])
+    return {
+        'trial': name,
+        'status': 'pruned' if state['pruned_at'] else 'complete',
+        'epochs': state['epochs'],
+        'map50_95': round(state['best_map'], 4),
+        'map50': round(state['best_map50'], 4),
+        'latency_p50_ms': latency['p50_ms'],
+        'train_minutes': round((time.perf_counter() - start) / 60, 1),
+        'weights': best_path,
+        'params': trial['params'],
+    }
+
+
+def write_leaderboard(results, sweep_dir, base):
+    """Write leaderboard.json/.md sorted by mAP50-95 (then latency)"""
+    ranked = sorted(
+        results,
+        key=lambda r: (r['status'] != 'failed', r.get('map50_95', 0), -r.get('latency_p50_ms', 0)),
+        reverse=True
+    )
+    sweep_dir = Path(sweep_dir)
+    with open(sweep_dir / 'leaderboard.json', 'w') as f:
+        json.dump({'base': base, 'trials': ranked}, f, indent=2)
+
+    lines = [
+        '| Rank | Trial | Status | Epochs | mAP50-95 | mAP50 | Latency p50 (ms) | Params |',
+        '|------|-------|--------|--------|----------|-------|------------------|--------|',
+    ]
+    for rank, r in enumerate(ranked, 1):
+        params = ', '.join(f'{k}={v}' for k, v in r['params'].items())
+        lines.append(
+            f"| {rank} | {r['trial']} | {r['status']} | {r.get('epochs', '-')} | "
+            f"{r.get('map50_95', '-')} | {r.get('map50', '-')} | {r.get('latency_p50_ms', '-')} | {params} |"
+        )
+    with open(sweep_dir / 'leaderboard.md', 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return ranked
+
+
+def run_sweep(
+    data_yaml='waste_data.yaml',
+    space=None,
+    trials=10,
+    parallel=2,
+    model_size='n',
+    epochs=30,
+    img_size=640,
+    batch_size=16,
+    prune_after=5,
+    sweep_dir='waste_detection/sweep',
+    seed=0
+):
+    """
+    Run a hyperparameter sweep
+
+    Args:
+        data_yaml: Dataset configuration file
+        space: Search space dict (default: DEFAULT_SEARCH_SPACE)
+        trials: Number of configurations to train
+        parallel: Trials running at the same time; CPU cores are split evenly
+        model_size, epochs, img_size, batch_size: Fixed training settings
+        prune_after: Never prune before this epoch
+        sweep_dir: Output directory (one sub-directory per trial)
+        seed: Random seed for sampling configurations
+
+    Returns:
+        Ranked list of trial results
+    """
+    space = space or DEFAULT_SEARCH_SPACE
+    rng = random.Random(seed)
+    sweep_dir = Path(sweep_dir)
+    sweep_dir.mkdir(parents=True, exist_ok=True)
+    _archive_progress(sweep_dir)
+
+    cores_per_trial = max(1, (os.cpu_count() or 1) // parallel)
+    base = {
+        'data_yaml': data_yaml,
+        'model_size': model_size,
+        'epochs': epochs,
+        'img_size': img_size,
+        'batch_size': batch_size,
+    }
+    jobs = [
+        dict(base, name=f'trial_{i:03d}', params=sample_config(space, rng),
+             sweep_dir=str(sweep_dir), prune_after=prune_after)
+        for i in range(trials)
+    ]
+
+    print(f"\n🔬 Sweep: {trials} trials, {parallel} at a time, {cores_per_trial} core(s) each")
+
+    ctx = get_context('spawn')
+    slots = ctx.Queue()
+    for slot in range(parallel):
+        slots.put(slot)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=parallel, mp_context=ctx,
+                             initializer=_init_worker, initargs=(slots, cores_per_trial)) as pool:
+        futures = {pool.submit(run_trial, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"❌ {job['name']} failed: {e}")
+                result = {'trial': job['name'], 'status': 'failed', 'params': job['params'], 'error': str(e)}
+            results.append(result)
+            write_leaderboard(results, sweep_dir, base)
+            print(f"📊 {len(results)}/{trials} trials done")
+
+    ranked = write_leaderboard(results, sweep_dir, base)
+    best = next((r for r in ranked if r['status'] != 'failed'), None)
+    if best:
+        with open(sweep_dir / 'best_hyperparams.json', 'w') as f:
+            json.dump(best['params'], f, indent=2)
+    return ranked
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Parallel hyperparameter sweep for waste detection')
+    parser.add_argument('--data', type=str, default='waste_data.yaml',
+                        help='Path to dataset YAML file')
+    parser.add_argument('--space', type=str, default=None,
+                        help='Search space YAML/JSON file (default: built-in space)')
+    parser.add_argument('--trials', type=int, default=10,
+                        help='Number of configurations to train')
+    parser.add_argument('--parallel', type=int, default=2,
+                        help='Trials to run at the same time')
+    parser.add_argument('--model', type=str, default='n',
+                        choices=['n', 's', 'm', 'l', 'x'],
+                        help='Model size')
+    parser.add_argument('--epochs', type=int, default=30,
+                        help='Epochs per trial')
+    parser.add_argument('--img-size', type=int, default=640,
+                        help='Input image size')
+    parser.add_argument('--batch', type=int, default=16,
+                        help='Batch size')
+    parser.add_argument('--prune-after', type=int, default=5,
+                        help='Earliest epoch at which weak trials may be stopped')
+    parser.add_argument('--output', type=str, default='waste_detection/sweep',
+                        help='Sweep output directory')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed')
+
+    args = parser.parse_args()
+
+    space = None
+    if args.space:
+        with open(args.space) as f:
+            space = yaml.safe_load(f)
+
+    ranked = run_sweep(
+        data_yaml=args.data,
+        space=space,
+        trials=args.trials,
+        parallel=args.parallel,
+        model_size=args.model,
+        epochs=args.epochs,
+        img_size=args.img_size,
+        batch_size=args.batch,
+        prune_after=args.prune_after,
+        sweep_dir=args.output,
+        seed=args.seed
+    )
+
+    best = next((r for r in ranked if r['status'] != 'failed'), None)
+    print("\n" + "="*60)
+    print("🏆 Sweep Results")
+    print("="*60)
+    print(f"Leaderboard: {Path(args.output) / 'leaderboard.md'}")
+    if best:
+        print(f"Best: {best['trial']} (mAP50-95 {best['map50_95']}, {best['latency_p50_ms']} ms)")
+        print("\nReproduce with:")
+        print(f"   python train_waste_model.py --data {args.data} --model {args.model} "
+              f"--epochs {args.epochs} --img-size {args.img_size} --batch {args.batch} "
+              f"--hyp {Path(args.output) / 'best_hyperparams.json'}")
+    print("="*60)
@@ -4,21 +4,37 @@ Test trained YOLOv8 waste detection model
 Usage:
     python test_trained_model.py path/to/image.jpg
     python test_trained_model.py path/to/image.jpg --model path/to/model.pt
+
+    # Directory / glob: batched inference, detections to JSONL (or --format csv),
+    # per-class precision/recall when YOLO labels exist next to the images
+    python test_trained_model.py dataset/valid/images --batch-size 16
+    python test_trained_model.py "photos/**/*.jpg" --save-images
 """
 
 from ultralytics import YOLO
 from PIL import Image
+import csv
+import glob
+import json
 import sys
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-def test_model(image_path, model_path='waste_detection/waste_yolov8/weights/best.pt'):
+import cv2
+
+from dataset_utils import IMAGE_EXTENSIONS, iter_images, label_path_for
+from model_benchmark import percentile
+
+def test_model(image_path, model_path='waste_detection/waste_yolov8/weights/best.pt', conf=0.25):
     """
     Test trained model on an image
     
     Args:
         image_path: Path to test image
         model_path: Path to trained model weights
+        conf: Confidence threshold
     """
     
     print("\n" + "="*60)
@@ -50,7 +66,7 @@ def test_model(image_path, model_path='waste_detection/waste_yolov8/weights/best
     
     # Run inference
     try:
-        results = model(image_path, conf=0.25)
+        results = model(image_path, conf=conf)
         
         if len(results) == 0:
             print("⚠️  No results returned")
@@ -102,21 +118,283 @@ def test_model(image_path, model_path='waste_detection/waste_yolov8/weights/best
         import traceback
         traceback.print_exc()
 
+def collect_images(source):
+    """Image paths from a directory or a glob pattern, sorted"""
+    if os.path.isdir(source):
+        return [str(p) for p in iter_images(source)]
+    return sorted(p for p in glob.glob(source, recursive=True)
+                  if Path(p).suffix.lower() in IMAGE_EXTENSIONS)
+
+def load_ground_truth(image_path, width, height):
+    """
+    Boxes from the YOLO label next to an image
+    
+    Returns:
+        List of (class_id, x1, y1, x2, y2) in pixels, or None when the image
+        has no label file (an empty file means no objects)
+    """
+    label_path = label_path_for(image_path)
+    if not label_path.exists():
+        return None
+    boxes = []
+    with open(label_path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 5:
+                continue
+            class_id = int(parts[0])
+            x, y, w, h = (float(v) for v in parts[1:])
+            boxes.append((class_id, (x - w / 2) * width, (y - h / 2) * height,
+                          (x + w / 2) * width, (y + h / 2) * height))
+    return boxes
+
+def _iou(a, b):
+    inter_w = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    inter_h = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = inter_w * inter_h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def match_detections(detections, truth, counts, iou_threshold=0.5):
+    """
+    Greedily match detections to ground truth of the same class, most confident first
+    
+    Adds to counts[class_id] = [true positives, false positives, false negatives]
+    """
+    matched = set()
+    for det in sorted(detections, key=lambda d: -d['confidence']):
+        best, best_iou = None, iou_threshold
+        for i, (class_id, *box) in enumerate(truth):
+            if i in matched or class_id != det['class_id']:
+                continue
+            overlap = _iou(det['box'], box)
+            if overlap >= best_iou:
+                best, best_iou = i, overlap
+        stats = counts.setdefault(det['class_id'], [0, 0, 0])
+        if best is None:
+            stats[1] += 1
+        else:
+            matched.add(best)
+            stats[0] += 1
+    for i, (class_id, *_) in enumerate(truth):
+        if i not in matched:
+            counts.setdefault(class_id, [0, 0, 0])[2] += 1
+
+def evaluate_directory(source, model_path='waste_detection/waste_yolov8/weights/best.pt',
+                       conf=0.25, img_size=640, batch_size=8, output_dir='evaluation',
+                       output_format='jsonl', save_images=False, decode_workers=4,
+                       iou_threshold=0.5):
+    """
+    Batched inference over many images, with metrics when labels exist
+    
+    Images are decoded in a thread pool one batch ahead of inference, so
+    decoding overlaps with the model.
+    
+    Args:
+        source: Directory or glob pattern
+        model_path: Path to model weights (any exported format)
+        conf: Confidence threshold
+        img_size: Inference image size
+        batch_size: Images per inference call
+        output_dir: Where detections, the summary and annotated images go
+        output_format: 'jsonl' (one line per image) or 'csv' (one row per detection)
+        save_images: Also write annotated images (slower)
+        decode_workers: Decoding threads
+        iou_threshold: IoU for a detection to count as a true positive
+    
+    Returns:
+        Summary dict
+    """
+    images = collect_images(source)
+    if not images:
+        print(f"❌ No images found: {source}")
+        return None
+    if not os.path.exists(model_path):
+        print(f"❌ Model not found: {model_path}")
+        return None
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if save_images:
+        (output_dir / 'annotated').mkdir(exist_ok=True)
+        # Annotated images keep their path below this folder: a recursive glob
+        # can match several files with the same name
+        image_root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in images])
+    detections_path = output_dir / f'detections.{output_format}'
+
+    print(f"\n📦 Loading model: {model_path}")
+    model = YOLO(model_path, task='detect')
+    names = model.names
+    print(f"🖼️  Evaluating {len(images)} images in batches of {batch_size}...")
+
+    batches = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+    counts = {}
+    labeled = 0
+    unreadable = []
+    batch_ms = []
+    total_detections = 0
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=decode_workers) as pool, \
+            open(detections_path, 'w', newline='') as out:
+        writer = None
+        if output_format == 'csv':
+            writer = csv.writer(out)
+            writer.writerow(['image', 'class_id', 'class', 'confidence', 'x1', 'y1', 'x2', 'y2'])
+
+        pending = [pool.submit(cv2.imread, path) for path in batches[0]]
+        for index, batch in enumerate(batches):
+            frames = [f.result() for f in pending]
+            if index + 1 < len(batches):
+                pending = [pool.submit(cv2.imread, path) for path in batches[index + 1]]
+
+            paths = [p for p, frame in zip(batch, frames) if frame is not None]
+            frames = [frame for frame in frames if frame is not None]
+            unreadable.extend(p for p in batch if p not in paths)
+            if not frames:
+                continue
+
+            batch_start = time.perf_counter()
+            results = model.predict(frames, conf=conf, imgsz=img_size, verbose=False)
+            batch_ms.append((time.perf_counter() - batch_start) * 1000)
+
+            for path, frame, result in zip(paths, frames, results):
+                height, width = frame.shape[:2]
+                detections = [
+                    {
+                        'class_id': int(class_id),
+                        'class': names[int(class_id)],
+                        'confidence': round(float(score), 4),
+                        'box': [round(float(v), 1) for v in box],
+                    }
+                    for class_id, score, box in zip(result.boxes.cls.tolist(),
+                                                    result.boxes.conf.tolist(),
+                                                    result.boxes.xyxy.tolist())
+                ]
+                total_detections += len(detections)
+
+                if writer:
+                    for det in detections:
+                        writer.writerow([path, det['class_id'], det['class'], det['confidence'], *det['box']])
+                else:
+                    out.write(json.dumps({'image': path, 'width': width, 'height': height,
+                                          'detections': detections}) + '\n')
+
+                truth = load_ground_truth(path, width, height)
+                if truth is not None:
+                    labeled += 1
+                    match_detections(detections, truth, counts, iou_threshold)
+
+                if save_images:
+                    annotated = output_dir / 'annotated' / os.path.relpath(os.path.abspath(path), image_root)
+                    annotated.parent.mkdir(parents=True, exist_ok=True)
+                    pool.submit(result.save, str(annotated))
+
+            done = min((index + 1) * batch_size, len(images))
+            print(f"\r  {done}/{len(images)} images", end='')
+        print()
+
+    elapsed = time.perf_counter() - start
+    processed = len(images) - len(unreadable)
+    batch_ms.sort()
+    per_class = {}
+    for class_id in sorted(counts):
+        tp, fp, fn = counts[class_id]
+        per_class[names.get(class_id, str(class_id))] = {
+            'true_positives': tp,
+            'false_positives': fp,
+            'false_negatives': fn,
+            'precision': round(tp / (tp + fp), 4) if tp + fp else None,
+            'recall': round(tp / (tp + fn), 4) if tp + fn else None,
+        }
+
+    summary = {
+        'source': source,
+        'model': model_path,
+        'conf': conf,
+        'img_size': img_size,
+        'batch_size': batch_size,
+        'images': processed,
+        'unreadable': unreadable,
+        'detections': total_detections,
+        'elapsed_seconds': round(elapsed, 2),
+        'images_per_second': round(processed / elapsed, 2) if elapsed else None,
+        'batch_latency_ms': {
+            'p50': round(percentile(batch_ms, 50), 2),
+            'p95': round(percentile(batch_ms, 95), 2),
+            'p99': round(percentile(batch_ms, 99), 2),
+        },
+        'per_image_latency_ms': round(sum(batch_ms) / processed, 2) if processed else None,
+        'labeled_images': labeled,
+        'iou_threshold': iou_threshold,
+        'per_class': per_class,
+        'detections_file': str(detections_path),
+    }
+    with open(output_dir / 'summary.json', 'w') as f:
+        json.dump(summary, f, indent=2)
+    print_evaluation_summary(summary)
+    return summary
+
+def print_evaluation_summary(summary):
+    """Print throughput, latency and per-class precision/recall"""
+    print("\n" + "="*60)
+    print("📊 Directory Evaluation")
+    print("="*60)
+    print(f"Images: {summary['images']} ({summary['detections']} detections)")
+    if summary['unreadable']:
+        print(f"⚠️  Unreadable: {len(summary['unreadable'])}")
+    latency = summary['batch_latency_ms']
+    print(f"Throughput: {summary['images_per_second']} images/sec end to end")
+    print(f"Batch latency (b{summary['batch_size']}): p50 {latency['p50']} ms, "
+          f"p95 {latency['p95']} ms, p99 {latency['p99']} ms "
+          f"({summary['per_image_latency_ms']} ms/image)")
+
+    if summary['per_class']:
+        print(f"\nPer class on {summary['labeled_images']} labeled images "
+              f"(IoU >= {summary['iou_threshold']}):")
+        print(f"  {'class':<20} {'precision':>9} {'recall':>7} {'TP':>5} {'FP':>5} {'FN':>5}")
+        for name, stats in summary['per_class'].items():
+            precision = '-' if stats['precision'] is None else f"{stats['precision']:.3f}"
+            recall = '-' if stats['recall'] is None else f"{stats['recall']:.3f}"
+            print(f"  {name:<20} {precision:>9} {recall:>7} {stats['true_positives']:>5} "
+                  f"{stats['false_positives']:>5} {stats['false_negatives']:>5}")
+    elif summary['labeled_images'] == 0:
+        print("\nNo YOLO labels next to the images: precision/recall skipped")
+    print(f"\n💾 Detections: {summary['detections_file']}")
+    print("="*60)
+
 def main():
     """Main function"""
     import argparse
     
     parser = argparse.ArgumentParser(description='Test YOLOv8 waste detection model')
-    parser.add_argument('image', type=str, help='Path to test image')
+    parser.add_argument('image', type=str,
+                        help='Path to test image, or a directory / glob pattern for batch evaluation')
     parser.add_argument('--model', type=str, 
                         default='waste_detection/waste_yolov8/weights/best.pt',
                         help='Path to model weights')
     parser.add_argument('--conf', type=float, default=0.25,
                         help='Confidence threshold (0-1)')
+    parser.add_argument('--img-size', type=int, default=640,
+                        help='Inference image size (batch mode)')
+    parser.add_argument('--batch-size', type=int, default=8,
+                        help='Images per inference call (batch mode)')
+    parser.add_argument('--output', type=str, default='evaluation',
+                        help='Output directory (batch mode)')
+    parser.add_argument('--format', type=str, default='jsonl', choices=['jsonl', 'csv'],
+                        help='Detections file format (batch mode)')
+    parser.add_argument('--save-images', action='store_true',
+                        help='Also write annotated images (batch mode)')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Image decoding threads (batch mode)')
     
     args = parser.parse_args()
     
-    test_model(args.image, args.model)
+    if os.path.isdir(args.image) or any(c in args.image for c in '*?['):
+        evaluate_directory(args.image, args.model, args.conf, args.img_size, args.batch_size,
+                           args.output, args.format, args.save_images, args.workers)
+    else:
+        test_model(args.image, args.model, args.conf)
     
     print("\n" + "="*60)
     print("✅ Test complete!")
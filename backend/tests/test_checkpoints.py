@@ -0,0 +1,64 @@
+import pytest
+
+import checkpoints
+from checkpoints import changed_train_args, find_resumable_checkpoint
+
+UNSTRIPPED = {'epoch': 42, 'optimizer': {'state': {}}, 'train_args': {'epochs': 100, 'batch': 16}}
+STRIPPED = {'epoch': -1, 'optimizer': None, 'train_args': {'epochs': 100, 'batch': 16}}
+
+
+class FakeRun:
+    """Run directory whose checkpoints load as fake dicts (None: unreadable)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.contents = {}
+        (path / 'weights').mkdir()
+
+    def write(self, name, ckpt):
+        (self.path / 'weights' / name).touch()
+        self.contents[name] = ckpt
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    fake = FakeRun(tmp_path)
+    monkeypatch.setattr(checkpoints, '_load_checkpoint', lambda path: fake.contents.get(path.name))
+    return fake
+
+
+def test_interrupted_run_resumes_from_last(run):
+    run.write('last.pt', UNSTRIPPED)
+    run.write('epoch40.pt', UNSTRIPPED)
+    assert find_resumable_checkpoint(run.path) == run.path / 'weights' / 'last.pt'
+
+
+def test_finished_run_is_not_resumed_from_epoch_checkpoints(run):
+    run.write('last.pt', STRIPPED)
+    run.write('epoch80.pt', UNSTRIPPED)
+    run.write('epoch90.pt', UNSTRIPPED)
+    assert find_resumable_checkpoint(run.path) is None
+
+
+def test_damaged_last_falls_back_to_newest_epoch(run):
+    run.write('last.pt', None)
+    run.write('epoch9.pt', UNSTRIPPED)
+    run.write('epoch10.pt', UNSTRIPPED)
+    run.write('epoch20.pt', None)
+    assert find_resumable_checkpoint(run.path) == run.path / 'weights' / 'epoch10.pt'
+
+
+def test_missing_last_falls_back_to_epoch(run):
+    run.write('epoch30.pt', UNSTRIPPED)
+    assert find_resumable_checkpoint(run.path) == run.path / 'weights' / 'epoch30.pt'
+
+
+def test_no_weights_dir(tmp_path):
+    assert find_resumable_checkpoint(tmp_path) is None
+
+
+def test_changed_train_args(run):
+    run.write('last.pt', UNSTRIPPED)
+    path = run.path / 'weights' / 'last.pt'
+    assert changed_train_args(path, {'epochs': 100, 'batch': 16, 'trainer': object()}) == {}
+    assert changed_train_args(path, {'epochs': 150, 'batch': 16}) == {'epochs': (100, 150)}
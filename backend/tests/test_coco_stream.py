@@ -0,0 +1,50 @@
+import io
+import json
+
+import pytest
+
+pytest.importorskip('requests')  # imported by download_waste_dataset via downloader
+
+from download_waste_dataset import _JsonStream, iter_coco_sections
+
+COCO = {
+    'info': {'description': 'TACO', 'year': 2019},
+    'images': [{'id': i, 'file_name': f'batch_1/{i:06d}.jpg', 'width': 1920, 'height': 1080}
+               for i in range(50)],
+    'annotations': [{'id': i, 'image_id': i // 3, 'category_id': i % 7,
+                     'bbox': [1.5, 2.25, 100.0, 3e2], 'iscrowd': 0} for i in range(150)],
+    'categories': [{'id': i, 'name': f'Cat {i}', 'supercategory': 'Bottle'} for i in range(7)],
+    'scene_annotations': [],
+    'version': 12345678,
+}
+
+
+def expected_sections(document):
+    for key, value in document.items():
+        if isinstance(value, list):
+            yield from ((key, item) for item in value)
+        else:
+            yield key, value
+
+
+@pytest.mark.parametrize('indent', [None, 2])
+def test_iter_coco_sections(tmp_path, indent):
+    path = tmp_path / 'annotations.json'
+    path.write_text(json.dumps(COCO, indent=indent))
+    assert list(iter_coco_sections(path)) == list(expected_sections(COCO))
+
+
+@pytest.mark.parametrize('chunk_size', [3, 7, 64])
+def test_values_split_across_chunks(chunk_size):
+    # Tiny chunks cut numbers, strings and escapes at every possible offset
+    text = json.dumps(COCO, indent=1) + '\n'
+    stream = _JsonStream(io.StringIO(text), chunk_size=chunk_size)
+    assert stream.value() == COCO
+    assert stream.peek() is None
+
+
+def test_rejects_non_object(tmp_path):
+    path = tmp_path / 'annotations.json'
+    path.write_text('[1, 2]')
+    with pytest.raises(ValueError):
+        list(iter_coco_sections(path))
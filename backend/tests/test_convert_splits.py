@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+pytest.importorskip('requests')  # imported by download_waste_dataset via downloader
+
+from download_waste_dataset import convert_taco
+
+
+def test_rerun_with_other_split_moves_images(tmp_path):
+    (tmp_path / 'data.yaml').write_text("path: dataset\ntrain: train/images\nnames: ['bottle']\n")
+    (tmp_path / 'mapping.yaml').write_text('Bottle: bottle\n')
+    images_dir = tmp_path / 'taco'
+    images_dir.mkdir()
+    coco = {'images': [], 'annotations': [], 'categories': [{'id': 1, 'name': 'Bottle'}]}
+    for i in range(20):
+        (images_dir / f'{i}.jpg').write_bytes(b'jpg')
+        coco['images'].append({'id': i, 'file_name': f'{i}.jpg', 'width': 100, 'height': 100})
+        coco['annotations'].append({'id': i, 'image_id': i, 'category_id': 1, 'bbox': [10, 10, 20, 20]})
+    annotations = tmp_path / 'annotations.json'
+    annotations.write_text(json.dumps(coco))
+    output = tmp_path / 'dataset'
+
+    def convert(split):
+        return convert_taco(annotations, images_dir, tmp_path / 'mapping.yaml',
+                            tmp_path / 'data.yaml', output, split=split, workers=2)
+
+    assert convert((0.0, 1.0, 0.0))['images'] == {'valid': 20}
+    assert convert((1.0, 0.0, 0.0))['images'] == {'train': 20}
+    for kind in ('images', 'labels'):
+        assert len(list((output / 'train' / kind).iterdir())) == 20
+        assert not list((output / 'valid' / kind).iterdir())
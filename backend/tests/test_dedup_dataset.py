@@ -0,0 +1,73 @@
+import itertools
+from pathlib import Path
+
+import numpy as np
+
+import dedup_dataset
+from dedup_dataset import find_near_duplicates
+
+
+def brute_force(hashes, threshold):
+    pairs = []
+    for i, j in itertools.combinations(range(len(hashes)), 2):
+        distance = bin(int(hashes[i]) ^ int(hashes[j])).count('1')
+        if distance <= threshold:
+            pairs.append((i, j, distance))
+    return pairs
+
+
+def flip(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def test_finds_pairs_within_threshold():
+    base = 0x0123456789ABCDEF
+    hashes = np.array([
+        base,
+        flip(base, [0, 20, 63]),           # distance 3 from base
+        flip(base, range(0, 64, 8)),       # distance 8: spread over every chunk
+        0xFEDCBA9876543210,
+        0xFEDCBA9876543210,                # exact duplicate
+    ], dtype=np.uint64)
+    assert find_near_duplicates(hashes, 6) == [(0, 1, 3), (3, 4, 0)]
+    # 8 flipped bits spread over all 9 chunks still share one unchanged chunk
+    assert (0, 2, 8) in find_near_duplicates(hashes, 8)
+    assert find_near_duplicates(hashes, 8) == brute_force(hashes, 8)
+
+
+def test_matches_brute_force():
+    rng = np.random.default_rng(0)
+    seeds = rng.integers(0, 2 ** 63, size=40, dtype=np.uint64)
+    # Near copies of each seed with a few random bits flipped
+    variants = [flip(int(s), rng.choice(64, size=rng.integers(0, 9), replace=False)) for s in seeds]
+    hashes = np.array(list(seeds) + variants, dtype=np.uint64)
+    for threshold in (0, 3, 6, 10):
+        assert find_near_duplicates(hashes, threshold) == brute_force(hashes, threshold)
+
+
+def test_remove_only_direct_duplicates_of_kept_image(tmp_path, monkeypatch):
+    # A chain A~B~C~D, 4 bits apart each: only B is within 6 bits of A
+    base = 0x0123456789ABCDEF
+    hashes = [base, flip(base, range(4)), flip(base, range(8)), flip(base, range(12))]
+    entries = []
+    for name, (split, value) in zip('abcd', zip(['val', 'train', 'train', 'train'], hashes)):
+        image = tmp_path / 'dataset' / split / 'images' / f'{name}.jpg'
+        image.parent.mkdir(parents=True, exist_ok=True)
+        image.write_bytes(b'jpg')
+        entries.append({'path': str(image), 'split': split, 'width': 10, 'height': 10,
+                        'hash': f'{value:016x}'})
+    monkeypatch.setattr(dedup_dataset, 'hash_dataset', lambda data_yaml, workers=None: entries)
+
+    report = dedup_dataset.dedup_dataset(str(tmp_path / 'data.yaml'), threshold=6, remove=True)
+    (cluster,) = report['clusters']
+    assert cluster['keep'].endswith('a.jpg')
+    assert [(Path(d['path']).name, d['distance']) for d in cluster['duplicates']] == [('b.jpg', 4)]
+    assert [(Path(d['path']).name, d['distance']) for d in cluster['related']] == \
+        [('c.jpg', 8), ('d.jpg', 12)]
+    assert report['cross_split'] == {'train->val': 1}
+
+    train = tmp_path / 'dataset' / 'train' / 'images'
+    assert sorted(p.name for p in train.iterdir()) == ['c.jpg', 'd.jpg']
+    assert (tmp_path / 'dataset' / 'duplicates' / 'train' / 'images' / 'b.jpg').exists()
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('ultralytics')
+
+from distill import attach_soft_targets, pad_empty_soft_targets
+
+
+class FakeDataset:
+    def __init__(self, labels):
+        self.labels = labels
+
+
+def test_empty_images_keep_soft_target_width():
+    nc = 3
+    dataset = FakeDataset([
+        {'im_file': 'a.jpg', 'cls': np.array([[1.0]]), 'bboxes': np.array([[0.5, 0.5, 0.2, 0.2]])},
+        {'im_file': 'b.jpg', 'cls': np.zeros((0, 1)), 'bboxes': np.zeros((0, 4))},
+    ])
+    attach_soft_targets(dataset, {}, nc)
+    assert dataset.labels[1]['cls'].shape == (0, 1 + nc)
+
+    # What ultralytics' Format hands back for an image without boxes
+    for empty in (torch.zeros(0, 1), torch.zeros(0)):
+        label = pad_empty_soft_targets({'cls': empty}, nc)
+        assert label['cls'].shape == (0, 1 + nc)
+
+    full = torch.from_numpy(dataset.labels[0]['cls'])
+    batch = torch.cat([full, pad_empty_soft_targets({'cls': torch.zeros(0, 1)}, nc)['cls']], 0)
+    assert batch.shape == (1, 1 + nc)
+    assert pad_empty_soft_targets({'cls': full}, nc)['cls'] is full
@@ -0,0 +1,126 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+
+import downloader
+from downloader import _plan_segments, download
+
+PAYLOAD = bytes(range(256)) * 4096 * 4  # 4 MB: several CHUNK_SIZE chunks
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Plain server without Range support; drops the first response halfway"""
+
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.headers.get('Range'))
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(PAYLOAD)))
+        self.end_headers()
+        if len(self.requests) == 2:  # the probe, then the first real GET
+            self.wfile.write(PAYLOAD[:len(PAYLOAD) * 5 // 8])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, *args):
+        pass
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Range-capable server; drops the first request for the second segment halfway"""
+
+    requests = []
+    dropped = False
+
+    def do_GET(self):
+        header = self.headers.get('Range')
+        self.requests.append(header)
+        start, end = (int(v) for v in header.split('=')[1].split('-'))
+        self.send_response(206)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Range', f'bytes {start}-{end}/{len(PAYLOAD)}')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        body = PAYLOAD[start:end + 1]
+        if start == len(PAYLOAD) // 4 and not RangeHandler.dropped:
+            RangeHandler.dropped = True
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(handler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://127.0.0.1:{server.server_port}/file.bin'
+
+
+@pytest.fixture
+def flaky_server():
+    FlakyHandler.requests = []
+    server, url = serve(FlakyHandler)
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def range_server():
+    RangeHandler.requests = []
+    RangeHandler.dropped = False
+    server, url = serve(RangeHandler)
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+def test_plan_segments(monkeypatch):
+    monkeypatch.setattr(downloader, 'MIN_SEGMENT', 100)
+    assert _plan_segments(1000, True, 4) == [[0, 250, 0], [250, 500, 0], [500, 750, 0], [750, 1000, 0]]
+    # Never more segments than MIN_SEGMENT allows, and the last one ends at size
+    assert _plan_segments(250, True, 4) == [[0, 125, 0], [125, 250, 0]]
+    assert _plan_segments(1001, True, 4)[-1] == [753, 1001, 0]
+    # No ranges or unknown size: one plain stream
+    assert _plan_segments(1000, False, 4) == [[0, 1000, 0]]
+    assert _plan_segments(None, True, 4) == [[0, None, 0]]
+
+
+def test_server_without_ranges_restarts_after_drop(flaky_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(downloader, 'RETRIES', 3)
+    target = download(flaky_server, tmp_path / 'file.bin',
+                      sha256=hashlib.sha256(PAYLOAD).hexdigest(), timeout=5)
+    assert target.read_bytes() == PAYLOAD
+    # Every retry starts over without a Range header
+    assert FlakyHandler.requests[0] == 'bytes=0-0'
+    assert FlakyHandler.requests[1:] == [None, None]
+
+
+def test_dropped_segment_resumes_from_its_last_byte(range_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(downloader, 'MIN_SEGMENT', 1024 * 1024)
+    monkeypatch.setattr(downloader, 'CHUNK_SIZE', 64 * 1024)
+    target = download(range_server, tmp_path / 'file.bin', segments=4,
+                      sha256=hashlib.sha256(PAYLOAD).hexdigest(), timeout=5)
+    assert target.read_bytes() == PAYLOAD
+    assert not (tmp_path / 'file.bin.part.json').exists()
+
+    quarter = len(PAYLOAD) // 4
+    second = [r for r in RangeHandler.requests[1:]
+              if quarter <= int(r.split('=')[1].split('-')[0]) < 2 * quarter]
+    # The retry asks only for the bytes the dropped request did not deliver
+    assert second[0] == f'bytes={quarter}-{2 * quarter - 1}'
+    assert len(second) == 2
+    assert quarter < int(second[1].split('=')[1].split('-')[0]) <= quarter + quarter // 2
+    assert second[1].endswith(f'-{2 * quarter - 1}')
@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from job_queue import JobLost, JobQueue
+
+
+def noop(params, input_dir, progress):
+    return {}
+
+
+def test_startup_requeues_only_stale_jobs(tmp_path):
+    sibling = JobQueue(tmp_path, {'noop': noop})
+    crashed = JobQueue(tmp_path, {'noop': noop})
+    live_job = sibling.submit('noop', {})
+    dead_job = crashed.submit('noop', {})
+    assert sibling._claim()['id'] == live_job
+    assert crashed._claim()['id'] == dead_job
+    # The crashed process stopped reporting long ago
+    crashed._conn().execute('UPDATE jobs SET heartbeat_at = ? WHERE id = ?',
+                            (time.time() - 120, dead_job))
+
+    # Same PID after a container restart: only the owner token tells them apart
+    JobQueue(tmp_path, {'noop': noop}, stale_seconds=60)
+    assert sibling.get(live_job)['status'] == 'running'
+    assert sibling.get(dead_job)['status'] == 'queued'
+    sibling._progress_callback(live_job)(1, 10)  # still owned by the sibling
+
+
+def test_stale_jobs_are_requeued_and_old_owner_is_stopped(tmp_path):
+    owner = JobQueue(tmp_path, {'noop': noop})
+    other = JobQueue(tmp_path, {'noop': noop}, stale_seconds=60)
+    job_id = owner.submit('noop', {})
+    owner._claim()
+    progress = owner._progress_callback(job_id)
+    progress(1, 10)
+
+    other._sweep()
+    assert other.get(job_id)['status'] == 'running'  # heartbeat is fresh
+
+    owner._conn().execute('UPDATE jobs SET heartbeat_at = ?', (time.time() - 120,))
+    other._next_sweep = 0
+    other._sweep()
+    assert other.get(job_id)['status'] == 'queued'
+    with pytest.raises(JobLost):
+        progress(10, 10)
+
+
+def test_higher_priority_first(tmp_path):
+    queue = JobQueue(tmp_path, {'noop': noop})
+    low = queue.submit('noop', {}, priority=0)
+    high = queue.submit('noop', {}, priority=5)
+    assert [queue._claim()['id'], queue._claim()['id']] == [high, low]
@@ -0,0 +1,35 @@
+import json
+
+from sweep_hyperparams import _archive_progress, _start_progress, should_prune
+
+
+def write_progress(path, maps):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        for epoch, value in enumerate(maps, 1):
+            f.write(json.dumps({'epoch': epoch, 'map50_95': value, 'map50': value}) + '\n')
+
+
+def test_rerun_ignores_epochs_of_queued_trials(tmp_path):
+    # An earlier sweep left a strong trial 'c' behind
+    stale = tmp_path / 'c' / 'progress.jsonl'
+    write_progress(stale, [0.8, 0.9])
+    _archive_progress(tmp_path)
+
+    write_progress(tmp_path / 'a' / 'progress.jsonl', [0.1, 0.2])
+    write_progress(tmp_path / 'b' / 'progress.jsonl', [0.1, 0.2])
+    # 'c' is still queued: its old epochs must not raise the median
+    assert not stale.exists()
+    assert not should_prune(tmp_path, 'a', 2, 0.2)
+
+    _start_progress(stale, 1)
+    assert stale.read_text() == ''
+    assert not (tmp_path / 'c' / 'progress.prev.jsonl').exists()
+
+
+def test_resumed_trial_keeps_earlier_epochs(tmp_path):
+    path = tmp_path / 'a' / 'progress.jsonl'
+    write_progress(path, [0.1, 0.2, 0.3, 0.4])
+    _archive_progress(tmp_path)
+    _start_progress(path, 3)
+    assert [json.loads(line)['epoch'] for line in path.read_text().splitlines()] == [1, 2]
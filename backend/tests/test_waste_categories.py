@@ -0,0 +1,47 @@
+import pytest
+
+from waste_categories import build_class_table, resolve_waste_key, waste_class_ids
+
+COCO_NAMES = [
+    'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 'boat',
+    'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench', 'bird', 'cat', 'dog',
+    'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra', 'giraffe', 'backpack', 'umbrella',
+    'handbag', 'tie', 'suitcase', 'frisbee', 'skis', 'snowboard', 'sports ball', 'kite',
+    'baseball bat', 'baseball glove', 'skateboard', 'surfboard', 'tennis racket', 'bottle',
+    'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple', 'sandwich',
+    'orange', 'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake', 'chair', 'couch',
+    'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop', 'mouse', 'remote',
+    'keyboard', 'cell phone', 'microwave', 'oven', 'toaster', 'sink', 'refrigerator', 'book',
+    'clock', 'vase', 'scissors', 'teddy bear', 'hair drier', 'toothbrush',
+]
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('Bottle', ('bottle', 'exact')),
+    ('Plastic_Bottles', ('plastic-bottle', 'compact')),
+    ('PlasticBag', ('plastic-bag', 'compact')),
+    ('plastic bottle cap', ('plastic-bottle', 'words')),
+    ('wine glass', ('glass', 'words')),
+    # Whole words only
+    ('car', (None, None)),
+    ('person', (None, None)),
+])
+def test_resolve_waste_key(name, expected):
+    assert resolve_waste_key(name) == expected
+
+
+def test_coco_classes_kept_by_the_service():
+    names = dict(enumerate(COCO_NAMES))
+    kept = [names[i] for i in waste_class_ids(names)]
+    assert kept == ['bottle', 'wine glass', 'cell phone']
+    assert [names[i] for i in waste_class_ids(names, extra=['Person'])] == \
+        ['person', 'bottle', 'wine glass', 'cell phone']
+
+
+def test_build_class_table():
+    table = build_class_table({0: 'Plastic_Bottles', 2: 'person'})
+    assert table[1] is None
+    assert table[0]['matched'] == 'plastic-bottle'
+    assert table[0]['category'] == 'Recyclable'
+    assert table[2]['matched'] is None
+    assert table[2]['category'] == 'Unknown'
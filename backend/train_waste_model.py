@@ -8,7 +8,40 @@ Supports training on custom datasets with specific waste categories.
 from ultralytics import YOLO
 import torch
 import os
+import shutil
 from pathlib import Path
+from checkpoints import changed_train_args, crash_safe_trainer, find_resumable_checkpoint
+from dataset_utils import file_stamp, iter_images, label_path_for, load_dataset_config
+from training_profiler import ThroughputProfiler
+
+# Default training hyperparameters; any of them (or any other
+# model.train() argument) can be overridden with `hyperparams`
+DEFAULT_HYPERPARAMS = {
+    # Optimization
+    'optimizer': 'AdamW',
+    'lr0': 0.01,
+    'lrf': 0.01,
+    'momentum': 0.937,
+    'weight_decay': 0.0005,
+    'warmup_epochs': 3.0,
+    'warmup_momentum': 0.8,
+    'warmup_bias_lr': 0.1,
+
+    # Data augmentation
+    'hsv_h': 0.015,       # HSV-Hue augmentation
+    'hsv_s': 0.7,         # HSV-Saturation augmentation
+    'hsv_v': 0.4,         # HSV-Value augmentation
+    'degrees': 10.0,      # Rotation
+    'translate': 0.1,     # Translation
+    'scale': 0.5,         # Scaling
+    'shear': 0.0,         # Shear
+    'perspective': 0.0,   # Perspective
+    'flipud': 0.0,        # Flip up-down
+    'fliplr': 0.5,        # Flip left-right
+    'mosaic': 1.0,        # Mosaic augmentation
+    'mixup': 0.0,         # Mixup augmentation
+    'copy_paste': 0.0,    # Copy-paste augmentation
+}
 
 def train_waste_detection_model(
     data_yaml='waste_data.yaml',
@@ -17,7 +50,17 @@ def train_waste_detection_model(
     img_size=640,
     batch_size=16,
     project_name='waste_detection',
-    run_name='waste_yolov8'
+    run_name='waste_yolov8',
+    image_cache=False,
+    hyperparams=None,
+    callbacks=None,
+    export_onnx=True,
+    resume=True,
+    keep_checkpoints=3,
+    profile=True,
+    teacher=None,
+    distill_alpha=0.5,
+    export_all=False
 ):
     """
     Train YOLOv8 model for waste detection
@@ -30,6 +73,21 @@ def train_waste_detection_model(
         batch_size: Batch size for training
         project_name: Project directory name
         run_name: Run name for this training session
+        image_cache: Read pre-resized images from a memory-mapped cache
+            instead of decoding JPEGs every epoch (see image_cache.py)
+        hyperparams: Overrides for DEFAULT_HYPERPARAMS (or other train args)
+        callbacks: Optional {event_name: function} ultralytics callbacks
+        export_onnx: Export the trained model to ONNX at the end
+        export_all: Instead, run the full export matrix (TorchScript, ONNX,
+            OpenVINO, INT8), benchmark it and select a serving artifact
+            (see export_models.py)
+        resume: Continue an interrupted run of the same project/run_name
+            from its latest checkpoint instead of starting over
+        keep_checkpoints: Periodic epochN.pt checkpoints to keep
+        profile: Record per-epoch throughput to <run>/throughput.jsonl
+            (see training_profiler.py)
+        teacher: Trained larger model to distill from (see distill.py)
+        distill_alpha: Weight of the teacher's soft targets in the class loss
     """
     
     # Check if GPU is available
@@ -44,14 +102,22 @@ def train_waste_detection_model(
     print(f"Batch Size: {batch_size}")
     print(f"{'='*60}\n")
     
-    # Load pretrained YOLOv8 model
-    model_path = f'yolov8{model_size}.pt'
-    print(f"Loading pretrained model: {model_path}")
-    model = YOLO(model_path)
+    trainer = None
+    if image_cache:
+        from image_cache import build_image_cache, cached_detection_trainer
+
+        trainer = cached_detection_trainer(build_image_cache(data_yaml, img_size))
+    if teacher:
+        from distill import build_teacher_cache, distillation_trainer
+
+        soft_targets = build_teacher_cache(teacher, data_yaml, img_size)
+        trainer = distillation_trainer(soft_targets, distill_alpha, base=trainer)
+    trainer = crash_safe_trainer(trainer, keep=keep_checkpoints)
     
     # Train the model
     print("\n🎯 Starting training...")
-    results = model.train(
+    train_args = dict(
+        trainer=trainer,
         data=data_yaml,
         epochs=epochs,
         imgsz=img_size,
@@ -63,36 +129,43 @@ def train_waste_detection_model(
         name=run_name,
         exist_ok=True,
         
-        # Optimization
-        optimizer='AdamW',
-        lr0=0.01,
-        lrf=0.01,
-        momentum=0.937,
-        weight_decay=0.0005,
-        warmup_epochs=3.0,
-        warmup_momentum=0.8,
-        warmup_bias_lr=0.1,
-        
-        # Data augmentation
-        hsv_h=0.015,  # HSV-Hue augmentation
-        hsv_s=0.7,    # HSV-Saturation augmentation
-        hsv_v=0.4,    # HSV-Value augmentation
-        degrees=10.0,  # Rotation
-        translate=0.1, # Translation
-        scale=0.5,     # Scaling
-        shear=0.0,     # Shear
-        perspective=0.0, # Perspective
-        flipud=0.0,    # Flip up-down
-        fliplr=0.5,    # Flip left-right
-        mosaic=1.0,    # Mosaic augmentation
-        mixup=0.0,     # Mixup augmentation
-        copy_paste=0.0, # Copy-paste augmentation
-        
         # Validation
         val=True,
         plots=True,
         save_period=10,  # Save checkpoint every N epochs
     )
+    train_args.update(DEFAULT_HYPERPARAMS)
+    train_args.update(hyperparams or {})
+
+    resume_from = find_resumable_checkpoint(Path(project_name) / run_name) if resume else None
+    if resume_from:
+        # Resuming restores the checkpoint's arguments, so new settings would be ignored
+        changed = changed_train_args(resume_from, train_args)
+        if changed:
+            print(f"⚠️  Not resuming {resume_from}: settings changed since it was written")
+            for name, (old, new) in changed.items():
+                print(f"   {name}: {old} -> {new}")
+            resume_from = None
+    if resume_from:
+        # Optimizer, scheduler, EMA and epoch counter come from the checkpoint
+        print(f"♻️  Resuming interrupted run from: {resume_from}")
+        model = YOLO(str(resume_from))
+    else:
+        # Load pretrained YOLOv8 model
+        model_path = f'yolov8{model_size}.pt'
+        print(f"Loading pretrained model: {model_path}")
+        model = YOLO(model_path)
+    for event, callback in (callbacks or {}).items():
+        model.add_callback(event, callback)
+    if profile:
+        for event, callback in ThroughputProfiler().callbacks().items():
+            model.add_callback(event, callback)
+
+    if resume_from:
+        # The run's original arguments are restored from the checkpoint
+        results = model.train(trainer=trainer, resume=True)
+    else:
+        results = model.train(**train_args)
     
     print("\n✅ Training completed!")
     
@@ -114,16 +187,161 @@ def train_waste_detection_model(
     print(f"✅ Best model saved to: {best_model_path}")
     
     # Export model (optional)
-    try:
-        print("\n📦 Exporting model to ONNX format...")
-        model.export(format='onnx')
-        print("✅ ONNX export successful!")
-    except Exception as e:
-        print(f"⚠️  ONNX export failed: {e}")
+    if export_all:
+        from export_models import export_matrix
+
+        export_matrix(str(best_model_path), data_yaml, img_sizes=(img_size,))
+    elif export_onnx:
+        try:
+            print("\n📦 Exporting model to ONNX format...")
+            model.export(format='onnx')
+            print("✅ ONNX export successful!")
+        except Exception as e:
+            print(f"⚠️  ONNX export failed: {e}")
     
     return str(best_model_path)
 
 
+def build_classification_dataset(data_yaml='waste_data.yaml', output_dir='dataset_cls'):
+    """
+    Derive a YOLOv8-cls dataset from the detection dataset
+
+    Each labeled image is filed under the class of its largest box, so the
+    classifier learns the same "main object" answer /detect returns.
+    Images are hardlinked where possible to avoid duplicating the dataset.
+    Rebuilding updates the folders in place: entries for images that were
+    deleted or now belong to another class (or class name) are removed.
+
+    Args:
+        data_yaml: Detection dataset configuration file
+        output_dir: Where to write <split>/<class_name>/ folders
+    """
+    splits, names = load_dataset_config(data_yaml)
+    output_dir = Path(output_dir)
+
+    print(f"\n📁 Building classification dataset in {output_dir}...")
+
+    produced = set()
+    for split, images_dir in splits.items():
+        if not images_dir.exists():
+            print(f"  ⚠️  Skipping {split}: {images_dir} not found")
+            continue
+
+        counts = {}
+        for image_path in iter_images(images_dir):
+            label_path = label_path_for(image_path)
+            if not label_path.exists():
+                continue
+
+            # Pick the class of the largest box in the image
+            best_class, best_area = None, 0.0
+            with open(label_path) as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) < 5:
+                        continue
+                    area = float(parts[3]) * float(parts[4])
+                    if area > best_area:
+                        best_class, best_area = int(parts[0]), area
+
+            if best_class is None or best_class >= len(names):
+                continue
+
+            class_dir = output_dir / split / names[best_class]
+            class_dir.mkdir(parents=True, exist_ok=True)
+            target = class_dir / image_path.name
+            if target.exists() and file_stamp(target) != file_stamp(image_path):
+                # The source image was replaced since the last build
+                target.unlink()
+            if not target.exists():
+                try:
+                    os.link(image_path, target)
+                except OSError:
+                    shutil.copy2(image_path, target)
+            produced.add(target)
+
+            counts[names[best_class]] = counts.get(names[best_class], 0) + 1
+
+        print(f"  {split}: {sum(counts.values())} images across {len(counts)} classes")
+
+    removed = 0
+    for path in sorted(output_dir.glob('*/*/*'), reverse=True):
+        if path.is_file() and path not in produced:
+            path.unlink()
+            removed += 1
+    for class_dir in sorted(output_dir.glob('*/*'), reverse=True) + sorted(output_dir.glob('*')):
+        if class_dir.is_dir() and not any(class_dir.iterdir()):
+            class_dir.rmdir()
+    if removed:
+        print(f"  🧹 Removed {removed} stale images")
+
+    print(f"✅ Classification dataset ready: {output_dir}")
+    return str(output_dir)
+
+
+def train_waste_classifier(
+    data_yaml='waste_data.yaml',
+    model_size='n',
+    epochs=50,
+    img_size=224,
+    batch_size=32,
+    project_name='waste_detection',
+    run_name='waste_yolov8_cls'
+):
+    """
+    Train a YOLOv8-cls model for the /detect classification fast path
+
+    Uses the same dataset and class list as the detector (see
+    build_classification_dataset).
+
+    Args:
+        data_yaml: Path to the detection dataset configuration file
+        model_size: Model size (n=nano, s=small, m=medium, l=large, x=xlarge)
+        epochs: Number of training epochs
+        img_size: Input image size
+        batch_size: Batch size for training
+        project_name: Project directory name
+        run_name: Run name for this training session
+    """
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    print(f"\n{'='*60}")
+    print(f"🚀 Starting YOLOv8 Waste Classifier Training")
+    print(f"{'='*60}")
+    print(f"Device: {device}")
+    print(f"Model: YOLOv8{model_size}-cls")
+    print(f"Epochs: {epochs}")
+    print(f"Image Size: {img_size}")
+    print(f"Batch Size: {batch_size}")
+    print(f"{'='*60}\n")
+
+    cls_dataset = build_classification_dataset(data_yaml)
+
+    model = YOLO(f'yolov8{model_size}-cls.pt')
+    model.train(
+        data=cls_dataset,
+        epochs=epochs,
+        imgsz=img_size,
+        batch=batch_size,
+        device=device,
+        patience=20,
+        project=project_name,
+        name=run_name,
+        exist_ok=True,
+    )
+
+    metrics = model.val()
+    print(f"\n{'='*60}")
+    print("📈 Classifier Results:")
+    print(f"{'='*60}")
+    print(f"Top-1 accuracy: {metrics.top1:.4f}")
+    print(f"Top-5 accuracy: {metrics.top5:.4f}")
+    print(f"{'='*60}\n")
+
+    best_model_path = Path(project_name) / run_name / 'weights' / 'best.pt'
+    print(f"✅ Best classifier saved to: {best_model_path}")
+    return str(best_model_path)
+
+
 def create_sample_dataset_config():
     """Create a sample dataset configuration file"""
     
@@ -180,6 +398,29 @@ if __name__ == '__main__':
                         help='Batch size')
     parser.add_argument('--create-config', action='store_true',
                         help='Create sample dataset configuration file')
+    parser.add_argument('--classifier', action='store_true',
+                        help='Train a YOLOv8-cls model for the /detect fast path instead')
+    parser.add_argument('--skip-validation', action='store_true',
+                        help='Do not validate the dataset before training')
+    parser.add_argument('--image-cache', action='store_true',
+                        help='Decode and resize images once into a memory-mapped cache')
+    parser.add_argument('--hyp', type=str, default=None,
+                        help='JSON file of hyperparameter overrides (e.g. from sweep_hyperparams.py)')
+    parser.add_argument('--no-resume', action='store_true',
+                        help='Start over even if an interrupted run exists')
+    parser.add_argument('--keep-checkpoints', type=int, default=3,
+                        help='Periodic epochN.pt checkpoints to keep')
+    parser.add_argument('--no-profile', action='store_true',
+                        help='Do not record per-epoch throughput')
+    parser.add_argument('--export-all', action='store_true',
+                        help='Export to all CPU formats, benchmark them and write a serving manifest')
+    parser.add_argument('--teacher', type=str, default=None,
+                        help='Distill from this trained (larger) model')
+    parser.add_argument('--distill-alpha', type=float, default=0.5,
+                        help='Weight of the teacher soft targets (0-1)')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='Plain-trained model to compare the student with '
+                             '(default: train one with the same settings)')
     
     args = parser.parse_args()
     
@@ -191,15 +432,65 @@ if __name__ == '__main__':
             print(f"❌ Dataset configuration file not found: {args.data}")
             print("💡 Run with --create-config to create a sample configuration")
             exit(1)
+
+        if not args.skip_validation:
+            from validate_dataset import validate_dataset, print_summary
+
+            summary = validate_dataset(args.data)
+            print_summary(summary)
+            if summary['errors']:
+                print("💡 Fix the dataset, or rerun with --skip-validation to train anyway")
+                exit(1)
         
-        # Train model
-        best_model = train_waste_detection_model(
+        if args.classifier:
+            best_classifier = train_waste_classifier(
+                data_yaml=args.data,
+                model_size=args.model,
+                epochs=args.epochs,
+                batch_size=args.batch
+            )
+            print(f"\n🎉 Classifier ready! Serve it on /detect with:")
+            print(f"   YOLO_CLASSIFIER={best_classifier} python yolov8_service.py")
+            exit(0)
+
+        hyperparams = None
+        if args.hyp:
+            import json
+            with open(args.hyp) as f:
+                hyperparams = json.load(f)
+
+        train_kwargs = dict(
             data_yaml=args.data,
             model_size=args.model,
             epochs=args.epochs,
             img_size=args.img_size,
-            batch_size=args.batch
+            batch_size=args.batch,
+            image_cache=args.image_cache,
+            hyperparams=hyperparams,
+            resume=not args.no_resume,
+            keep_checkpoints=args.keep_checkpoints,
+            profile=not args.no_profile,
+            export_all=args.export_all
         )
+
+        if args.teacher:
+            from distill import distillation_report
+
+            best_model = train_waste_detection_model(
+                run_name=f'waste_yolov8{args.model}_distilled',
+                teacher=args.teacher,
+                distill_alpha=args.distill_alpha,
+                **train_kwargs
+            )
+            baseline = args.baseline or train_waste_detection_model(
+                run_name=f'waste_yolov8{args.model}_plain',
+                export_onnx=False,
+                **train_kwargs
+            )
+            distillation_report(best_model, baseline, args.data, args.img_size, teacher=args.teacher)
+        else:
+            # Train model
+            best_model = train_waste_detection_model(**train_kwargs)
         
         print(f"\n🎉 Training complete! Use this model in yolov8_service.py:")
         print(f"   model = YOLO('{best_model}')")
@@ -0,0 +1,388 @@
+"""
+In-process training pipeline: convert -> validate -> train -> export -> benchmark
+
+All stages run in one interpreter. torch and ultralytics are imported once,
+only when a stage needs them. Loaded models are shared between stages.
+
+Each stage records a fingerprint of its inputs (file sizes/mtimes and
+settings) in <project>/<run>/pipeline.json. On the next run, a stage whose
+fingerprint is unchanged and whose outputs still exist is skipped. So
+re-running after adding images only re-validates and retrains, and
+re-running with nothing changed is a no-op. --force reruns chosen stages.
+
+Stages:
+- convert: TACO / TrashNet into dataset/ (only when a source is given)
+- validate: validate_dataset.py (stops the pipeline on errors)
+- train: train_waste_model.py (resumes a run interrupted with the same
+  fingerprint, otherwise trains from scratch)
+- export: export_models.py matrix and serving manifest
+- benchmark: CPU latency of best.pt and the selected export
+
+Usage:
+    python training_pipeline.py --data waste_data.yaml --model n --epochs 100
+    python training_pipeline.py --taco-annotations TACO/data/annotations.json --taco-images TACO/data
+    python training_pipeline.py --stages validate train --force train
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from dataset_utils import file_stamp, iter_images, label_path_for, load_dataset_config
+
+STAGES = ('convert', 'validate', 'train', 'export', 'benchmark')
+STATE_VERSION = 1
+
+
+class PipelineError(Exception):
+    """A stage failed in a way later stages cannot recover from"""
+
+
+def _fingerprint(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def dataset_stamps(data_yaml):
+    """Stamps of the dataset YAML and of every image and label it points to"""
+    splits, names = load_dataset_config(data_yaml)
+    stamps = {'yaml': file_stamp(data_yaml), 'names': names}
+    for split, images_dir in splits.items():
+        stamps[split] = [
+            (image.name, file_stamp(image), file_stamp(label_path_for(image)))
+            for image in iter_images(images_dir)
+        ]
+    return stamps
+
+
+class TrainingPipeline:
+    """
+    Shared state for the pipeline stages
+
+    Args:
+        data_yaml: Dataset configuration file
+        model_size: YOLOv8 size (n/s/m/l/x)
+        epochs, img_size, batch_size: Training settings
+        project_name, run_name: Training run directory
+        train_options: Extra train_waste_detection_model() arguments
+            (hyperparams, image_cache, teacher, ...)
+        taco: (annotations.json, images dir) to convert, or None
+        trashnet: TrashNet root to convert, or None
+        batch_sizes: Batch sizes for export selection and the benchmark
+        force: Stage names to rerun even when current
+    """
+
+    def __init__(self, data_yaml='waste_data.yaml', model_size='n', epochs=100, img_size=640,
+                 batch_size=16, project_name='waste_detection', run_name='waste_yolov8',
+                 train_options=None, taco=None, trashnet=None, batch_sizes=(1, 8), force=()):
+        self.data_yaml = data_yaml
+        self.model_size = model_size
+        self.epochs = epochs
+        self.img_size = img_size
+        self.batch_size = batch_size
+        self.project_name = project_name
+        self.run_name = run_name
+        self.train_options = train_options or {}
+        self.taco = taco
+        self.trashnet = trashnet
+        self.batch_sizes = tuple(batch_sizes)
+        self.force = set(force)
+
+        self.run_dir = Path(project_name) / run_name
+        self.state_path = self.run_dir / 'pipeline.json'
+        self.state = self._load_state()
+        self.best_model = str(self.run_dir / 'weights' / 'best.pt')
+        self.manifest_path = self.run_dir / 'weights' / 'exports' / 'manifest.json'
+        self._models = {}
+        self._dataset_stamps = None
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            if state.get('version') == STATE_VERSION:
+                return state
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        return {'version': STATE_VERSION, 'stages': {}}
+
+    def _save_state(self):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = Path(f'{self.state_path}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def model(self, path):
+        """Loaded YOLO model, shared by all stages (imports ultralytics on first use)"""
+        if path not in self._models:
+            from ultralytics import YOLO
+
+            self._models[path] = YOLO(str(path), task='detect')
+        return self._models[path]
+
+    def dataset_stamps(self):
+        """dataset_stamps() of the dataset, computed once per run (convert resets it)"""
+        if self._dataset_stamps is None:
+            self._dataset_stamps = dataset_stamps(self.data_yaml)
+        return self._dataset_stamps
+
+    def _current(self, stage, fingerprint, outputs):
+        record = self.state['stages'].get(stage)
+        return (
+            stage not in self.force and record is not None
+            and record['fingerprint'] == fingerprint
+            and all(os.path.exists(p) for p in outputs)
+        )
+
+    def _mark_started(self, stage, fingerprint):
+        """Remember what a stage was started with, so an interrupted run can be told apart"""
+        self.state.setdefault('started', {})[stage] = fingerprint
+        self._save_state()
+
+    def _record(self, stage, fingerprint, result):
+        self.state.get('started', {}).pop(stage, None)
+        self.state['stages'][stage] = {
+            'fingerprint': fingerprint,
+            'finished': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'result': result,
+        }
+        self._save_state()
+
+    # Stages: each returns (fingerprint, outputs, run) so run() can decide to skip
+
+    def convert(self):
+        from download_waste_dataset import convert_taco, convert_trashnet, print_conversion_summary
+
+        sources = {}
+        if self.taco:
+            annotations, images_dir = self.taco
+            sources['taco'] = [file_stamp(annotations), str(images_dir), file_stamp('taco_mapping.yaml')]
+        if self.trashnet:
+            folders = sorted(p for p in Path(self.trashnet).iterdir() if p.is_dir())
+            sources['trashnet'] = [[p.name, file_stamp(p)] for p in folders] + [file_stamp('trashnet_mapping.yaml')]
+        fingerprint = _fingerprint([sources, file_stamp(self.data_yaml)])
+
+        def run():
+            result = {}
+            if self.taco:
+                result['taco'] = convert_taco(*self.taco, data_yaml=self.data_yaml)
+                print_conversion_summary(result['taco'])
+            if self.trashnet:
+                result['trashnet'] = convert_trashnet(self.trashnet, data_yaml=self.data_yaml)
+                print_conversion_summary(result['trashnet'])
+            self._dataset_stamps = None
+            return result
+
+        return fingerprint, ['dataset'], run
+
+    def validate(self):
+        from validate_dataset import print_summary, validate_dataset
+
+        fingerprint = _fingerprint(self.dataset_stamps())
+
+        def run():
+            summary = validate_dataset(self.data_yaml)
+            print_summary(summary)
+            if summary['errors']:
+                raise PipelineError(f"{len(summary['errors'])} dataset problem(s), see {summary['index']}")
+            return {'images': summary['images'], 'instances': summary['instances']}
+
+        return fingerprint, [Path(self.data_yaml).with_suffix('.index.json')], run
+
+    def train(self):
+        settings = {
+            'model_size': self.model_size, 'epochs': self.epochs, 'img_size': self.img_size,
+            'batch_size': self.batch_size, 'options': self.train_options,
+        }
+        fingerprint = _fingerprint([settings, self.dataset_stamps()])
+
+        def run():
+            from train_waste_model import train_waste_detection_model
+
+            options = dict(self.train_options)
+            options.setdefault('export_onnx', False)  # the export stage covers it
+            # Resume only a run interrupted with these exact inputs; new data or
+            # settings (or --force train) mean a fresh run
+            interrupted = self.state.get('started', {}).get('train') == fingerprint
+            options.setdefault('resume', interrupted and 'train' not in self.force)
+            self._mark_started('train', fingerprint)
+            self.best_model = train_waste_detection_model(
+                data_yaml=self.data_yaml,
+                model_size=self.model_size,
+                epochs=self.epochs,
+                img_size=self.img_size,
+                batch_size=self.batch_size,
+                project_name=self.project_name,
+                run_name=self.run_name,
+                **options
+            )
+            # Weights changed on disk: drop any stale loaded copy
+            self._models.pop(self.best_model, None)
+            return {'best_model': self.best_model}
+
+        return fingerprint, [self.best_model], run
+
+    def export(self):
+        fingerprint = _fingerprint([file_stamp(self.best_model), self.img_size, self.batch_sizes])
+
+        def run():
+            from export_models import export_matrix
+
+            manifest = export_matrix(self.best_model, self.data_yaml, img_sizes=(self.img_size,),
+                                     batch_sizes=self.batch_sizes)
+            return {'selected': manifest['selected']}
+
+        return fingerprint, [self.manifest_path], run
+
+    def benchmark(self):
+        fingerprint = _fingerprint([file_stamp(self.best_model), file_stamp(self.manifest_path),
+                                    self.img_size, self.batch_sizes])
+        output = self.run_dir / 'benchmark.json'
+
+        def run():
+            from model_benchmark import measure_latency
+
+            candidates = {'best.pt': self.best_model}
+            if self.manifest_path.exists():
+                from export_models import read_export_manifest
+
+                try:
+                    candidates['selected export'] = read_export_manifest(self.manifest_path)[0]
+                except ValueError as e:
+                    print(f"⚠️  {e}")
+
+            result = {}
+            for label, path in candidates.items():
+                result[label] = {'path': str(path), 'latency': {}}
+                for batch_size in self.batch_sizes:
+                    latency = measure_latency(self.model(path), self.img_size, batch_size)
+                    result[label]['latency'][str(batch_size)] = latency
+                    print(f"⏱️  {label} b{batch_size}: p50 {latency['p50_ms']} ms "
+                          f"({latency['images_per_second']} img/s)")
+            with open(output, 'w') as f:
+                json.dump(result, f, indent=2)
+            return result
+
+        return fingerprint, [output], run
+
+    def run(self, stages=STAGES):
+        """
+        Run the given stages in pipeline order, skipping current ones
+
+        Returns:
+            {stage: 'ran' | 'skipped' | 'not needed'}
+        """
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+
+        outcome = {}
+        start = time.perf_counter()
+        for stage in STAGES:
+            if stage not in stages:
+                continue
+            if stage == 'convert' and not (self.taco or self.trashnet):
+                outcome[stage] = 'not needed'
+                continue
+
+            print("\n" + "="*60)
+            print(f"▶️  Stage: {stage}")
+            print("="*60)
+            fingerprint, outputs, run = getattr(self, stage)()
+            if self._current(stage, fingerprint, outputs):
+                print(f"⏭️  {stage} is current, skipped")
+                outcome[stage] = 'skipped'
+                continue
+
+            stage_start = time.perf_counter()
+            result = run()
+            self._record(stage, fingerprint, result)
+            print(f"✅ {stage} finished in {time.perf_counter() - stage_start:.1f}s")
+            outcome[stage] = 'ran'
+
+        print("\n" + "="*60)
+        print("🏁 Pipeline Summary")
+        print("="*60)
+        for stage, status in outcome.items():
+            print(f"{stage:<10} {status}")
+        print(f"Total: {time.perf_counter() - start:.1f}s  (state: {self.state_path})")
+        print("="*60)
+        return outcome
+
+
+def build_parser():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run the training pipeline in one process')
+    parser.add_argument('--data', type=str, default='waste_data.yaml',
+                        help='Path to dataset YAML file')
+    parser.add_argument('--model', type=str, default='n', choices=['n', 's', 'm', 'l', 'x'],
+                        help='Model size')
+    parser.add_argument('--epochs', type=int, default=100,
+                        help='Number of training epochs')
+    parser.add_argument('--img-size', type=int, default=640,
+                        help='Input image size')
+    parser.add_argument('--batch', type=int, default=16,
+                        help='Batch size')
+    parser.add_argument('--run-name', type=str, default='waste_yolov8',
+                        help='Run name under waste_detection/')
+    parser.add_argument('--hyp', type=str, default=None,
+                        help='JSON file of hyperparameter overrides')
+    parser.add_argument('--image-cache', action='store_true',
+                        help='Decode and resize images once into a memory-mapped cache')
+    parser.add_argument('--taco-annotations', type=str, default=None,
+                        help='Convert TACO: annotations.json')
+    parser.add_argument('--taco-images', type=str, default=None,
+                        help='Convert TACO: image directory')
+    parser.add_argument('--trashnet', type=str, default=None,
+                        help='Convert TrashNet: root folder')
+    parser.add_argument('--stages', type=str, nargs='+', default=list(STAGES), choices=STAGES,
+                        help='Stages to run (in pipeline order)')
+    parser.add_argument('--force', type=str, nargs='+', default=[], choices=STAGES,
+                        help='Rerun these stages even if current')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8],
+                        help='Batch sizes for export selection and benchmark')
+    return parser
+
+
+def pipeline_from_args(args):
+    """TrainingPipeline from parsed build_parser() arguments"""
+    train_options = {}
+    if args.hyp:
+        with open(args.hyp) as f:
+            train_options['hyperparams'] = json.load(f)
+    if args.image_cache:
+        train_options['image_cache'] = True
+    if bool(args.taco_annotations) != bool(args.taco_images):
+        raise ValueError('--taco-annotations and --taco-images go together')
+
+    return TrainingPipeline(
+        data_yaml=args.data,
+        model_size=args.model,
+        epochs=args.epochs,
+        img_size=args.img_size,
+        batch_size=args.batch,
+        run_name=args.run_name,
+        train_options=train_options,
+        taco=(args.taco_annotations, args.taco_images) if args.taco_annotations else None,
+        trashnet=args.trashnet,
+        batch_sizes=args.batch_sizes,
+        force=args.force,
+    )
+
+
+if __name__ == '__main__':
+    args = build_parser().parse_args()
+
+    if not os.path.exists(args.data):
+        print(f"❌ Dataset configuration file not found: {args.data}")
+        sys.exit(1)
+
+    try:
+        pipeline_from_args(args).run(args.stages)
+    except (PipelineError, ValueError) as e:
+        print(f"\n❌ Pipeline stopped: {e}")
+        sys.exit(1)
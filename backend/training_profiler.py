@@ -0,0 +1,250 @@
+"""
+Per-epoch training throughput report
+
+Hooks into the ultralytics trainer callbacks and records for every epoch:
+- images/sec over the training pass
+- time spent waiting for the dataloader vs. in forward/backward/step
+- validation time
+- peak RSS of the trainer and its dataloader workers
+- per-stage augmentation cost, measured on a small sample of images
+
+Each epoch is appended as one JSON line to <run>/throughput.jsonl (next to
+weights/). At the end of training a summary is printed and written to
+<run>/throughput_summary.json. The summary flags the run as input-bound
+when dataloader wait is a large share of the training pass.
+
+Usage:
+    profiler = ThroughputProfiler()
+    for event, callback in profiler.callbacks().items():
+        model.add_callback(event, callback)
+"""
+
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+# Dataloader wait above this share of the training pass means input-bound
+INPUT_BOUND_FRACTION = 0.3
+
+
+def _vm_hwm_kb(pid):
+    """Peak resident set size (VmHWM) of a process in kB, or 0"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _child_pids():
+    pids = set()
+    for task in Path('/proc/self/task').glob('*'):
+        try:
+            pids.update(int(p) for p in (task / 'children').read_text().split())
+        except OSError:
+            pass
+    return pids
+
+
+def peak_rss_mb():
+    """
+    Peak RSS of this process and of its live child processes, in MB
+
+    Dataloader workers are separate processes, so they are reported apart
+    from the trainer itself.
+    """
+    main_kb = _vm_hwm_kb('self')
+    if not main_kb and sys.platform != 'win32':
+        # No /proc (macOS); resource is Unix-only, so Windows reports 0
+        import resource
+        main_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and kB elsewhere
+        if sys.platform == 'darwin':
+            main_kb //= 1024
+    workers_kb = sum(_vm_hwm_kb(pid) for pid in _child_pids())
+    return round(main_kb / 1024, 1), round(workers_kb / 1024, 1)
+
+
+def _flatten_transforms(transforms):
+    """Leaf transforms of a (nested) ultralytics Compose"""
+    leaves = []
+    for t in getattr(transforms, 'transforms', [transforms]):
+        if hasattr(t, 'transforms') and t is not transforms:
+            leaves.extend(_flatten_transforms(t))
+        else:
+            leaves.append(t)
+    return leaves
+
+
+def profile_augmentations(dataset, samples=16, seed=0):
+    """
+    Average per-stage cost of a dataset's loading and augmentation, in ms
+
+    Runs `samples` images through the dataset's own transforms one stage at
+    a time in this process. Mosaic/MixUp draw extra images, so their cost
+    includes loading those.
+    """
+    if dataset is None or not len(dataset):
+        return {}
+
+    rng = random.Random(seed)
+    stages = _flatten_transforms(dataset.transforms) if dataset.transforms else []
+    totals = {}
+
+    def add(name, seconds):
+        totals[name] = totals.get(name, 0.0) + seconds
+
+    for _ in range(samples):
+        i = rng.randrange(len(dataset))
+        start = time.perf_counter()
+        label = dataset.get_image_and_label(i)
+        add('load', time.perf_counter() - start)
+        for t in stages:
+            start = time.perf_counter()
+            label = t(label)
+            add(type(t).__name__, time.perf_counter() - start)
+
+    return {name: round(total * 1000 / samples, 2) for name, total in totals.items()}
+
+
+class ThroughputProfiler:
+    """Collects per-epoch timing from trainer callbacks"""
+
+    def __init__(self, augmentation_samples=16, output_name='throughput.jsonl'):
+        """
+        Args:
+            augmentation_samples: Images sampled per epoch for the
+                per-stage augmentation breakdown (0 disables it)
+            output_name: JSON lines file name inside the run directory
+        """
+        self.augmentation_samples = augmentation_samples
+        self.output_name = output_name
+        self.epochs = []
+        self._reset()
+
+    def _reset(self):
+        self.epoch_start = None
+        self.last_mark = None
+        self.data_wait = 0.0
+        self.compute = 0.0
+        self.batches = 0
+        self.train_end = None
+        self.record = None
+
+    def callbacks(self):
+        """{event: function} to register with model.add_callback"""
+        return {
+            'on_train_epoch_start': self.on_train_epoch_start,
+            'on_train_batch_start': self.on_train_batch_start,
+            'on_train_batch_end': self.on_train_batch_end,
+            'on_train_epoch_end': self.on_train_epoch_end,
+            'on_fit_epoch_end': self.on_fit_epoch_end,
+            'on_train_end': self.on_train_end,
+        }
+
+    def on_train_epoch_start(self, trainer):
+        self._reset()
+        self.epoch_start = self.last_mark = time.perf_counter()
+
+    def on_train_batch_start(self, trainer):
+        now = time.perf_counter()
+        # Time since the previous step finished was spent fetching this batch
+        self.data_wait += now - self.last_mark
+        self.last_mark = now
+
+    def on_train_batch_end(self, trainer):
+        now = time.perf_counter()
+        self.compute += now - self.last_mark
+        self.last_mark = now
+        self.batches += 1
+
+    def on_train_epoch_end(self, trainer):
+        self.train_end = time.perf_counter()
+        train_seconds = self.train_end - self.epoch_start
+        dataset = getattr(trainer.train_loader, 'dataset', None)
+        images = self.batches * trainer.batch_size
+        if dataset is not None:
+            images = min(images, len(dataset))
+
+        main_mb, workers_mb = peak_rss_mb()
+        self.record = {
+            'epoch': trainer.epoch + 1,
+            'images': images,
+            'train_seconds': round(train_seconds, 2),
+            'images_per_second': round(images / train_seconds, 2) if train_seconds else 0.0,
+            'data_wait_seconds': round(self.data_wait, 2),
+            'compute_seconds': round(self.compute, 2),
+            'data_wait_fraction': round(self.data_wait / train_seconds, 3) if train_seconds else 0.0,
+            'peak_rss_mb': main_mb,
+            'peak_worker_rss_mb': workers_mb,
+        }
+        if self.augmentation_samples:
+            self.record['augmentation_ms'] = profile_augmentations(dataset, self.augmentation_samples)
+
+    def on_fit_epoch_end(self, trainer):
+        if self.record is None:
+            return
+        self.record['val_seconds'] = round(time.perf_counter() - self.train_end, 2)
+        self.epochs.append(self.record)
+        with open(Path(trainer.save_dir) / self.output_name, 'a') as f:
+            f.write(json.dumps(self.record) + '\n')
+        self.record = None
+
+    def summary(self):
+        """Averages over all profiled epochs plus a bottleneck verdict"""
+        if not self.epochs:
+            return {}
+
+        n = len(self.epochs)
+        wait = sum(e['data_wait_seconds'] for e in self.epochs)
+        train = sum(e['train_seconds'] for e in self.epochs)
+        augment = {}
+        for e in self.epochs:
+            for stage, ms in e.get('augmentation_ms', {}).items():
+                augment[stage] = augment.get(stage, 0.0) + ms / n
+        wait_fraction = wait / train if train else 0.0
+        return {
+            'epochs': n,
+            'images_per_second': round(sum(e['images_per_second'] for e in self.epochs) / n, 2),
+            'data_wait_fraction': round(wait_fraction, 3),
+            'mean_val_seconds': round(sum(e['val_seconds'] for e in self.epochs) / n, 2),
+            'peak_rss_mb': max(e['peak_rss_mb'] for e in self.epochs),
+            'peak_worker_rss_mb': max(e['peak_worker_rss_mb'] for e in self.epochs),
+            'augmentation_ms': {k: round(v, 2) for k, v in sorted(augment.items(), key=lambda kv: -kv[1])},
+            'bottleneck': 'input' if wait_fraction > INPUT_BOUND_FRACTION else 'compute',
+        }
+
+    def on_train_end(self, trainer):
+        summary = self.summary()
+        if not summary:
+            return
+        with open(Path(trainer.save_dir) / 'throughput_summary.json', 'w') as f:
+            json.dump(summary, f, indent=2)
+        print_throughput_summary(summary)
+
+
+def print_throughput_summary(summary):
+    """Print a throughput summary"""
+    print("\n" + "="*60)
+    print("⏱️  Training Throughput")
+    print("="*60)
+    print(f"Images/sec: {summary['images_per_second']}")
+    print(f"Dataloader wait: {summary['data_wait_fraction'] * 100:.0f}% of the training pass")
+    print(f"Validation: {summary['mean_val_seconds']}s per epoch")
+    print(f"Peak RSS: {summary['peak_rss_mb']} MB trainer, {summary['peak_worker_rss_mb']} MB workers")
+    if summary['augmentation_ms']:
+        print("Per-image loading/augmentation cost (ms):")
+        for stage, ms in summary['augmentation_ms'].items():
+            print(f"  {stage}: {ms}")
+
+    if summary['bottleneck'] == 'input':
+        print("\n⚠️  Training is input-bound: the model waits on the dataloader.")
+        print("💡 Try --image-cache, more dataloader workers, or lighter augmentation")
+    else:
+        print("\n✅ Training is compute-bound")
+    print("="*60)
@@ -0,0 +1,249 @@
+"""
+Unix domain socket transport for the waste detection service
+
+A lighter alternative to multipart HTTP for co-located deployments.
+Every message (request or response) is one frame:
+
+    [4 bytes header length][4 bytes body length][header JSON][body bytes]
+
+Both lengths are unsigned big-endian integers. Requests carry
+{"endpoint": "detect" | "detect-multiple", "id": ...} in the header and the
+raw image bytes in the body. Responses carry {"id": ..., "status": <int>,
+"payload": {...}} in the header and an empty body. Connections are
+keep-alive: a client sends any number of frames on one connection and
+receives responses in the same order. Each connection is served by its own
+thread, so clients wanting concurrency open several connections.
+
+Bodies larger than the server's max_body_bytes (the service passes
+YOLO_MAX_UPLOAD_BYTES) are answered with status 413 and "close": true in the
+header, and the connection is closed.
+
+Usage:
+    # Benchmark a running service (YOLO_UDS_PATH=/tmp/yolo.sock python yolov8_service.py)
+    python uds_transport.py /tmp/yolo.sock path/to/image.jpg --requests 200
+"""
+
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+
+FRAME_HEADER = struct.Struct('!II')
+
+# Reject frames that could only come from a confused or hostile peer
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 20 * 1024 * 1024
+
+
+class FrameTooLarge(ValueError):
+    """Frame body over the limit; `header` is the request header (read before the body)"""
+
+    def __init__(self, message, header=None):
+        super().__init__(message)
+        self.header = header or {}
+
+
+def _recv_exact(sock_file, size):
+    """Read exactly `size` bytes, or return None on a clean EOF before any byte"""
+    data = sock_file.read(size)
+    if not data:
+        return None
+    if len(data) < size:
+        raise ConnectionError('Connection closed mid-frame')
+    return data
+
+
+def read_frame(sock_file, max_body_bytes=MAX_BODY_BYTES):
+    """
+    Read one frame from a buffered socket file
+
+    Args:
+        sock_file: Buffered socket file
+        max_body_bytes: Raise FrameTooLarge for larger bodies (not read)
+
+    Returns:
+        (header dict, body bytes), or None when the peer closed the connection
+    """
+    prefix = _recv_exact(sock_file, FRAME_HEADER.size)
+    if prefix is None:
+        return None
+
+    header_len, body_len = FRAME_HEADER.unpack(prefix)
+    if header_len > MAX_HEADER_BYTES:
+        raise ValueError(f'Frame header too large ({header_len} bytes)')
+
+    header_bytes = _recv_exact(sock_file, header_len) if header_len else b'{}'
+    if header_bytes is None:
+        raise ConnectionError('Connection closed mid-frame')
+    header = json.loads(header_bytes)
+    if body_len > max_body_bytes:
+        raise FrameTooLarge(f'Image exceeds upload limit of {max_body_bytes} bytes', header)
+
+    body = _recv_exact(sock_file, body_len) if body_len else b''
+    if body is None:
+        raise ConnectionError('Connection closed mid-frame')
+    return header, body
+
+
+def write_frame(sock_file, header, body=b''):
+    """Write one frame to a buffered socket file and flush it"""
+    header_bytes = json.dumps(header).encode('utf-8')
+    sock_file.write(FRAME_HEADER.pack(len(header_bytes), len(body)))
+    sock_file.write(header_bytes)
+    if body:
+        sock_file.write(body)
+    sock_file.flush()
+
+
+class _DetectionRequestHandler(socketserver.StreamRequestHandler):
+    """Serve frames on one keep-alive connection until the client disconnects"""
+
+    def handle(self):
+        handlers = self.server.endpoint_handlers
+        while True:
+            try:
+                frame = read_frame(self.rfile, self.server.max_body_bytes)
+            except FrameTooLarge as e:
+                # The unread body leaves the stream out of sync: answer, then close
+                write_frame(self.wfile, {
+                    'id': e.header.get('id'),
+                    'status': 413,
+                    'payload': {'success': False, 'message': str(e)},
+                    'close': True,
+                })
+                return
+            except (ValueError, ConnectionError) as e:
+                print(f"⚠️  Closing Unix socket connection: {e}")
+                return
+            if frame is None:
+                return
+
+            header, body = frame
+            endpoint = header.get('endpoint')
+            handler = handlers.get(endpoint)
+
+            if handler is None:
+                payload, status = {
+                    'success': False,
+                    'message': f'Unknown endpoint: {endpoint}'
+                }, 404
+            elif not body:
+                payload, status = {
+                    'success': False,
+                    'message': 'No image provided'
+                }, 400
+            else:
+                payload, status = handler(body)
+
+            write_frame(self.wfile, {
+                'id': header.get('id'),
+                'status': status,
+                'payload': payload,
+            })
+
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve_unix_socket(path, endpoint_handlers, max_body_bytes=MAX_BODY_BYTES):
+    """
+    Start serving detection requests on a Unix domain socket in the background
+
+    Args:
+        path: Filesystem path of the socket (an existing stale socket is replaced)
+        endpoint_handlers: Mapping of endpoint name to a callable that takes
+            image bytes and returns a (payload, status) tuple
+        max_body_bytes: Largest image accepted (larger ones get status 413)
+
+    Returns:
+        The running server (call shutdown() to stop it)
+    """
+    if os.path.exists(path):
+        os.unlink(path)
+
+    server = _ThreadingUnixServer(path, _DetectionRequestHandler)
+    server.endpoint_handlers = endpoint_handlers
+    server.max_body_bytes = max_body_bytes
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+class UnixSocketClient:
+    """Minimal keep-alive client, used for benchmarking and tests"""
+
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.rfile = self.sock.makefile('rb')
+        self.wfile = self.sock.makefile('wb')
+        self.next_id = 0
+
+    def request(self, endpoint, image_bytes):
+        """Send one image and return (payload, status)"""
+        self.next_id += 1
+        write_frame(self.wfile, {'endpoint': endpoint, 'id': self.next_id}, image_bytes)
+        frame = read_frame(self.rfile)
+        if frame is None:
+            raise ConnectionError('Service closed the connection')
+        header, _ = frame
+        return header['payload'], header['status']
+
+    def close(self):
+        self.rfile.close()
+        self.wfile.close()
+        self.sock.close()
+
+
+def benchmark(path, image_path, endpoint='detect', requests=100):
+    """
+    Send the same image repeatedly over one connection and report latency
+
+    Args:
+        path: Socket path of a running service
+        image_path: Image to send
+        endpoint: 'detect' or 'detect-multiple'
+        requests: Number of requests to send
+    """
+    import time
+
+    with open(image_path, 'rb') as f:
+        image_bytes = f.read()
+
+    client = UnixSocketClient(path)
+    latencies = []
+    try:
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.request(endpoint, image_bytes)
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        client.close()
+
+    latencies.sort()
+    total_s = sum(latencies) / 1000
+    print(f"\n📊 {requests} requests to '{endpoint}' over {path}")
+    print(f"   Throughput: {requests / total_s:.1f} req/s")
+    print(f"   p50: {latencies[len(latencies) // 2]:.2f} ms")
+    print(f"   p95: {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms")
+    print(f"   max: {latencies[-1]:.2f} ms")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the detection service over a Unix socket')
+    parser.add_argument('socket', type=str, help='Path of the service socket')
+    parser.add_argument('image', type=str, help='Image to send')
+    parser.add_argument('--endpoint', type=str, default='detect',
+                        choices=['detect', 'detect-multiple'],
+                        help='Endpoint to call')
+    parser.add_argument('--requests', type=int, default=100,
+                        help='Number of requests to send')
+
+    args = parser.parse_args()
+    benchmark(args.socket, args.image, args.endpoint, args.requests)
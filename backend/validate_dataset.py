@@ -0,0 +1,285 @@
+"""
+Validate a YOLO waste dataset and build a label index
+
+Checks every split listed in the dataset YAML (train/val/test) before
+training starts:
+- images are readable (header only, nothing is decoded)
+- every label line has a known class and normalized coordinates in 0-1
+- no label file is missing its image
+
+Work is spread over a process pool. Results are kept in a compact index
+(<data>.index.json): per-image size, per-class instance counts and a
+box-size histogram. On re-runs only files whose mtime or size changed are
+checked again.
+
+Usage:
+    python validate_dataset.py
+    python validate_dataset.py --data dataset/data.yaml --workers 8
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+from dataset_utils import file_stamp, iter_images, label_path_for, load_dataset_config
+
+INDEX_VERSION = 1
+
+# Box-size histogram bins: sqrt(box area) in pixels of the original image
+BOX_SIZE_BINS = [8, 16, 32, 64, 128, 256, 512]
+BOX_SIZE_LABELS = ['<8', '8-16', '16-32', '32-64', '64-128', '128-256', '256-512', '>=512']
+
+# Allowed overshoot for boxes slightly past the image border after rounding
+EDGE_TOLERANCE = 0.01
+
+
+def _size_bin(side):
+    for i, limit in enumerate(BOX_SIZE_BINS):
+        if side < limit:
+            return i
+    return len(BOX_SIZE_BINS)
+
+
+def check_image(args):
+    """
+    Validate one image and its label file (runs in a worker process)
+
+    Args:
+        args: (image_path, label_path, num_classes)
+
+    Returns:
+        Index entry dict
+    """
+    image_path, label_path, num_classes = args
+    entry = {
+        'stamp': file_stamp(image_path),
+        'label_stamp': file_stamp(label_path),
+        'width': None,
+        'height': None,
+        'classes': {},
+        'size_bins': [0] * len(BOX_SIZE_LABELS),
+        'errors': [],
+    }
+
+    try:
+        with Image.open(image_path) as image:
+            entry['width'], entry['height'] = image.size
+    except Exception as e:
+        entry['errors'].append(f'unreadable image: {e}')
+
+    if entry['label_stamp'] is None:
+        return entry
+
+    try:
+        with open(label_path) as f:
+            lines = f.readlines()
+    except (OSError, UnicodeDecodeError) as e:
+        entry['errors'].append(f'unreadable label: {e}')
+        return entry
+
+    for line_no, line in enumerate(lines, 1):
+        parts = line.split()
+        if not parts:
+            continue
+
+        try:
+            class_id = int(parts[0])
+            coords = [float(v) for v in parts[1:]]
+        except ValueError:
+            entry['errors'].append(f'line {line_no}: not numeric')
+            continue
+
+        if num_classes is not None and not 0 <= class_id < num_classes:
+            entry['errors'].append(f'line {line_no}: class {class_id} out of range (0-{num_classes - 1})')
+            continue
+
+        if len(coords) == 4:
+            x, y, w, h = coords
+            if not all(0.0 <= v <= 1.0 for v in coords) or w <= 0 or h <= 0:
+                entry['errors'].append(f'line {line_no}: coordinates not normalized: {coords}')
+                continue
+            if (x - w / 2 < -EDGE_TOLERANCE or x + w / 2 > 1 + EDGE_TOLERANCE or
+                    y - h / 2 < -EDGE_TOLERANCE or y + h / 2 > 1 + EDGE_TOLERANCE):
+                entry['errors'].append(f'line {line_no}: box extends outside the image')
+                continue
+        elif len(coords) >= 6 and len(coords) % 2 == 0:
+            # Segmentation polygon: x1 y1 x2 y2 ...
+            if not all(0.0 <= v <= 1.0 for v in coords):
+                entry['errors'].append(f'line {line_no}: polygon not normalized')
+                continue
+            xs, ys = coords[0::2], coords[1::2]
+            w, h = max(xs) - min(xs), max(ys) - min(ys)
+        else:
+            entry['errors'].append(f'line {line_no}: expected 5 values, got {len(parts)}')
+            continue
+
+        key = str(class_id)
+        entry['classes'][key] = entry['classes'].get(key, 0) + 1
+        if entry['width']:
+            side = (w * entry['width'] * h * entry['height']) ** 0.5
+            entry['size_bins'][_size_bin(side)] += 1
+
+    return entry
+
+
+def _load_index(index_path):
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+        if index.get('version') == INDEX_VERSION:
+            return index
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return {'version': INDEX_VERSION, 'images': {}}
+
+
+def _write_index(index, index_path):
+    tmp_path = Path(f'{index_path}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+    os.replace(tmp_path, index_path)
+
+
+def validate_dataset(data_yaml='waste_data.yaml', index_path=None, workers=None):
+    """
+    Validate all splits of a dataset and update its label index
+
+    Args:
+        data_yaml: Dataset configuration file
+        index_path: Where to keep the index (default: <data_yaml>.index.json)
+        workers: Worker processes (default: CPU count)
+
+    Returns:
+        Summary dict; summary['errors'] lists every problem found
+    """
+    start = time.perf_counter()
+    splits, names = load_dataset_config(data_yaml)
+    index_path = Path(index_path or Path(data_yaml).with_suffix('.index.json'))
+    index = _load_index(index_path)
+    # Class range checks depend on the class list, so a changed list re-checks everything
+    old_images = index['images'] if index.get('names') == names else {}
+
+    new_images = {}
+    todo = []
+    errors = []
+
+    for split, images_dir in splits.items():
+        if not Path(images_dir).is_dir():
+            errors.append(f'{split}: images directory not found: {images_dir}')
+            continue
+
+        image_stems = set()
+        for image_path in iter_images(images_dir):
+            image_stems.add(image_path.stem)
+            label_path = label_path_for(image_path)
+            key = str(image_path)
+            cached = old_images.get(key)
+            if (cached and cached['stamp'] == file_stamp(image_path)
+                    and cached['label_stamp'] == file_stamp(label_path)):
+                new_images[key] = dict(cached, split=split)
+            else:
+                todo.append((split, key, str(label_path)))
+
+        labels_dir = Path(images_dir).parent / 'labels'
+        if labels_dir.is_dir():
+            for label_path in sorted(labels_dir.glob('*.txt')):
+                if label_path.stem not in image_stems:
+                    errors.append(f'{label_path}: label has no matching image')
+
+    if todo:
+        print(f"🔍 Checking {len(todo)} changed image(s) "
+              f"({len(new_images)} unchanged, skipped)...")
+        jobs = [(key, label, len(names)) for _, key, label in todo]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for (split, key, _), entry in zip(todo, pool.map(check_image, jobs, chunksize=64)):
+                new_images[key] = dict(entry, split=split)
+
+    index['images'] = new_images
+    index['names'] = names
+    _write_index(index, index_path)
+
+    # Summarize from the full index, not just the re-checked files
+    instances = [0] * len(names)
+    size_hist = [0] * len(BOX_SIZE_LABELS)
+    per_split = {}
+    unlabeled = 0
+    for key, entry in sorted(new_images.items()):
+        per_split[entry['split']] = per_split.get(entry['split'], 0) + 1
+        if entry['label_stamp'] is None:
+            unlabeled += 1
+        for class_id, count in entry['classes'].items():
+            class_id = int(class_id)
+            if class_id < len(instances):
+                instances[class_id] += count
+        for i, count in enumerate(entry['size_bins']):
+            size_hist[i] += count
+        errors.extend(f'{key}: {message}' for message in entry['errors'])
+
+    return {
+        'images': per_split,
+        'unlabeled_images': unlabeled,
+        'rechecked': len(todo),
+        'instances': dict(zip(names, instances)),
+        'box_size_histogram': dict(zip(BOX_SIZE_LABELS, size_hist)),
+        'errors': errors,
+        'index': str(index_path),
+        'elapsed_seconds': round(time.perf_counter() - start, 2),
+    }
+
+
+def print_summary(summary, max_errors=20):
+    """Print a validation summary"""
+    print("\n" + "="*60)
+    print("📋 Dataset Validation")
+    print("="*60)
+    for split, count in summary['images'].items():
+        print(f"{split}: {count} images")
+    print(f"Unlabeled (background) images: {summary['unlabeled_images']}")
+    print(f"Re-checked: {summary['rechecked']} in {summary['elapsed_seconds']}s")
+
+    print("\nInstances per class:")
+    for name, count in summary['instances'].items():
+        flag = '  ⚠️  no instances' if count == 0 else ''
+        print(f"  {name}: {count}{flag}")
+
+    print("\nBox sizes (px):")
+    for label, count in summary['box_size_histogram'].items():
+        print(f"  {label}: {count}")
+
+    errors = summary['errors']
+    if errors:
+        print(f"\n❌ {len(errors)} problem(s) found:")
+        for message in errors[:max_errors]:
+            print(f"  - {message}")
+        if len(errors) > max_errors:
+            print(f"  ... and {len(errors) - max_errors} more (see {summary['index']})")
+    else:
+        print("\n✅ No problems found")
+    print("="*60)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Validate a YOLO waste dataset')
+    parser.add_argument('--data', type=str, default='waste_data.yaml',
+                        help='Path to dataset YAML file')
+    parser.add_argument('--index', type=str, default=None,
+                        help='Index file (default: <data>.index.json)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes (default: CPU count)')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        print(f"❌ Dataset configuration file not found: {args.data}")
+        sys.exit(1)
+
+    summary = validate_dataset(args.data, args.index, args.workers)
+    print_summary(summary)
+    sys.exit(1 if summary['errors'] else 0)
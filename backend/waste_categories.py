@@ -0,0 +1,220 @@
+"""
+Waste category mapping shared by the detection service and offline tools
+
+Maps model class names to a waste category and a disposal recommendation.
+"""
+
+# Waste type mapping (customize based on your trained model)
+# This maps detected classes to waste categories and disposal recommendations
+WASTE_CATEGORIES = {
+    # Plastics
+    'plastic': {
+        'category': 'Recyclable',
+        'recommendation': 'Place in recyclable bin. Rinse before disposal.'
+    },
+    'plastic-bottle': {
+        'category': 'Recyclable',
+        'recommendation': 'Remove cap, rinse, and place in plastic recycling bin.'
+    },
+    'plastic-bag': {
+        'category': 'Recyclable',
+        'recommendation': 'Clean and dry. Take to plastic bag recycling drop-off.'
+    },
+    'bottle': {
+        'category': 'Recyclable',
+        'recommendation': 'Rinse and recycle. Check if cap is recyclable separately.'
+    },
+    
+    # Paper products
+    'paper': {
+        'category': 'Recyclable',
+        'recommendation': 'Place in paper recycling bin. Keep dry.'
+    },
+    'cardboard': {
+        'category': 'Recyclable',
+        'recommendation': 'Flatten and place in cardboard recycling. Remove tape/staples.'
+    },
+    
+    # Metals
+    'metal': {
+        'category': 'Recyclable',
+        'recommendation': 'Rinse and place in metal recycling bin.'
+    },
+    'metal-can': {
+        'category': 'Recyclable',
+        'recommendation': 'Rinse thoroughly and recycle with metals.'
+    },
+    'can': {
+        'category': 'Recyclable',
+        'recommendation': 'Rinse and recycle. Aluminum cans are highly recyclable.'
+    },
+    
+    # Glass
+    'glass': {
+        'category': 'Recyclable',
+        'recommendation': 'Place in glass recycling bin. Remove caps.'
+    },
+    'glass-bottle': {
+        'category': 'Recyclable',
+        'recommendation': 'Rinse, remove cap, and place in glass recycling.'
+    },
+    
+    # Organic
+    'organic': {
+        'category': 'Biodegradable',
+        'recommendation': 'Dispose in compost bin or biodegradable waste container.'
+    },
+    'food-container': {
+        'category': 'Check Material',
+        'recommendation': 'Check if plastic, paper, or foam. Rinse before recycling if applicable.'
+    },
+    
+    # Electronics
+    'electronic': {
+        'category': 'Hazardous',
+        'recommendation': 'Take to e-waste collection center. Do not dispose in regular bins.'
+    },
+    'electronic-waste': {
+        'category': 'Hazardous',
+        'recommendation': 'Take to certified e-waste recycling facility. Contains hazardous materials.'
+    },
+    'cellphone': {
+        'category': 'Hazardous',
+        'recommendation': 'Take to electronics recycling. Remove personal data first. Contains valuable materials.'
+    },
+    'cell phone': {
+        'category': 'Hazardous',
+        'recommendation': 'Take to electronics recycling. Remove personal data first. Contains valuable materials.'
+    },
+    'phone': {
+        'category': 'Hazardous',
+        'recommendation': 'Recycle at electronics collection point. Wipe data before disposal.'
+    },
+    
+    # Batteries
+    'battery': {
+        'category': 'Hazardous',
+        'recommendation': 'Take to battery recycling center. Never throw in regular trash.'
+    },
+    
+    # Styrofoam
+    'styrofoam': {
+        'category': 'Special Handling',
+        'recommendation': 'Check local recycling options. Many areas require special drop-off.'
+    },
+    
+    # General/Unknown
+    'general': {
+        'category': 'Non-recyclable',
+        'recommendation': 'Dispose in general waste bin.'
+    },
+    'general-waste': {
+        'category': 'Non-recyclable',
+        'recommendation': 'Dispose in general waste bin.'
+    },
+    'trash': {
+        'category': 'Non-recyclable',
+        'recommendation': 'Dispose in general waste bin.'
+    }
+}
+
+def _words(name):
+    """Lowercase words of a class name; '-', '_' and spaces all separate words"""
+    return name.lower().replace('-', ' ').replace('_', ' ').split()
+
+
+# Lookup tables built once from WASTE_CATEGORIES
+_KEYS_BY_COMPACT = {''.join(_words(key)): key for key in sorted(WASTE_CATEGORIES)}
+# Multi-word keys first, then longer, then alphabetical: the most specific key wins
+_KEYS_BY_SPECIFICITY = sorted(WASTE_CATEGORIES, key=lambda k: (-len(_words(k)), -len(k), k))
+
+
+def resolve_waste_key(class_name):
+    """
+    Match a class name to a WASTE_CATEGORIES key
+
+    Rules are tried in order; the first that matches wins, so the result
+    never depends on dictionary order:
+    1. exact: case-insensitive
+    2. compact: same words, ignoring separators and a plural 's'
+       ('Plastic_Bottles', 'cellphone' -> 'cell phone')
+    3. words: every word of a key appears in the class name, most specific key
+       first ('plastic bottle cap' -> 'plastic-bottle', 'wine glass' -> 'glass')
+
+    Whole words only: 'car' does not match 'cardboard'.
+
+    Returns:
+        (key, rule name), or (None, None) when nothing matches
+    """
+    lower = class_name.strip().lower()
+    if lower in WASTE_CATEGORIES:
+        return lower, 'exact'
+
+    words = _words(lower)
+    compact = ''.join(words)
+    for candidate in (compact, compact[:-1] if compact.endswith('s') else None):
+        if candidate and candidate in _KEYS_BY_COMPACT:
+            return _KEYS_BY_COMPACT[candidate], 'compact'
+
+    word_set = set(words) | {w[:-1] for w in words if w.endswith('s') and len(w) > 3}
+    for key in _KEYS_BY_SPECIFICITY:
+        if set(_words(key)) <= word_set:
+            return key, 'words'
+
+    return None, None
+
+
+def get_waste_info(class_name):
+    """Get waste category info with fallback for unknown classes"""
+    key, _ = resolve_waste_key(class_name)
+    if key is not None:
+        return WASTE_CATEGORIES[key]
+    
+    # Default fallback
+    return {
+        'category': 'Unknown',
+        'recommendation': f'Detected as {class_name}. Please verify waste type and dispose accordingly.'
+    }
+
+
+def build_class_table(names):
+    """
+    Resolve every class of a model once
+
+    Args:
+        names: The model's {class_id: name} mapping
+
+    Returns:
+        List indexed by class ID of dicts with name, category,
+        recommendation, matched (WASTE_CATEGORIES key or None) and rule
+    """
+    table = [None] * (max(names) + 1 if names else 0)
+    for class_id, name in names.items():
+        key, rule = resolve_waste_key(name)
+        info = WASTE_CATEGORIES[key] if key is not None else get_waste_info(name)
+        table[class_id] = {
+            'name': name,
+            'category': info['category'],
+            'recommendation': info['recommendation'],
+            'matched': key,
+            'rule': rule,
+        }
+    return table
+
+
+def waste_class_ids(names, extra=()):
+    """
+    Class IDs of a model that map to a waste category
+
+    Args:
+        names: The model's {class_id: name} mapping
+        extra: Additional class names to keep (case-insensitive)
+
+    Returns:
+        Sorted list of class IDs
+    """
+    extra = {name.strip().lower() for name in extra}
+    return sorted(
+        class_id for class_id, name in names.items()
+        if name.lower() in extra or resolve_waste_key(name)[0] is not None
+    )
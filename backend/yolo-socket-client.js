@@ -0,0 +1,153 @@
+/**
+ * Pooled Unix domain socket client for the YOLOv8 detection service
+ *
+ * Speaks the length-prefixed framing from uds_transport.py:
+ *   [u32 header length][u32 body length][header JSON][body bytes]
+ * Each connection carries one request at a time and is reused once its
+ * response has arrived. Concurrent requests get their own connections (up
+ * to maxConnections, then they wait for one to free up), so the service
+ * handles them in parallel like HTTP requests. A timeout or error closes
+ * only the connection of the request it belongs to.
+ *
+ * Enable in .env:
+ *   YOLO_SERVICE_SOCKET=/tmp/yolo.sock
+ */
+
+const net = require('net');
+
+class YoloSocketConnection {
+  constructor(socketPath, onIdle, onClose) {
+    this.socket = net.createConnection(socketPath);
+    this.buffer = Buffer.alloc(0);
+    this.current = null;
+    this.closed = false;
+    this.onIdle = onIdle;
+    this.onClose = onClose;
+
+    this.socket.on('data', (chunk) => this.onData(chunk));
+    this.socket.on('error', (error) => this.close(error));
+    this.socket.on('close', () => this.close());
+  }
+
+  send(request) {
+    this.current = request;
+    this.socket.cork();
+    request.frame.forEach((part) => this.socket.write(part));
+    this.socket.uncork();
+  }
+
+  onData(chunk) {
+    this.buffer = Buffer.concat([this.buffer, chunk]);
+    if (this.buffer.length < 8) return;
+
+    const headerLength = this.buffer.readUInt32BE(0);
+    const bodyLength = this.buffer.readUInt32BE(4);
+    const frameLength = 8 + headerLength + bodyLength;
+    if (this.buffer.length < frameLength) return;
+
+    const header = JSON.parse(this.buffer.subarray(8, 8 + headerLength).toString('utf8'));
+    this.buffer = this.buffer.subarray(frameLength);
+
+    const request = this.current;
+    this.current = null;
+    if (request) request.resolve({ status: header.status, data: header.payload });
+    if (header.close) {
+      // The service is closing this connection (e.g. after an oversized image)
+      this.close();
+    } else if (!this.closed) {
+      this.onIdle(this);
+    }
+  }
+
+  close(error) {
+    // 'error' is followed by 'close'; only the first one counts
+    if (this.closed) return;
+    this.closed = true;
+    this.socket.destroy();
+
+    const request = this.current;
+    this.current = null;
+    if (request) request.reject(error || new Error('YOLO socket closed'));
+    this.onClose(this);
+  }
+}
+
+class YoloSocketClient {
+  constructor(socketPath, { maxConnections = 8 } = {}) {
+    this.socketPath = socketPath;
+    this.maxConnections = maxConnections;
+    this.connections = new Set();
+    this.idle = [];
+    this.waiting = [];
+    this.nextId = 0;
+  }
+
+  dispatch() {
+    while (this.waiting.length > 0) {
+      let connection = this.idle.pop();
+      if (!connection) {
+        if (this.connections.size >= this.maxConnections) return;
+        connection = new YoloSocketConnection(
+          this.socketPath,
+          (idle) => {
+            this.idle.push(idle);
+            this.dispatch();
+          },
+          (closed) => {
+            this.connections.delete(closed);
+            this.idle = this.idle.filter((c) => c !== closed);
+            this.dispatch();
+          }
+        );
+        this.connections.add(connection);
+      }
+
+      const request = this.waiting.shift();
+      request.connection = connection;
+      connection.send(request);
+    }
+  }
+
+  /**
+   * Send an image to a service endpoint ('detect' or 'detect-multiple')
+   * Resolves with { status, data } like an axios response.
+   */
+  request(endpoint, imageBuffer, timeout = 10000) {
+    const headerBytes = Buffer.from(JSON.stringify({ endpoint, id: ++this.nextId }), 'utf8');
+    const prefix = Buffer.alloc(8);
+    prefix.writeUInt32BE(headerBytes.length, 0);
+    prefix.writeUInt32BE(imageBuffer.length, 4);
+
+    return new Promise((resolve, reject) => {
+      const request = {
+        frame: [prefix, headerBytes, imageBuffer],
+        connection: null,
+        resolve: (response) => {
+          clearTimeout(timer);
+          resolve(response);
+        },
+        reject: (error) => {
+          clearTimeout(timer);
+          reject(error);
+        },
+      };
+
+      const timer = setTimeout(() => {
+        const error = new Error(`YOLO socket timeout after ${timeout}ms`);
+        const index = this.waiting.indexOf(request);
+        if (index !== -1) {
+          this.waiting.splice(index, 1);
+          request.reject(error);
+        } else if (request.connection) {
+          // A late response would leave this connection out of sync: drop it
+          request.connection.close(error);
+        }
+      }, timeout);
+
+      this.waiting.push(request);
+      this.dispatch();
+    });
+  }
+}
+
+module.exports = YoloSocketClient;
@@ -8,161 +8,407 @@ Requirements:
 Usage:
 - python yolov8_service.py
 - Service will run on http://localhost:5001
+
+Configuration (environment variables):
+- YOLO_MODEL: model weights to serve (default: yolov8n.pt)
+- YOLO_MODEL_MANIFEST: serve the artifact (and image size) selected by
+  export_models.py instead of YOLO_MODEL
+- YOLO_CASCADE=1: enable the confidence-gated model cascade
+- YOLO_CASCADE_MODELS: comma-separated weights, smallest first
+  (default: yolov8n.pt,yolov8s.pt)
+- YOLO_CASCADE_CONF: escalate when the top confidence is below this (default: 0.5)
+- YOLO_CASCADE_MARGIN: escalate when a different class scores within this
+  margin of the top detection (default: 0.1)
+- YOLO_CLASSIFIER: YOLOv8-cls weights that answer /detect with a single
+  classification pass (train with: python train_waste_model.py --classifier)
+- YOLO_CLASSIFIER_CONF: fall back to the detector below this top-1
+  confidence (default: 0.6)
+- YOLO_MEDIA_ROOT: directory /process-video may read from (default: .)
+- YOLO_DETECTION_LOG_DIR: append every result to Parquet files in this
+  directory (see detection_log.py; requires pyarrow)
+- YOLO_DETECTION_LOG_QUEUE: records buffered before new ones are dropped
+  (default: 10000)
+- YOLO_MAX_UPLOAD_BYTES: reject uploads larger than this (default: 10 MB)
+- YOLO_MAX_IMAGE_PIXELS: reject images whose header declares more pixels
+  than this, before decoding (default: 40000000)
+- YOLO_INGEST_MAX_SIDE: images are downscaled to this longest side before
+  inference (default: 640)
+- YOLO_LEAN=1: load every model inference-only (fused, no autograd) with
+  weights memory-mapped from a file shared by all workers (see lean_model.py)
+- YOLO_LEAN_DTYPE: fp32, bf16 or fp16 weights in lean mode (default: fp32)
+- YOLO_UDS_PATH: also serve detect/detect-multiple on this Unix domain socket
+  (see uds_transport.py for the framing)
+- YOLO_CLASS_FILTER=0: keep every class of the model; by default classes
+  that map to no waste category (person, car, ... in COCO models) are
+  dropped inside the detection head, before NMS
+- YOLO_EXTRA_CLASSES: comma-separated class names to keep anyway
+- YOLO_JOB_DIR: enable the asynchronous job API (/jobs) with its SQLite
+  queue and uploaded inputs in this directory (see job_queue.py)
+- YOLO_JOB_WORKERS: job worker threads per process (default: 1)
+- YOLO_JOB_RESULT_TTL: seconds finished jobs are kept (default: 86400)
+- YOLO_JOB_MAX_UPLOAD_BYTES: request size limit for /jobs uploads
+  (default: 1 GB; each image is still capped by YOLO_MAX_UPLOAD_BYTES)
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Request, request, jsonify
 from flask_cors import CORS
 from ultralytics import YOLO
 from PIL import Image
-import io
+from pathlib import Path
+import os
+import threading
+import time
 import numpy as np
+from uds_transport import serve_unix_socket
+from waste_categories import build_class_table, waste_class_ids
+from process_video import IMAGE_EXTENSIONS, process_video
+from detection_log import DetectionLogger, hash_image
+from image_ingest import IngestError, prepare_image, read_upload
+from lean_model import load_lean_model, memory_report
+from export_models import read_export_manifest
+from job_queue import InteractiveGate, JobQueue
+import hashlib
+import shutil
 
 app = Flask(__name__)
 CORS(app)
 
+MODEL_PATH = os.environ.get('YOLO_MODEL', 'yolov8n.pt')
+MODEL_MANIFEST = os.environ.get('YOLO_MODEL_MANIFEST')
+CASCADE_ENABLED = os.environ.get('YOLO_CASCADE', '0') == '1'
+CASCADE_MODEL_PATHS = [
+    path.strip()
+    for path in os.environ.get('YOLO_CASCADE_MODELS', 'yolov8n.pt,yolov8s.pt').split(',')
+    if path.strip()
+]
+CASCADE_CONF_THRESHOLD = float(os.environ.get('YOLO_CASCADE_CONF', '0.5'))
+CASCADE_CONFLICT_MARGIN = float(os.environ.get('YOLO_CASCADE_MARGIN', '0.1'))
+CLASSIFIER_PATH = os.environ.get('YOLO_CLASSIFIER')
+CLASSIFIER_CONF_THRESHOLD = float(os.environ.get('YOLO_CLASSIFIER_CONF', '0.6'))
+MEDIA_ROOT = Path(os.environ.get('YOLO_MEDIA_ROOT', '.')).resolve()
+DETECTION_LOG_DIR = os.environ.get('YOLO_DETECTION_LOG_DIR')
+DETECTION_LOG_QUEUE = int(os.environ.get('YOLO_DETECTION_LOG_QUEUE', '10000'))
+MAX_UPLOAD_BYTES = int(os.environ.get('YOLO_MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.environ.get('YOLO_MAX_IMAGE_PIXELS', '40000000'))
+INGEST_MAX_SIDE = int(os.environ.get('YOLO_INGEST_MAX_SIDE', '640'))
+LEAN_MODE = os.environ.get('YOLO_LEAN', '0') == '1'
+LEAN_DTYPE = os.environ.get('YOLO_LEAN_DTYPE', 'fp32')
+UDS_PATH = os.environ.get('YOLO_UDS_PATH')
+CLASS_FILTER_ENABLED = os.environ.get('YOLO_CLASS_FILTER', '1') == '1'
+EXTRA_CLASSES = [
+    name.strip()
+    for name in os.environ.get('YOLO_EXTRA_CLASSES', '').split(',')
+    if name.strip()
+]
+JOB_DIR = os.environ.get('YOLO_JOB_DIR')
+JOB_WORKERS = int(os.environ.get('YOLO_JOB_WORKERS', '1'))
+JOB_RESULT_TTL = int(os.environ.get('YOLO_JOB_RESULT_TTL', str(24 * 3600)))
+JOB_MAX_UPLOAD_BYTES = int(os.environ.get('YOLO_JOB_MAX_UPLOAD_BYTES', str(1024 * 1024 * 1024)))
+
+# Let werkzeug refuse oversized request bodies before they are parsed
+# (headroom for the multipart envelope), and make PIL's own
+# decompression-bomb check match the pixel budget
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 64 * 1024
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+class ServiceRequest(Request):
+    """Job submissions carry many images, so /jobs gets its own body limit"""
+
+    @property
+    def max_content_length(self):
+        if self.path == '/jobs' and JOB_DIR:
+            return JOB_MAX_UPLOAD_BYTES
+        return super().max_content_length
+
+app.request_class = ServiceRequest
+
 # Load YOLOv8 model (you can train your own or use a pre-trained one)
 # For waste detection, you'll need to train on a waste dataset
 # Example datasets: TACO, TrashNet, etc.
+# In cascade mode every stage is loaded up front; `model` is the first
+# (cheapest) stage so the rest of the service keeps a single default model.
+def describe_model_version(path):
+    """Name a weights file as <stem>-<content hash prefix> for the detection log"""
+    path = Path(path)
+    if not path.is_file():
+        return path.stem
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return f"{path.stem}-{digest.hexdigest()[:8]}"
+
+def stage_names(paths):
+    """
+    Unique cascade stage names: the weights' stem, or <run>/<stem> when
+    stems collide (two best.pt from different runs), numbered as a last resort
+    """
+    stems = [Path(path).stem for path in paths]
+    names = []
+    for i, path in enumerate(paths):
+        path = Path(path)
+        name = path.stem
+        if stems.count(name) > 1:
+            run_dir = path.parent.parent if path.parent.name == 'weights' else path.parent
+            name = f"{run_dir.name or '.'}/{name}"
+        if name in names:
+            name = f'{name}#{i + 1}'
+        names.append(name)
+    return names
+
+def load_model(path, task=None):
+    """Load weights normally, or inference-only with shared weights in lean mode"""
+    # Exported formats (ONNX, OpenVINO, ...) are already inference-only
+    if LEAN_MODE and Path(path).suffix == '.pt':
+        return load_lean_model(path, LEAN_DTYPE, task=task)
+    return YOLO(path, task=task)
+
+def install_class_filter(stage_model, allowed):
+    """
+    Zero the scores of classes outside `allowed` in the detection head output
+
+    NMS first drops anchors whose best class score is below conf, so masked
+    classes never reach box decoding or NMS. They also can't outrank a
+    waste class at the same anchor.
+
+    Returns:
+        True when the hook was installed (PyTorch models); exported models
+        have no head to hook
+    """
+    try:
+        head = stage_model.model.model[-1]
+        num_classes = head.nc
+    except (AttributeError, TypeError, IndexError):
+        return False
+    allowed = set(allowed)
+    blocked = [4 + i for i in range(num_classes) if i not in allowed]
+
+    def mask_scores(module, inputs, output):
+        pred = output[0] if isinstance(output, (tuple, list)) else output
+        pred[:, blocked] = 0
+
+    head.register_forward_hook(mask_scores)
+    return True
+
+# Extra predict() arguments per stage (the class allow-list for exported models)
+stage_predict_args = {}
+# Per stage (and 'classifier'): waste category record for every class ID,
+# resolved once at load so requests only index a list
+class_tables = {}
+# Per stage: class IDs kept by the class filter, or None when unfiltered
+stage_class_filters = {}
+
+def setup_class_filter(stage_name, stage_model):
+    """Restrict a detection stage to classes with a waste category (see YOLO_CLASS_FILTER)"""
+    stage_predict_args[stage_name] = {}
+    stage_class_filters[stage_name] = None
+    names = stage_model.names
+    class_tables[stage_name] = build_class_table(names)
+    allowed = waste_class_ids(names, EXTRA_CLASSES)
+    if not CLASS_FILTER_ENABLED or len(allowed) == len(names):
+        return
+    if not allowed:
+        print(f"⚠️  {stage_name}: no class maps to a waste category, class filter skipped")
+        return
+    if not install_class_filter(stage_model, allowed):
+        # ultralytics applies `classes` inside NMS, after the candidate filter
+        stage_predict_args[stage_name] = {'classes': allowed}
+    stage_class_filters[stage_name] = allowed
+    print(f"🧹 {stage_name}: keeping {len(allowed)}/{len(names)} classes")
+
+cascade_stages = []
+model_versions = {}
+# Input size the served model was exported/selected for (None: ultralytics default)
+model_imgsz = None
 try:
-    model = YOLO('yolov8n.pt')  # Replace with your trained waste model
-    print("✅ YOLOv8 model loaded successfully")
+    if CASCADE_ENABLED:
+        for name, path in zip(stage_names(CASCADE_MODEL_PATHS), CASCADE_MODEL_PATHS):
+            cascade_stages.append((name, load_model(path)))
+            model_versions[name] = describe_model_version(path)
+            setup_class_filter(*cascade_stages[-1])
+        model = cascade_stages[0][1]
+        print(f"✅ YOLOv8 cascade loaded: {' -> '.join(name for name, _ in cascade_stages)}")
+    else:
+        if MODEL_MANIFEST:
+            MODEL_PATH, model_imgsz = read_export_manifest(MODEL_MANIFEST)
+            print(f"📦 Export manifest selects {MODEL_PATH} at {model_imgsz}px")
+        model = load_model(MODEL_PATH)  # Replace with your trained waste model
+        cascade_stages.append((Path(MODEL_PATH).stem, model))
+        model_versions[Path(MODEL_PATH).stem] = describe_model_version(MODEL_PATH)
+        setup_class_filter(*cascade_stages[-1])
+        print("✅ YOLOv8 model loaded successfully")
 except Exception as e:
     print(f"❌ Error loading model: {e}")
     model = None
+    cascade_stages = []
 
-# Waste type mapping (customize based on your trained model)
-# This maps detected classes to waste categories and disposal recommendations
-WASTE_CATEGORIES = {
-    # Plastics
-    'plastic': {
-        'category': 'Recyclable',
-        'recommendation': 'Place in recyclable bin. Rinse before disposal.'
-    },
-    'plastic-bottle': {
-        'category': 'Recyclable',
-        'recommendation': 'Remove cap, rinse, and place in plastic recycling bin.'
-    },
-    'plastic-bag': {
-        'category': 'Recyclable',
-        'recommendation': 'Clean and dry. Take to plastic bag recycling drop-off.'
-    },
-    'bottle': {
-        'category': 'Recyclable',
-        'recommendation': 'Rinse and recycle. Check if cap is recyclable separately.'
-    },
-    
-    # Paper products
-    'paper': {
-        'category': 'Recyclable',
-        'recommendation': 'Place in paper recycling bin. Keep dry.'
-    },
-    'cardboard': {
-        'category': 'Recyclable',
-        'recommendation': 'Flatten and place in cardboard recycling. Remove tape/staples.'
-    },
-    
-    # Metals
-    'metal': {
-        'category': 'Recyclable',
-        'recommendation': 'Rinse and place in metal recycling bin.'
-    },
-    'metal-can': {
-        'category': 'Recyclable',
-        'recommendation': 'Rinse thoroughly and recycle with metals.'
-    },
-    'can': {
-        'category': 'Recyclable',
-        'recommendation': 'Rinse and recycle. Aluminum cans are highly recyclable.'
-    },
-    
-    # Glass
-    'glass': {
-        'category': 'Recyclable',
-        'recommendation': 'Place in glass recycling bin. Remove caps.'
-    },
-    'glass-bottle': {
-        'category': 'Recyclable',
-        'recommendation': 'Rinse, remove cap, and place in glass recycling.'
-    },
-    
-    # Organic
-    'organic': {
-        'category': 'Biodegradable',
-        'recommendation': 'Dispose in compost bin or biodegradable waste container.'
-    },
-    'food-container': {
-        'category': 'Check Material',
-        'recommendation': 'Check if plastic, paper, or foam. Rinse before recycling if applicable.'
-    },
-    
-    # Electronics
-    'electronic': {
-        'category': 'Hazardous',
-        'recommendation': 'Take to e-waste collection center. Do not dispose in regular bins.'
-    },
-    'electronic-waste': {
-        'category': 'Hazardous',
-        'recommendation': 'Take to certified e-waste recycling facility. Contains hazardous materials.'
-    },
-    'cellphone': {
-        'category': 'Hazardous',
-        'recommendation': 'Take to electronics recycling. Remove personal data first. Contains valuable materials.'
-    },
-    'cell phone': {
-        'category': 'Hazardous',
-        'recommendation': 'Take to electronics recycling. Remove personal data first. Contains valuable materials.'
-    },
-    'phone': {
-        'category': 'Hazardous',
-        'recommendation': 'Recycle at electronics collection point. Wipe data before disposal.'
-    },
-    
-    # Batteries
-    'battery': {
-        'category': 'Hazardous',
-        'recommendation': 'Take to battery recycling center. Never throw in regular trash.'
-    },
-    
-    # Styrofoam
-    'styrofoam': {
-        'category': 'Special Handling',
-        'recommendation': 'Check local recycling options. Many areas require special drop-off.'
-    },
-    
-    # General/Unknown
-    'general': {
-        'category': 'Non-recyclable',
-        'recommendation': 'Dispose in general waste bin.'
-    },
-    'general-waste': {
-        'category': 'Non-recyclable',
-        'recommendation': 'Dispose in general waste bin.'
+# Optional top-1 classifier for /detect, which only ever reports one class
+classifier = None
+if CLASSIFIER_PATH:
+    try:
+        classifier = load_model(CLASSIFIER_PATH, task='classify')
+        class_tables['classifier'] = build_class_table(classifier.names)
+        model_versions['classifier'] = describe_model_version(CLASSIFIER_PATH)
+        print(f"✅ Classifier fast path loaded: {CLASSIFIER_PATH}")
+    except Exception as e:
+        print(f"❌ Error loading classifier, /detect will use the detector: {e}")
+
+# Optional analytics log; writes happen on a background thread
+detection_logger = None
+if DETECTION_LOG_DIR:
+    try:
+        detection_logger = DetectionLogger(DETECTION_LOG_DIR, queue_size=DETECTION_LOG_QUEUE)
+        print(f"✅ Detection log: {DETECTION_LOG_DIR}")
+    except Exception as e:
+        print(f"❌ Detection log disabled: {e}")
+
+# Requests a client is waiting on; background jobs pause while any run
+interactive_gate = InteractiveGate()
+
+def interactive(handler):
+    """Wrap a transport handler so it runs ahead of background jobs"""
+    def run(image_bytes):
+        with interactive_gate:
+            return handler(image_bytes)
+    return run
+
+# Per-stage counters: how often each stage ran, how often it produced the
+# final answer, and how long its forward passes took.
+stats_lock = threading.Lock()
+cascade_stats = {
+    'requests': 0,
+    'escalations': 0,
+    'stages': {
+        name: {'runs': 0, 'answered': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+        for name, _ in cascade_stages
     },
-    'trash': {
-        'category': 'Non-recyclable',
-        'recommendation': 'Dispose in general waste bin.'
-    }
 }
+classifier_stats = {'runs': 0, 'answered': 0, 'fallbacks': 0, 'total_ms': 0.0, 'max_ms': 0.0}
 
-# Fallback for unknown classes
-def get_waste_info(class_name):
-    """Get waste category info with fallback for unknown classes"""
-    class_lower = class_name.lower()
-    
-    # Direct match
-    if class_lower in WASTE_CATEGORIES:
-        return WASTE_CATEGORIES[class_lower]
-    
-    # Partial match
-    for key in WASTE_CATEGORIES:
-        if key in class_lower or class_lower in key:
-            return WASTE_CATEGORIES[key]
-    
-    # Default fallback
+def needs_escalation(result):
+    """
+    Decide whether a cascade stage is too unsure to answer on its own
+
+    A stage escalates when it finds nothing, when its best detection is
+    below CASCADE_CONF_THRESHOLD, or when a detection of a different class
+    scores within CASCADE_CONFLICT_MARGIN of the best one.
+    """
+    boxes = result.boxes
+    if len(boxes) == 0:
+        return True
+
+    confidences = boxes.conf.cpu().numpy()
+    classes = boxes.cls.cpu().numpy()
+    order = np.argsort(confidences)[::-1]
+    top_conf = confidences[order[0]]
+
+    if top_conf < CASCADE_CONF_THRESHOLD:
+        return True
+
+    for idx in order[1:]:
+        if top_conf - confidences[idx] > CASCADE_CONFLICT_MARGIN:
+            break
+        if classes[idx] != classes[order[0]]:
+            return True
+
+    return False
+
+def run_inference(image, **kwargs):
+    """
+    Run the image through the cascade (or the single model)
+
+    Returns:
+        (results, stage) where stage is the name of the model that answered
+    """
+    results = None
+    stage_name = None
+    ran = []
+    if model_imgsz:
+        kwargs.setdefault('imgsz', model_imgsz)
+
+    for i, (stage_name, stage_model) in enumerate(cascade_stages):
+        start = time.perf_counter()
+        results = stage_model(image, **kwargs, **stage_predict_args[stage_name])
+        ran.append((stage_name, (time.perf_counter() - start) * 1000))
+
+        is_last = i == len(cascade_stages) - 1
+        if is_last or len(results) == 0 or not needs_escalation(results[0]):
+            break
+
+    with stats_lock:
+        cascade_stats['requests'] += 1
+        cascade_stats['escalations'] += len(ran) - 1
+        for name, elapsed_ms in ran:
+            stage_stats = cascade_stats['stages'][name]
+            stage_stats['runs'] += 1
+            stage_stats['total_ms'] += elapsed_ms
+            stage_stats['max_ms'] = max(stage_stats['max_ms'], elapsed_ms)
+        cascade_stats['stages'][stage_name]['answered'] += 1
+
+    return results, stage_name
+
+def log_detection(endpoint, stage, image_bytes, start, class_name=None, confidence=None,
+                  result=None, scale=1.0):
+    """
+    Hand one result to the detection log (no-op when logging is disabled)
+
+    Args:
+        result: Ultralytics detection result whose boxes are logged, or None
+        scale: Factor mapping model-input pixels back to the uploaded image
+    """
+    if detection_logger is None:
+        return
+
+    box_coords, box_classes = [], []
+    if result is not None and len(result.boxes) > 0:
+        box_coords = (result.boxes.xyxy.cpu().numpy() * scale).tolist()
+        box_classes = [result.names[int(c)] for c in result.boxes.cls.cpu().numpy()]
+
+    detection_logger.log(
+        endpoint=endpoint,
+        model_version=model_versions.get(stage, stage),
+        class_name=class_name,
+        confidence=confidence,
+        boxes=box_coords,
+        box_classes=box_classes,
+        latency_ms=(time.perf_counter() - start) * 1000,
+        image_hash=hash_image(image_bytes)
+    )
+
+def classify_top1(image):
+    """
+    Answer with the classifier alone when it is confident enough
+
+    Returns:
+        (result dict for /detect, class name, confidence), or None to fall
+        back to the detector
+    """
+    start = time.perf_counter()
+    results = classifier(image)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    probs = results[0].probs
+    top1_conf = float(probs.top1conf)
+    answered = top1_conf >= CLASSIFIER_CONF_THRESHOLD
+
+    with stats_lock:
+        classifier_stats['runs'] += 1
+        classifier_stats['answered' if answered else 'fallbacks'] += 1
+        classifier_stats['total_ms'] += elapsed_ms
+        classifier_stats['max_ms'] = max(classifier_stats['max_ms'], elapsed_ms)
+
+    if not answered:
+        return None
+
+    waste_info = class_tables['classifier'][int(probs.top1)]
+    class_name = waste_info['name']
     return {
-        'category': 'Unknown',
-        'recommendation': f'Detected as {class_name}. Please verify waste type and dispose accordingly.'
-    }
+        'wasteType': class_name.title(),
+        'category': waste_info['category'],
+        'confidence': round(top1_conf * 100, 2),
+        'recommendation': waste_info['recommendation'],
+        'stage': 'classifier'
+    }, class_name, top1_conf
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -172,34 +418,38 @@ def health_check():
         'model_loaded': model is not None
     })
 
-@app.route('/detect', methods=['POST'])
-def detect_waste():
+def detect_best(image_bytes):
     """
-    Detect waste type from uploaded image (single best detection)
-    
-    Expected: multipart/form-data with 'image' field
-    Returns: JSON with detection results
+    Detect waste type from raw image bytes (single best detection)
+
+    Shared by the HTTP and Unix socket transports.
+
+    Returns:
+        (payload, status) tuple
     """
     try:
-        if 'image' not in request.files:
-            return jsonify({
-                'success': False,
-                'message': 'No image provided'
-            }), 400
-
         if model is None:
-            return jsonify({
+            return {
                 'success': False,
                 'message': 'Model not loaded'
-            }), 500
+            }, 500
+
+        start = time.perf_counter()
+        image, scale, _ = prepare_image(image_bytes, MAX_IMAGE_PIXELS, INGEST_MAX_SIDE)
 
-        # Read image
-        image_file = request.files['image']
-        image_bytes = image_file.read()
-        image = Image.open(io.BytesIO(image_bytes))
+        # Classification fast path: one forward pass, no box decoding or NMS
+        if classifier is not None:
+            fast_answer = classify_top1(image)
+            if fast_answer is not None:
+                fast_result, class_name, top1_conf = fast_answer
+                log_detection('detect', 'classifier', image_bytes, start, class_name, top1_conf)
+                return {
+                    'success': True,
+                    'result': fast_result
+                }, 200
 
         # Run inference
-        results = model(image)
+        results, stage = run_inference(image)
         
         # Process results
         if len(results) > 0 and len(results[0].boxes) > 0:
@@ -213,66 +463,67 @@ def detect_waste():
             best_class = int(classes[best_idx])
             best_confidence = float(confidences[best_idx])
             
-            # Get class name
-            class_name = results[0].names[best_class]
-            
-            # Map to waste category with fallback
-            waste_info = get_waste_info(class_name)
+            # Class name and waste category, resolved at model load
+            waste_info = class_tables[stage][best_class]
+            class_name = waste_info['name']
+
+            log_detection('detect', stage, image_bytes, start, class_name, best_confidence, results[0], scale)
             
-            return jsonify({
+            return {
                 'success': True,
                 'result': {
                     'wasteType': class_name.title(),
                     'category': waste_info['category'],
                     'confidence': round(best_confidence * 100, 2),
-                    'recommendation': waste_info['recommendation']
+                    'recommendation': waste_info['recommendation'],
+                    'stage': stage
                 }
-            })
+            }, 200
         else:
             # No detection found
-            return jsonify({
+            log_detection('detect', stage, image_bytes, start)
+            return {
                 'success': False,
                 'message': 'No waste detected in image'
-            }), 400
+            }, 400
+
+    except IngestError as e:
+        return {
+            'success': False,
+            'message': str(e)
+        }, e.status
 
     except Exception as e:
         print(f"Error during detection: {e}")
-        return jsonify({
+        return {
             'success': False,
             'message': f'Detection error: {str(e)}'
-        }), 500
+        }, 500
 
-@app.route('/detect-multiple', methods=['POST'])
-def detect_multiple():
+def detect_all(image_bytes, endpoint='detect-multiple'):
     """
-    Detect multiple objects in image with bounding boxes (for real-time detection)
-    
-    Expected: multipart/form-data with 'image' field
-    Returns: JSON with array of detections including bounding boxes
+    Detect multiple objects in raw image bytes with bounding boxes
+
+    Shared by the HTTP and Unix socket transports and by image jobs.
+
+    Returns:
+        (payload, status) tuple
     """
     try:
-        if 'image' not in request.files:
-            return jsonify({
-                'success': False,
-                'message': 'No image provided'
-            }), 400
-
         if model is None:
-            return jsonify({
+            return {
                 'success': False,
                 'message': 'Model not loaded'
-            }), 500
+            }, 500
 
-        # Read image
-        image_file = request.files['image']
-        image_bytes = image_file.read()
-        image = Image.open(io.BytesIO(image_bytes))
-        img_width, img_height = image.size
+        start = time.perf_counter()
+        image, scale, _ = prepare_image(image_bytes, MAX_IMAGE_PIXELS, INGEST_MAX_SIDE)
 
         # Run inference
-        results = model(image, conf=0.3)  # Lower confidence threshold for real-time
+        results, stage = run_inference(image, conf=0.3)  # Lower confidence threshold for real-time
         
         detections = []
+        top_class, top_conf = None, None
         
         # Process all detections
         if len(results) > 0 and len(results[0].boxes) > 0:
@@ -282,10 +533,13 @@ def detect_multiple():
                 box = boxes[i]
                 confidence = float(box.conf.cpu().numpy()[0])
                 class_id = int(box.cls.cpu().numpy()[0])
-                class_name = results[0].names[class_id]
+                waste_info = class_tables[stage][class_id]
+                class_name = waste_info['name']
+                if top_conf is None or confidence > top_conf:
+                    top_class, top_conf = class_name, confidence
                 
-                # Get bounding box coordinates (xyxy format)
-                coords = box.xyxy.cpu().numpy()[0]
+                # Get bounding box coordinates (xyxy format), in uploaded-image pixels
+                coords = box.xyxy.cpu().numpy()[0] * scale
                 x1, y1, x2, y2 = coords
                 
                 # Convert to x, y, width, height
@@ -296,6 +550,7 @@ def detect_multiple():
                 
                 detections.append({
                     'label': class_name.title(),
+                    'category': waste_info['category'],
                     'confidence': confidence,
                     'x': x,
                     'y': y,
@@ -303,39 +558,472 @@ def detect_multiple():
                     'height': height
                 })
         
-        return jsonify({
+        log_detection(
+            endpoint, stage, image_bytes, start, top_class, top_conf,
+            results[0] if len(results) > 0 else None, scale
+        )
+        
+        return {
             'success': True,
             'detections': detections,
-            'count': len(detections)
-        })
+            'count': len(detections),
+            'stage': stage
+        }, 200
+
+    except IngestError as e:
+        return {
+            'success': False,
+            'message': str(e)
+        }, e.status
 
     except Exception as e:
         print(f"Error during multiple detection: {e}")
-        return jsonify({
+        return {
             'success': False,
             'message': f'Detection error: {str(e)}'
+        }, 500
+
+@app.route('/detect', methods=['POST'])
+def detect_waste():
+    """
+    Detect waste type from uploaded image (single best detection)
+    
+    Expected: multipart/form-data with 'image' field
+    Returns: JSON with detection results
+    """
+    if 'image' not in request.files:
+        return jsonify({
+            'success': False,
+            'message': 'No image provided'
+        }), 400
+
+    try:
+        image_bytes = read_upload(request.files['image'].stream, MAX_UPLOAD_BYTES)
+    except IngestError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), e.status
+
+    with interactive_gate:
+        payload, status = detect_best(image_bytes)
+    return jsonify(payload), status
+
+@app.route('/detect-multiple', methods=['POST'])
+def detect_multiple():
+    """
+    Detect multiple objects in image with bounding boxes (for real-time detection)
+    
+    Expected: multipart/form-data with 'image' field
+    Returns: JSON with array of detections including bounding boxes
+    """
+    if 'image' not in request.files:
+        return jsonify({
+            'success': False,
+            'message': 'No image provided'
+        }), 400
+
+    try:
+        image_bytes = read_upload(request.files['image'].stream, MAX_UPLOAD_BYTES)
+    except IngestError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), e.status
+
+    with interactive_gate:
+        payload, status = detect_all(image_bytes)
+    return jsonify(payload), status
+
+def resolve_media_path(path):
+    """Absolute path of an existing file or directory under MEDIA_ROOT, else None"""
+    source = (MEDIA_ROOT / path).resolve()
+    if not source.is_relative_to(MEDIA_ROOT) or not source.exists():
+        return None
+    return source
+
+def _int_option(params, name, default):
+    """Positive integer request parameter (JSON number or digit string)"""
+    value = params.get(name)
+    if value is None or value == '':
+        return default
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise ValueError(f'{name} must be a positive integer, got {value!r}')
+    return value
+
+def _fraction_option(params, name, default):
+    """Request parameter between 0 and 1"""
+    value = params.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        number = float(value) if not isinstance(value, bool) else None
+    except (TypeError, ValueError):
+        number = None
+    # NaN fails both comparisons
+    if number is None or not 0 <= number <= 1:
+        raise ValueError(f'{name} must be a number between 0 and 1, got {value!r}')
+    return number
+
+def video_options(params):
+    """process_video() keyword arguments from request parameters (ValueError when invalid)"""
+    return {
+        'every_n': _int_option(params, 'every_n', 10),
+        'scene_threshold': _fraction_option(params, 'scene_threshold', 0.25),
+        'batch_size': _int_option(params, 'batch_size', 8),
+        'conf': _fraction_option(params, 'conf', 0.3),
+        'min_hits': _int_option(params, 'min_hits', 1),
+    }
+
+@app.route('/process-video', methods=['POST'])
+def process_video_endpoint():
+    """
+    Count unique waste objects in a local video file or frame directory
+
+    Expected: JSON with 'path' (under YOLO_MEDIA_ROOT) and optional
+    'every_n', 'scene_threshold', 'batch_size', 'conf', 'min_hits'
+    Returns: JSON summary with per-class and per-category object counts
+    """
+    try:
+        params = request.get_json(silent=True) or {}
+        if not params.get('path'):
+            return jsonify({
+                'success': False,
+                'message': 'No path provided'
+            }), 400
+
+        if model is None:
+            return jsonify({
+                'success': False,
+                'message': 'Model not loaded'
+            }), 500
+
+        try:
+            options = video_options(params)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+
+        source = resolve_media_path(params['path'])
+        if source is None:
+            return jsonify({
+                'success': False,
+                'message': f"Path not found under media root: {params['path']}"
+            }), 404
+
+        summary = process_video(source, model, **options)
+
+        return jsonify({
+            'success': True,
+            'summary': summary
+        })
+
+    except Exception as e:
+        print(f"Error during video processing: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Video processing error: {str(e)}'
         }), 500
 
+def run_images_job(params, input_dir, progress):
+    """
+    Job handler: /detect-multiple on every uploaded image, or on every
+    image of a directory under YOLO_MEDIA_ROOT
+
+    Returns:
+        Per-image detections plus object counts per waste category
+    """
+    if params.get('path'):
+        folder = resolve_media_path(params['path'])
+        if folder is None or not folder.is_dir():
+            raise ValueError(f"Directory not found under media root: {params['path']}")
+        paths = sorted(p for p in folder.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        names = [p.name for p in paths]
+    else:
+        paths = sorted(Path(input_dir).iterdir())
+        names = params['files']
+
+    images = []
+    by_category = {}
+    for done, (path, name) in enumerate(zip(paths, names)):
+        progress(done, len(paths))
+        try:
+            with open(path, 'rb') as f:
+                image_bytes = read_upload(f, MAX_UPLOAD_BYTES)
+        except IngestError as e:
+            images.append({'file': name, 'success': False, 'message': str(e)})
+            continue
+        payload, _ = detect_all(image_bytes, endpoint='job')
+        images.append({'file': name, **payload})
+        for detection in payload.get('detections', []):
+            by_category[detection['category']] = by_category.get(detection['category'], 0) + 1
+    progress(len(paths), len(paths))
+
+    return {
+        'images': images,
+        'count': len(images),
+        'objects': sum(by_category.values()),
+        'by_category': dict(sorted(by_category.items(), key=lambda kv: -kv[1])),
+    }
+
+def run_video_job(params, input_dir, progress):
+    """Job handler: /process-video on a file or frame directory under YOLO_MEDIA_ROOT"""
+    source = resolve_media_path(params['path'])
+    if source is None:
+        raise ValueError(f"Path not found under media root: {params['path']}")
+    return process_video(source, model, progress=progress, **video_options(params))
+
+# Optional asynchronous job API; queued jobs are kept in SQLite under JOB_DIR
+job_queue = None
+if JOB_DIR:
+    try:
+        job_queue = JobQueue(
+            JOB_DIR,
+            {'images': run_images_job, 'video': run_video_job},
+            workers=JOB_WORKERS,
+            result_ttl=JOB_RESULT_TTL,
+            gate=interactive_gate
+        )
+        # Not in the debug reloader's parent process, which never serves requests
+        if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            job_queue.start()
+        print(f"✅ Job queue: {JOB_DIR} ({JOB_WORKERS} worker(s))")
+    except Exception as e:
+        print(f"❌ Job queue disabled: {e}")
+        job_queue = None
+
+def parse_priority(value):
+    """Job priority from a form field or JSON value (missing: 0)"""
+    if value is None or value == '':
+        return 0
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lstrip('+-').isdigit():
+        return int(value)
+    raise ValueError(f'priority must be an integer, got {value!r}')
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue a large submission and return at once
+
+    Expected: multipart/form-data with one or more 'images' files, or JSON
+    with 'type' ('video' or 'images') and 'path' under YOLO_MEDIA_ROOT
+    (plus the /process-video options for videos). Both accept optional
+    'priority' (higher runs first) and 'callback_url'.
+    Returns: 202 with the job ID; poll GET /jobs/<job_id> for progress
+    """
+    if job_queue is None:
+        return jsonify({
+            'success': False,
+            'message': 'Job queue disabled (set YOLO_JOB_DIR)'
+        }), 503
+
+    if model is None:
+        return jsonify({
+            'success': False,
+            'message': 'Model not loaded'
+        }), 500
+
+    job_id = job_queue.new_job_id()
+    try:
+        if request.files:
+            params = request.form.to_dict()
+            uploads = request.files.getlist('images')
+            if not uploads:
+                return jsonify({
+                    'success': False,
+                    'message': 'No images provided'
+                }), 400
+            input_dir = job_queue.input_dir(job_id)
+            input_dir.mkdir(parents=True)
+            for index, upload in enumerate(uploads):
+                image_bytes = read_upload(upload.stream, MAX_UPLOAD_BYTES)
+                with open(input_dir / f'{index:06d}{Path(upload.filename or "").suffix.lower()}', 'wb') as f:
+                    f.write(image_bytes)
+            kind = 'images'
+            job_params = {'files': [upload.filename for upload in uploads]}
+        else:
+            params = request.get_json(silent=True) or {}
+            kind = params.get('type')
+            if kind not in ('images', 'video'):
+                return jsonify({
+                    'success': False,
+                    'message': "Expected 'images' uploads or JSON with type 'images' or 'video'"
+                }), 400
+            if not params.get('path') or resolve_media_path(params['path']) is None:
+                return jsonify({
+                    'success': False,
+                    'message': f"Path not found under media root: {params.get('path')}"
+                }), 404
+            job_params = {'path': params['path']}
+            if kind == 'video':
+                job_params.update(video_options(params))
+
+        job_queue.submit(
+            kind,
+            job_params,
+            priority=parse_priority(params.get('priority')),
+            callback_url=params.get('callback_url') or None,
+            job_id=job_id
+        )
+
+    except (IngestError, ValueError, TypeError) as e:
+        shutil.rmtree(job_queue.input_dir(job_id), ignore_errors=True)
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), getattr(e, 'status', 400)
+
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/jobs/{job_id}'
+    }), 202
+
+@app.route('/jobs/<job_id>', methods=['GET', 'DELETE'])
+def job_status(job_id):
+    """
+    Job progress, and the result once done (GET), or cancel the job (DELETE)
+
+    Returns: JSON with the job record; 404 for unknown or expired jobs
+    """
+    if job_queue is None:
+        return jsonify({
+            'success': False,
+            'message': 'Job queue disabled (set YOLO_JOB_DIR)'
+        }), 503
+
+    if request.method == 'DELETE':
+        job = job_queue.cancel(job_id)
+    else:
+        job = job_queue.get(job_id, include_result=request.args.get('result', '1') != '0')
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': f'Unknown or expired job: {job_id}'
+        }), 404
+
+    return jsonify({
+        'success': True,
+        'job': job
+    })
+
+def describe_classes(stage_name):
+    """Classes a stage can report (after the class filter) and their waste mapping"""
+    allowed = stage_class_filters.get(stage_name)
+    mapping = []
+    for class_id, record in enumerate(class_tables[stage_name]):
+        if record is None or (allowed is not None and class_id not in allowed):
+            continue
+        mapping.append({
+            'id': class_id,
+            'name': record['name'],
+            'category': record['category'],
+            'recommendation': record['recommendation'],
+            'matched': record['matched'],
+            'rule': record['rule'],
+        })
+    return mapping
+
 @app.route('/classes', methods=['GET'])
 def get_classes():
-    """Get list of detectable waste classes"""
+    """Get the classes the loaded model can detect, with their waste categories"""
     if model is None:
         return jsonify({
             'success': False,
             'message': 'Model not loaded'
         }), 500
     
+    stages = {name: describe_classes(name) for name, _ in cascade_stages}
+    mapping = stages[cascade_stages[0][0]]
+    payload = {
+        'success': True,
+        'classes': [entry['name'] for entry in mapping],
+        'mapping': mapping
+    }
+    if len(stages) > 1:
+        payload['stages'] = stages
+    if classifier is not None:
+        payload['classifier'] = describe_classes('classifier')
+    return jsonify(payload)
+
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    """Report cascade escalation rate, classifier fallbacks and per-stage latency"""
+    with stats_lock:
+        requests_seen = cascade_stats['requests']
+        stages = {}
+        for name, stage_stats in cascade_stats['stages'].items():
+            runs = stage_stats['runs']
+            stages[name] = {
+                'runs': runs,
+                'answered': stage_stats['answered'],
+                'avg_ms': round(stage_stats['total_ms'] / runs, 2) if runs else 0.0,
+                'max_ms': round(stage_stats['max_ms'], 2),
+                'classes_kept': len(stage_class_filters[name]) if stage_class_filters.get(name) else None,
+            }
+        escalations = cascade_stats['escalations']
+        classifier_runs = classifier_stats['runs']
+        classifier_report = {
+            'enabled': classifier is not None,
+            'runs': classifier_runs,
+            'answered': classifier_stats['answered'],
+            'fallbacks': classifier_stats['fallbacks'],
+            'avg_ms': round(classifier_stats['total_ms'] / classifier_runs, 2) if classifier_runs else 0.0,
+            'max_ms': round(classifier_stats['max_ms'], 2),
+        }
+
     return jsonify({
         'success': True,
-        'classes': list(WASTE_CATEGORIES.keys())
+        'cascade': {
+            'enabled': CASCADE_ENABLED,
+            'requests': requests_seen,
+            'escalations': escalations,
+            'escalation_rate': round(escalations / requests_seen, 4) if requests_seen else 0.0,
+            'stages': stages,
+        },
+        'classifier': classifier_report,
+        'detection_log': detection_logger.stats() if detection_logger else {'enabled': False},
+        'jobs': job_queue.stats() if job_queue else {'enabled': False},
+        'memory': {
+            'lean': LEAN_MODE,
+            'dtype': LEAN_DTYPE if LEAN_MODE else 'fp32',
+            'pid': os.getpid(),
+            **memory_report()
+        }
     })
 
 if __name__ == '__main__':
     print("\n🚀 YOLOv8 Waste Detection Service")
     print("=" * 50)
     print(f"Model Status: {'✅ Loaded' if model else '❌ Not Loaded'}")
+    if CASCADE_ENABLED:
+        print(f"Cascade: {' -> '.join(name for name, _ in cascade_stages)} (conf < {CASCADE_CONF_THRESHOLD} escalates)")
     print(f"Endpoint: http://localhost:5001/detect")
     print(f"Health Check: http://localhost:5001/health")
+    print(f"Stats: http://localhost:5001/stats")
+    if classifier is not None:
+        print(f"Classifier fast path: {CLASSIFIER_PATH} (conf < {CLASSIFIER_CONF_THRESHOLD} falls back)")
+    if LEAN_MODE:
+        print(f"Lean mode: {LEAN_DTYPE} weights, memory {memory_report()}")
+    if UDS_PATH:
+        print(f"Unix socket: {UDS_PATH}")
+    if job_queue is not None:
+        print(f"Jobs: http://localhost:5001/jobs ({JOB_DIR})")
     print("=" * 50 + "\n")
+
+    # With debug=True the reloader runs this block in a parent and a child
+    # process; only the child serves requests, so only it binds the socket.
+    if UDS_PATH and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        serve_unix_socket(UDS_PATH, {
+            'detect': interactive(detect_best),
+            'detect-multiple': interactive(detect_all),
+        }, max_body_bytes=MAX_UPLOAD_BYTES)
     
     app.run(host='0.0.0.0', port=5001, debug=True)